@@ -0,0 +1,36 @@
+"""Bootstraps Django so the benchmark scripts can import the favorites app."""
+
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup():
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    os.environ.setdefault('MONGODB_ENSURE_INDEXES_ON_STARTUP', 'False')
+
+    import django
+
+    django.setup()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, samples):
+    """Prints mean/p50/p95/p99 in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    mean = sum(ms) / len(ms) if ms else 0.0
+    print(
+        f'{name:<32} n={len(ms):<6} mean={mean:8.3f}ms '
+        f'p50={percentile(ms, 50):8.3f}ms p95={percentile(ms, 95):8.3f}ms p99={percentile(ms, 99):8.3f}ms'
+    )
@@ -0,0 +1,53 @@
+"""
+Measures article validation throughput at increasing concurrency against a
+local stand-in responder.
+
+Requires a reachable RabbitMQ (RABBIT_URL).
+
+    python benchmarks/bench_article_validator.py --calls 2000 --latency 0.02
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _django
+
+_django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from favorites.rabbit_client import ArticleValidator  # noqa: E402
+from stand_ins import ArticleResponder  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated catalog latency in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64, 256])
+    args = parser.parse_args()
+
+    responder = ArticleResponder(settings.RABBIT_URL, latency=args.latency).start()
+    validator = ArticleValidator()
+    try:
+        for workers in args.concurrency:
+            samples = []
+
+            def call(i):
+                start = time.perf_counter()
+                validator.validate(f'article-{i}', 'bench-user')
+                samples.append(time.perf_counter() - start)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(call, range(args.calls)))
+            elapsed = time.perf_counter() - started
+            _django.summarize(f'concurrency={workers} ({args.calls / elapsed:.0f} req/s)', samples)
+    finally:
+        validator.close()
+        responder.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares the per-request cost of building a new MongoClient (plus index
+creation) against the shared pooled client.
+
+Requires a reachable MongoDB (MONGODB_HOST).
+
+    python benchmarks/bench_mongo_client.py --requests 500
+"""
+
+import argparse
+import time
+
+import _django
+
+_django.setup()
+
+from django.conf import settings  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+from favorites.models import ensure_indexes, get_favorites_collection  # noqa: E402
+
+
+def legacy_request(query):
+    client = MongoClient(settings.MONGODB_HOST)
+    try:
+        collection = client[settings.MONGODB_NAME]['favorites']
+        collection.create_index([('user_id', 1), ('product_id', 1)], unique=True)
+        collection.create_index([('user_id', 1)])
+        collection.create_index([('product_id', 1)])
+        collection.find_one(query)
+    finally:
+        client.close()
+
+
+def pooled_request(query):
+    get_favorites_collection().find_one(query)
+
+
+def run(fn, count, query):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    ensure_indexes()
+    query = {'user_id': 'bench-user', 'product_id': 'bench-product'}
+
+    pooled_request(query)
+    _django.summarize('new client + create_index', run(legacy_request, args.requests, query))
+    _django.summarize('pooled client', run(pooled_request, args.requests, query))
+
+
+if __name__ == '__main__':
+    main()
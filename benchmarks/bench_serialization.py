@@ -0,0 +1,73 @@
+"""
+Microbenchmark of the response serialization path for a list of favorites:
+Favorite.from_dict().to_dict() + DRF's JSONRenderer versus
+Favorite.serialize() + FastJSONRenderer.
+
+No external services are needed.
+
+    python benchmarks/bench_serialization.py --favorites 10000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import _django
+
+_django.setup()
+
+from bson import ObjectId  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from favorites.models import Favorite  # noqa: E402
+from favorites.renderers import FastJSONRenderer  # noqa: E402
+
+
+def make_documents(count):
+    now = datetime.utcnow()
+    return [
+        {
+            '_id': ObjectId(),
+            'user_id': 'bench-user',
+            'product_id': f'product-{i}',
+            'notes': 'nota de prueba' if i % 3 else '',
+            'created_at': now - timedelta(seconds=i),
+            'updated_at': now - timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy(docs):
+    favorites = [Favorite.from_dict(doc) for doc in docs]
+    return JSONRenderer().render({'results': [fav.to_dict() for fav in favorites]})
+
+
+def lean(docs):
+    return FastJSONRenderer().render({'results': [Favorite.serialize(doc) for doc in docs]})
+
+
+def run(fn, docs, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--favorites', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    docs = make_documents(args.favorites)
+    assert legacy(docs).decode('utf-8').replace(' ', '') == lean(docs).decode('utf-8').replace(' ', '')
+
+    _django.summarize('from_dict/to_dict + JSONRenderer', run(legacy, docs, args.repeat))
+    _django.summarize('serialize + FastJSONRenderer', run(lean, docs, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
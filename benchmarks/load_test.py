@@ -0,0 +1,344 @@
+"""
+End-to-end load test of every route in favorites.urls.
+
+Boots the service in-process against local stand-ins: a fake auth service
+answering /users/current, an article_exist responder (in memory, or on a
+real broker with --rabbit broker) and MongoDB (a local server, or mongomock
+with --mongo memory). The favorites collection of the benchmark database is
+seeded with --favorites documents spread over --users users, plus one write
+intent per user, then each endpoint is driven at --concurrency for
+--duration seconds. delete_favorite deletes seeded favorites (404s once they
+run out) and favorite_intent_status reads seeded intents.
+
+Results (throughput and p50/p95/p99 per endpoint) are printed as JSON on
+stdout, and also written to --output when given, so builds can be compared.
+mongomock is not thread-safe, so --mongo memory is only meant for smoke runs.
+
+    python benchmarks/load_test.py --users 1000 --favorites 20000 --duration 5
+    python benchmarks/load_test.py --users 100000 --favorites 1000000 --concurrency 64 --output before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+
+import _django
+from stand_ins import ArticleResponder, AuthServer, InMemoryArticleValidator
+
+ENDPOINTS = [
+    'list_favorites',
+    'list_favorites_deep_page',
+    'list_favorites_cursor',
+    'check_favorite',
+    'check_favorites_bulk',
+    'get_favorite_counts',
+    'export_favorites',
+    'export_all_favorites',
+    'create_favorite',
+    'create_favorites_batch',
+    'favorite_intent_status',
+    'delete_favorite_by_product',
+    'delete_favorite',
+    'get_popular_favorites',
+]
+
+# Seeded favorites and intents loaded as delete_favorite and favorite_intent_status targets.
+TARGETS_LIMIT = 100000
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--favorites', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=None, help='catalog size (default: favorites / 10)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per endpoint')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--database', default='favorites_bench')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data already in --database')
+    parser.add_argument('--mongo', choices=['local', 'memory'], default='local')
+    parser.add_argument('--rabbit', choices=['memory', 'broker'], default='memory')
+    parser.add_argument('--auth-latency', type=float, default=0.0)
+    parser.add_argument('--catalog-latency', type=float, default=0.0)
+    parser.add_argument('--admin-token', default='admin-0', help='bearer token of an administrator (export_all_favorites)')
+    parser.add_argument('--target', help='base URL of an already running service (skips the in-process server)')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=_django.ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed(args, products):
+    from favorites.models import (
+        ensure_indexes,
+        get_favorite_intents_collection,
+        get_favorites_collection,
+        rebuild_product_stats,
+    )
+    from favorites.write_behind import new_intent
+
+    collection = get_favorites_collection()
+    collection.drop()
+    get_favorite_intents_collection().drop()
+    ensure_indexes()
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    per_user, extra = divmod(args.favorites, args.users)
+    batch = []
+    for user in range(args.users):
+        count = min(products, per_user + (1 if user < extra else 0))
+        # Skewed towards low product numbers so some products are popular.
+        chosen = set()
+        while len(chosen) < count:
+            chosen.add(int(products * rng.random() ** 2))
+        for product in chosen:
+            created = now - timedelta(seconds=rng.randrange(90 * 24 * 3600))
+            batch.append({
+                'user_id': f'user-{user}',
+                'product_id': f'product-{product}',
+                'notes': '',
+                'created_at': created,
+                'updated_at': created,
+            })
+        if len(batch) >= 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    rebuild_product_stats()
+    get_favorite_intents_collection().insert_many([
+        new_intent(f'user-{user}', f'product-{user % products}', '') for user in range(min(args.users, TARGETS_LIMIT))
+    ])
+
+
+def load_targets():
+    """Returns the ``(user_id, _id)`` of seeded favorites (shuffled) and intents."""
+    from favorites.models import get_favorite_intents_collection, get_favorites_collection
+
+    def ids(collection):
+        return [(doc['user_id'], str(doc['_id'])) for doc in collection.find({}, {'user_id': 1}).limit(TARGETS_LIMIT)]
+
+    favorites = ids(get_favorites_collection())
+    random.Random(42).shuffle(favorites)
+    return {'favorites': favorites, 'intents': ids(get_favorite_intents_collection())}
+
+
+def request_for(endpoint, rng, args, products, targets):
+    """Returns (token, method, path, json_body) for one request to ``endpoint``."""
+    token = f'user-{rng.randrange(args.users)}'
+    method, path, body = _request_for(endpoint, rng, token, products)
+    if endpoint == 'export_all_favorites':
+        token = args.admin_token
+    elif endpoint == 'delete_favorite':
+        try:
+            # list.pop() is atomic: every seeded favorite is deleted once.
+            token, favorite_id = targets['favorites'].pop()
+            path = f'/api/favorites/{favorite_id}/'
+        except IndexError:
+            pass
+    elif endpoint == 'favorite_intent_status' and targets['intents']:
+        token, intent_id = rng.choice(targets['intents'])
+        path = f'/api/favorites/intents/{intent_id}/'
+    return token, method, path, body
+
+
+def _request_for(endpoint, rng, user_id, products):
+    product = f'product-{int(products * rng.random() ** 2)}'
+    if endpoint == 'list_favorites':
+        return 'GET', '/api/favorites/?page=1&limit=20', None
+    if endpoint == 'list_favorites_deep_page':
+        return 'GET', f'/api/favorites/?page={rng.randint(2, 50)}&limit=20', None
+    if endpoint == 'list_favorites_cursor':
+        return 'GET', '/api/favorites/?after=&limit=20', None
+    if endpoint == 'check_favorite':
+        return 'GET', f'/api/favorites/product/{product}/', None
+    if endpoint == 'check_favorites_bulk':
+        ids = ','.join(f'product-{rng.randrange(products)}' for _ in range(40))
+        return 'GET', f'/api/favorites/check/?product_ids={ids}', None
+    if endpoint == 'get_favorite_counts':
+        ids = ','.join(f'product-{int(products * rng.random() ** 2)}' for _ in range(100))
+        return 'GET', f'/api/favorites/counts/?product_ids={ids}', None
+    if endpoint == 'export_favorites':
+        return 'GET', '/api/favorites/export/', None
+    if endpoint == 'export_all_favorites':
+        # One user's favorites: the whole collection is too large to stream per request.
+        return 'GET', f'/api/favorites/admin/export/?user_id={user_id}', None
+    if endpoint == 'create_favorite':
+        return 'POST', '/api/favorites/', {'product_id': product, 'notes': 'bench'}
+    if endpoint == 'create_favorites_batch':
+        items = [{'product_id': f'product-{rng.randrange(products)}'} for _ in range(20)]
+        return 'POST', '/api/favorites/batch/', items
+    if endpoint == 'delete_favorite_by_product':
+        return 'DELETE', f'/api/favorites/product/{product}/', None
+    if endpoint == 'delete_favorite':
+        return 'DELETE', f'/api/favorites/{rng.getrandbits(96):024x}/', None
+    if endpoint == 'favorite_intent_status':
+        return 'GET', f'/api/favorites/intents/{rng.getrandbits(96):024x}/', None
+    if endpoint == 'get_popular_favorites':
+        return 'GET', '/api/favorites/admin/popular/?limit=10', None
+    raise ValueError(endpoint)
+
+
+def drive(base_url, endpoint, args, products, targets):
+    local = threading.local()
+    deadline = time.perf_counter() + args.duration
+    samples, status_codes, errors = [], {}, [0]
+    lock = threading.Lock()
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        while time.perf_counter() < deadline:
+            token, method, path, body = request_for(endpoint, rng, args, products, targets)
+            start = time.perf_counter()
+            try:
+                response = session.request(
+                    method, base_url + path, json=body,
+                    headers={'Authorization': f'Bearer {token}'}, timeout=30,
+                )
+                code = response.status_code
+            except requests.RequestException:
+                code = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                status_codes[str(code)] = status_codes.get(str(code), 0) + 1
+                if code is None or code >= 500:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    ms = [sample * 1000 for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': errors[0],
+        'status_codes': status_codes,
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'p50_ms': round(_django.percentile(ms, 50), 3),
+        'p95_ms': round(_django.percentile(ms, 95), 3),
+        'p99_ms': round(_django.percentile(ms, 99), 3),
+    }
+
+
+def main():
+    args = parse_args()
+    products = args.products or max(1, args.favorites // 10)
+    server = auth = responder = None
+
+    # Never seed (drop) anything but the benchmark database.
+    os.environ['MONGODB_NAME'] = args.database
+    if args.mongo == 'memory':
+        # mongomock has no sessions.
+        os.environ['MONGODB_CAUSAL_CONSISTENCY'] = 'False'
+    if not args.target:
+        auth = AuthServer(latency=args.auth_latency).start()
+        os.environ['AUTH_SERVICE_URL'] = auth.url
+        if args.rabbit == 'memory':
+            os.environ['CATALOG_EVENTS_EXCHANGE'] = ''
+
+    _django.setup()
+
+    if args.mongo == 'memory':
+        import mongomock
+
+        from favorites import models
+
+        memory_client = mongomock.MongoClient()
+        models.get_mongo_client = lambda: memory_client
+
+    if not args.no_seed:
+        started = time.perf_counter()
+        seed(args, products)
+        print(f'seeded {args.favorites} favorites in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    base_url = args.target
+    if not args.target:
+        from django.conf import settings
+        from django.core.wsgi import get_wsgi_application
+
+        from favorites import rabbit_client
+
+        if args.rabbit == 'memory':
+            rabbit_client._validator = InMemoryArticleValidator(latency=args.catalog_latency)
+        else:
+            responder = ArticleResponder(settings.RABBIT_URL, latency=args.catalog_latency).start()
+
+        server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=_ThreadingWSGIServer, handler_class=_QuietHandler,
+        )
+        threading.Thread(target=server.serve_forever, name='favorites-server', daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = {
+        'build': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'timestamp': datetime.utcnow().isoformat(),
+        },
+        'config': {**vars(args), 'products': products},
+        'endpoints': {},
+    }
+    targets = load_targets()
+    try:
+        for endpoint in args.endpoints:
+            stats = drive(base_url, endpoint, args, products, targets)
+            results['endpoints'][endpoint] = stats
+            print(
+                f'{endpoint:<28} {stats["throughput_rps"]:>9.1f} req/s  p50={stats["p50_ms"]:.1f}ms '
+                f'p95={stats["p95_ms"]:.1f}ms p99={stats["p99_ms"]:.1f}ms errors={stats["errors"]}',
+                file=sys.stderr,
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+        if responder is not None:
+            responder.stop()
+        if auth is not None:
+            auth.stop()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            handle.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
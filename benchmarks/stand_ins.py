@@ -0,0 +1,158 @@
+"""Local stand-ins for the services the favorites service depends on."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pika
+
+
+class ArticleResponder:
+    """Answers ``article_exist`` requests on the broker like the catalog service.
+
+    Every article is valid unless its id starts with ``invalid_prefix``.
+    Replies are delayed by ``latency`` seconds without blocking the consumer,
+    so concurrent requests overlap the way they would against the real service.
+    """
+
+    def __init__(self, url, latency=0.0, invalid_prefix='missing-'):
+        self.url = url
+        self.latency = latency
+        self.invalid_prefix = invalid_prefix
+        self.handled = 0
+        self._ready = threading.Event()
+        self._connection = None
+        self._thread = threading.Thread(target=self._run, name='article-responder', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError('Article responder did not start')
+        return self
+
+    def stop(self):
+        if self._connection is not None:
+            self._connection.add_callback_threadsafe(self._connection.close)
+        self._thread.join(timeout=5)
+
+    def _reply(self, channel, request):
+        message = request['message']
+        body = {
+            'correlation_id': request['correlation_id'],
+            'message': {
+                'referenceId': message.get('referenceId'),
+                'articleId': message.get('articleId'),
+                'valid': not str(message.get('articleId', '')).startswith(self.invalid_prefix),
+            },
+        }
+        channel.basic_publish(
+            exchange=request.get('exchange', 'article_exist'),
+            routing_key=request['routing_key'],
+            properties=pika.BasicProperties(correlation_id=request['correlation_id']),
+            body=json.dumps(body),
+        )
+        self.handled += 1
+
+    def _on_request(self, channel, method, props, body):
+        request = json.loads(body)
+        if self.latency:
+            self._connection.call_later(self.latency, lambda: self._reply(channel, request))
+        else:
+            self._reply(channel, request)
+
+    def _run(self):
+        self._connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        channel = self._connection.channel()
+        channel.exchange_declare(exchange='article_exist', exchange_type='direct', durable=False)
+        queue = channel.queue_declare(queue='', exclusive=True).method.queue
+        channel.queue_bind(exchange='article_exist', queue=queue, routing_key='article_exist')
+        channel.basic_consume(queue=queue, on_message_callback=self._on_request, auto_ack=True)
+        self._ready.set()
+        try:
+            channel.start_consuming()
+        except (pika.exceptions.AMQPError, OSError):
+            pass
+
+
+class AuthServer:
+    """Answers ``GET /users/current`` like the auth service.
+
+    ``Bearer user-<n>`` resolves to ``{"id": "user-<n>"}`` and ``Bearer
+    admin-<n>`` to an administrator; any other token gets a 401.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                token = self.headers.get('Authorization', '').partition(' ')[2]
+                if self.path != '/users/current' or not token.startswith(('user-', 'admin-')):
+                    self._send(401, {'message': 'Unauthorized'})
+                else:
+                    permissions = ['user', 'admin'] if token.startswith('admin-') else ['user']
+                    self._send(200, {'id': token, 'name': token, 'permissions': permissions})
+
+            def _send(self, status_code, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='auth-stand-in', daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class InMemoryArticleValidator:
+    """Drop-in for ``ArticleValidator`` that answers without a broker."""
+
+    def __init__(self, latency=0.0, invalid_prefix='missing-'):
+        self.latency = latency
+        self.invalid_prefix = invalid_prefix
+
+    def _reply(self, article_id, reference_id):
+        return {
+            'message': {
+                'referenceId': reference_id,
+                'articleId': article_id,
+                'valid': not str(article_id).startswith(self.invalid_prefix),
+            },
+        }
+
+    def validate(self, article_id, reference_id):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(article_id, reference_id)
+
+    def validate_many(self, articles, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._reply(article_id, reference_id) for article_id, reference_id in articles]
+
+    def close(self):
+        pass
@@ -0,0 +1,67 @@
+"""
+Hammers upsert_favorite() for the same (user, product) from many threads and
+checks that exactly one call reports a creation, none fails with a
+DuplicateKeyError and a single document is left.
+
+Requires a reachable MongoDB (MONGODB_HOST). Exits non-zero on failure.
+
+    python benchmarks/stress_favorite_upsert.py --threads 64 --rounds 20
+"""
+
+import argparse
+import sys
+import threading
+import uuid
+
+import _django
+
+_django.setup()
+
+from favorites.models import ensure_indexes, get_favorites_collection, upsert_favorite  # noqa: E402
+
+
+def run_round(collection, threads):
+    user_id = f'stress-{uuid.uuid4()}'
+    barrier = threading.Barrier(threads)
+    created, errors = [], []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            _, was_created = upsert_favorite(collection, user_id, 'stress-product', f'note {i}' if i % 2 else '')
+            created.append(was_created)
+        except Exception as exc:  # noqa: BLE001 - reported below
+            errors.append(exc)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    documents = collection.count_documents({'user_id': user_id})
+    collection.delete_many({'user_id': user_id})
+    return sum(created), errors, documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    ensure_indexes()
+    collection = get_favorites_collection()
+    failures = 0
+    for round_number in range(args.rounds):
+        creations, errors, documents = run_round(collection, args.threads)
+        ok = creations == 1 and not errors and documents == 1
+        failures += not ok
+        print(f'round {round_number}: created={creations} errors={len(errors)} documents={documents} {"ok" if ok else "FAIL"}')
+        for error in errors[:3]:
+            print(f'  {error!r}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 """
 ASGI config for favorites service.
+
+Django does not handle the ASGI lifespan protocol, so ``application`` answers
+it with ``favorites.lifecycle.lifespan``, which connects the worker's async
+clients at startup, and hands every other connection to Django.
 """
 
 import os
@@ -8,7 +12,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
 
+from favorites import lifecycle  # noqa: E402  (needs the configured settings)
 
 
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifecycle.lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
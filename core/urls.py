@@ -1,10 +1,16 @@
 """
 URL configuration for favorites service.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from favorites.views import liveness, metrics, readiness
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('favorites.urls')),
+    path('metrics', metrics, name='metrics'),
+    path('health/live', liveness, name='liveness'),
+    path('health/ready', readiness, name='readiness'),
+    path('api/', include('favorites.async_urls' if settings.ASYNC_MODE else 'favorites.urls')),
 ]
@@ -1,9 +1,29 @@
+import logging
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class FavoritesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'favorites'
 
+    def ready(self):
+        if settings.MONGODB_ENSURE_INDEXES_ON_STARTUP:
+            # Runs off the main thread so startup (and management commands)
+            # never block on MongoDB server selection.
+            threading.Thread(target=self._bootstrap_indexes, name='favorites-indexes', daemon=True).start()
+
+    @staticmethod
+    def _bootstrap_indexes():
+        from pymongo.errors import PyMongoError
 
+        from .models import ensure_indexes
 
+        try:
+            ensure_indexes()
+        except PyMongoError as exc:
+            logger.warning('No se pudieron crear los índices de MongoDB: %s', exc)
@@ -0,0 +1,15 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('favorites/', async_views.list_favorites, name='list_favorites'),
+    path('favorites/batch/', async_views.create_favorites_batch, name='create_favorites_batch'),
+    path('favorites/check/', async_views.check_favorites_bulk, name='check_favorites_bulk'),
+    path('favorites/export/', async_views.export_favorites, name='export_favorites'),
+    path('favorites/counts/', async_views.get_favorite_counts, name='get_favorite_counts'),
+    path('favorites/intents/<str:intent_id>/', async_views.favorite_intent_status, name='favorite_intent_status'),
+    path('favorites/<str:favorite_id>/', async_views.delete_favorite, name='delete_favorite'),
+    path('favorites/product/<str:product_id>/', async_views.check_favorite, name='check_favorite'),
+    path('favorites/admin/popular/', async_views.get_popular_favorites, name='get_popular_favorites'),
+    path('favorites/admin/export/', async_views.export_all_favorites, name='export_all_favorites'),
+]
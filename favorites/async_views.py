@@ -0,0 +1,287 @@
+"""
+Async versions of the favorites views, served when ASYNC_MODE is enabled.
+
+They use Motor for MongoDB and aio-pika for article validation, so a request
+waiting on a dependency does not hold a worker thread. Parsing, queries and
+responses come from ``favorites.view_logic``, as in ``views.py``; only the
+I/O differs.
+"""
+import functools
+from datetime import datetime
+
+from django.conf import settings
+from rest_framework import status
+
+from .consistency import aread_session
+from .models import (
+    get_async_favorites_collection,
+    get_async_favorite_intents_collection,
+    get_async_product_stats_collection,
+    abump_user_version,
+    aget_user_version,
+    aincrement_favorite_counts,
+    aupsert_favorite,
+    abulk_upsert,
+    FAVORITE_PROJECTION,
+)
+from .export import agzip_chunks, andjson_chunks, export_cursor
+from .favorite_sets import aget_favorite_set
+from .view_logic import (
+    FAVORITE_DELETED,
+    FAVORITE_NOT_FOUND,
+    INTENT_NOT_FOUND,
+    FavoritesPage,
+    RequestError,
+    Reply,
+    accepted_reply,
+    batch_documents_query,
+    batch_items,
+    batch_operations,
+    batch_reply,
+    batch_unavailable,
+    cached_counts,
+    counts_query,
+    counts_reply,
+    created_reply,
+    export_query_params,
+    export_response,
+    favorite_key,
+    favorite_reply,
+    favorite_to_create,
+    favorites_validators,
+    intent_favorite_query,
+    intent_query,
+    intent_reply,
+    lookup_data,
+    lookup_product_ids,
+    lookup_query,
+    lookup_reply,
+    method_not_allowed,
+    not_modified,
+    parse_json,
+    parse_object_id,
+    popular_cache,
+    popular_cursor,
+    popular_reply,
+    require_admin,
+    store_counts,
+    validation_error,
+    with_validators,
+)
+from .rabbit_client import avalidate_article, avalidate_articles
+from .renderers import json_response
+from .write_behind import acreate_intent
+
+
+def _respond(reply):
+    return json_response(reply.data, reply.status, reply.headers)
+
+
+def _view(*methods):
+    """Async counterpart of ``views._view``: method check, CSRF exemption and RequestError."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise method_not_allowed(request.method, methods)
+                return await view(request, *args, **kwargs)
+            except RequestError as exc:
+                return _respond(exc.reply)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def _count_favorites(collection, user_id, session=None):
+    products = await aget_favorite_set(user_id)
+    if products is not None:
+        return len(products)
+    return await collection.count_documents({'user_id': user_id}, session=session)
+
+## listar favos
+
+@_view('GET', 'POST')
+async def list_favorites(request):
+    user_id = request.user_id
+    if request.method == 'POST':
+        product_id, notes = favorite_to_create(parse_json(request.body))
+        if settings.FAVORITES_WRITE_BEHIND:
+            return _respond(accepted_reply(await acreate_intent(user_id, product_id, notes)))
+
+        try:
+            await avalidate_article(product_id, user_id)
+        except Exception as exc:
+            return _respond(validation_error(exc))
+
+        favorite_doc, created = await aupsert_favorite(get_async_favorites_collection(), user_id, product_id, notes)
+        await abump_user_version(user_id)
+        if created:
+            await aincrement_favorite_counts([product_id], 1, favorite_doc['created_at'])
+        return _respond(created_reply(favorite_doc, created))
+
+    collection = get_async_favorites_collection('list')
+    session = await aread_session()
+    validators = favorites_validators(user_id, await aget_user_version(user_id, 'list', session))
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+
+    page = FavoritesPage(user_id, request.GET)
+    docs = await page.cursor(collection, session).to_list(length=None)
+    count = await _count_favorites(collection, user_id, session) if page.wants_count else None
+    return with_validators(_respond(page.reply(docs, count)), *validators)
+
+## estado de favos encolados (write-behind)
+
+@_view('GET')
+async def favorite_intent_status(request, intent_id):
+    intent = await get_async_favorite_intents_collection().find_one(intent_query(intent_id, request.user_id))
+    if not intent:
+        return _respond(INTENT_NOT_FOUND)
+    favorite_query = intent_favorite_query(intent)
+    favorite_doc = await get_async_favorites_collection().find_one(*favorite_query) if favorite_query else None
+    return _respond(intent_reply(intent, favorite_doc))
+
+## crear favos en lote
+
+@_view('POST')
+async def create_favorites_batch(request):
+    user_id = request.user_id
+    collection = get_async_favorites_collection()
+    items = batch_items(parse_json(request.body))
+
+    try:
+        validations = await avalidate_articles([item['product_id'] for item in items], user_id)
+    except Exception as exc:
+        return _respond(validation_error(exc, invalid_status=status.HTTP_503_SERVICE_UNAVAILABLE))
+    unavailable = batch_unavailable(validations)
+    if unavailable is not None:
+        return _respond(unavailable)
+
+    now = datetime.utcnow()
+    product_ids, operations = batch_operations(user_id, items, validations, now)
+    created, failed, documents = set(), set(), {}
+    if product_ids:
+        upserted, failed_indexes = await abulk_upsert(collection, operations)
+        await abump_user_version(user_id)
+        created = {product_ids[index] for index in upserted}
+        await aincrement_favorite_counts(list(created), 1, now)
+        failed = {product_ids[index] for index in failed_indexes}
+        documents = {doc['product_id']: doc async for doc in collection.find(*batch_documents_query(user_id, product_ids))}
+    return _respond(batch_reply(items, validations, created, failed, documents))
+
+## check varios favos
+
+@_view('GET', 'POST')
+async def check_favorites_bulk(request):
+    user_id = request.user_id
+    collection = get_async_favorites_collection('check')
+    session = await aread_session()
+    product_ids = lookup_product_ids(parse_json(request.body) if request.method == 'POST' else lookup_data(request.GET))
+
+    if request.method == 'GET':
+        validators = favorites_validators(user_id, await aget_user_version(user_id, 'check', session))
+        response = not_modified(request, *validators)
+        if response is not None:
+            return response
+
+    products = await aget_favorite_set(user_id)
+    if products is not None:
+        found = products.intersection(product_ids)
+    else:
+        found = {doc['product_id'] async for doc in collection.find(*lookup_query(user_id, product_ids), session=session)}
+
+    response = _respond(lookup_reply(product_ids, found))
+    return with_validators(response, *validators) if request.method == 'GET' else response
+
+## contar favos por producto
+
+@_view('GET', 'POST')
+async def get_favorite_counts(request):
+    product_ids = lookup_product_ids(parse_json(request.body) if request.method == 'POST' else lookup_data(request.GET))
+    counts, missing = cached_counts(product_ids)
+    if missing:
+        docs = await get_async_product_stats_collection('counts').find(*counts_query(missing)).to_list(length=None)
+        store_counts(counts, missing, docs)
+    return _respond(counts_reply(product_ids, counts))
+
+## check favo
+
+async def _delete_by_product(user_id, product_id):
+    result = await get_async_favorites_collection().delete_one(favorite_key(user_id, product_id))
+    if result.deleted_count == 0:
+        return _respond(FAVORITE_NOT_FOUND)
+    await abump_user_version(user_id)
+    await aincrement_favorite_counts([product_id], -1)
+    return _respond(FAVORITE_DELETED)
+
+
+@_view('GET', 'DELETE')
+async def check_favorite(request, product_id):
+    user_id = request.user_id
+    if request.method == 'DELETE':
+        return await _delete_by_product(user_id, product_id)
+
+    collection = get_async_favorites_collection('check')
+    session = await aread_session()
+    validators = favorites_validators(user_id, await aget_user_version(user_id, 'check', session))
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+
+    products = await aget_favorite_set(user_id)
+    if products is not None and product_id not in products:
+        favorite_doc = None
+    else:
+        favorite_doc = await collection.find_one(favorite_key(user_id, product_id), FAVORITE_PROJECTION, session=session)
+    return with_validators(_respond(favorite_reply(favorite_doc)), *validators)
+
+## delete favo por id
+
+@_view('DELETE')
+async def delete_favorite(request, favorite_id):
+    user_id = request.user_id
+    object_id = parse_object_id(favorite_id, 'ID de favorito inválido')
+    try:
+        deleted = await get_async_favorites_collection().find_one_and_delete(
+            {'_id': object_id, 'user_id': user_id},
+            projection={'product_id': 1},
+        )
+    except Exception as e:
+        return _respond(Reply({'error': f'Error al eliminar favorito: {str(e)}'}, status.HTTP_400_BAD_REQUEST))
+
+    if not deleted:
+        return _respond(FAVORITE_NOT_FOUND)
+    await abump_user_version(user_id)
+    await aincrement_favorite_counts([deleted['product_id']], -1)
+    return _respond(FAVORITE_DELETED)
+
+## exportar favos
+
+def _export(request, user_id):
+    query, compress = export_query_params(request.GET, user_id)
+    cursor = export_cursor(get_async_favorites_collection('export'), query, settings.FAVORITES_EXPORT_BATCH_SIZE)
+    chunks = andjson_chunks(cursor)
+    return export_response(agzip_chunks(chunks) if compress else chunks, compress)
+
+
+@_view('GET')
+async def export_favorites(request):
+    return _export(request, request.user_id)
+
+
+@_view('GET')
+async def export_all_favorites(request):
+    require_admin(request)
+    return _export(request, request.GET.get('user_id') or None)
+
+## get popu favos
+
+@_view('GET')
+async def get_popular_favorites(request):
+    limit = int(request.GET.get('limit', 10))
+    popular = await popular_cache.aget_or_load(
+        limit, lambda: popular_cursor(get_async_product_stats_collection('popular'), limit).to_list(length=limit)
+    )
+    return _respond(popular_reply(popular))
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import CACHE_LOOKUPS
+
+_MISSING = object()
+
+
+class _InFlight:
+    """A load in progress that other threads asking for the same key wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    ``get_or_load`` (and ``aget_or_load`` for coroutines) deduplicates
+    concurrent loads of the same key, so only one caller runs the loader
+    while the others wait for its result. Caches given a ``name`` report
+    their lookups in the ``favorites_cache_lookups_total`` metric.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._clock = clock
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _record(self, result):
+        if self.name is not None:
+            CACHE_LOOKUPS.labels(self.name, result).inc()
+
+    def _get_locked(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _set_locked(self, key, value, ttl):
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            self._data.pop(key, None)
+            return
+        self._data[key] = (value, self._clock() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get_locked(key)
+        if value is _MISSING:
+            self._record('miss')
+            return default
+        self._record('hit')
+        return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Returns the cached value for ``key`` or computes it with ``loader()``.
+
+        ``ttl`` may be a number or a callable receiving the loaded value and
+        returning the TTL to store it with (``0`` skips caching). Exceptions
+        raised by the loader are propagated to every waiter and not cached.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not _MISSING:
+                self._record('hit')
+                return value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+
+        self._record('miss' if leader else 'coalesced')
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        else:
+            entry_ttl = ttl(call.value) if callable(ttl) else ttl
+            with self._lock:
+                self._set_locked(key, call.value, entry_ttl)
+            return call.value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    async def aget_or_load(self, key, loader, ttl=None):
+        """Async variant of ``get_or_load``; ``loader`` is a coroutine function."""
+        with self._lock:
+            value = self._get_locked(key)
+        if value is not _MISSING:
+            self._record('hit')
+            return value
+
+        future = self._async_inflight.get(key)
+        if future is not None:
+            self._record('coalesced')
+            return await asyncio.shield(future)
+
+        self._record('miss')
+        future = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            entry_ttl = ttl(value) if callable(ttl) else ttl
+            with self._lock:
+                self._set_locked(key, value, entry_ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._async_inflight.pop(key, None)
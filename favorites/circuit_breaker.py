@@ -0,0 +1,248 @@
+"""
+Circuit breakers and load shedding for the auth service and the catalog.
+
+Each dependency gets a ``CircuitBreaker`` that watches the outcome of its
+last calls. When too many of them fail or are slow the circuit opens and
+callers get ``CircuitOpenError`` right away, without waiting on the
+dependency, until a few half-open probes find it healthy again. Calls
+beyond ``max_in_flight`` are refused the same way, and the timeout handed
+to each call adapts to the latency the dependency has been showing.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """A call refused by a breaker. ``retry_after`` is in seconds."""
+
+    def __init__(self, dependency, reason, retry_after):
+        super().__init__(f'{dependency} unavailable ({reason})')
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Call:
+    __slots__ = ('started', 'generation', 'failed')
+
+    def __init__(self, started, generation):
+        self.started = started
+        self.generation = generation
+        self.failed = False
+
+    def fail(self):
+        """Counts the call as failed even though it did not raise."""
+        self.failed = True
+
+
+class CircuitBreaker:
+    """Thread-safe breaker over a count-based window of recent calls.
+
+    Opens when, over the last ``window`` calls (and at least ``min_calls``),
+    the share of failures reaches ``failure_rate`` or the share of calls
+    slower than ``slow_call_seconds`` reaches ``slow_call_rate``. After
+    ``open_seconds`` up to ``half_open_probes`` calls are let through; the
+    circuit closes when all of them succeed and opens again otherwise.
+
+    ``timeout()`` is ``timeout_multiplier`` times the p99 latency of recent
+    successful calls, between ``min_timeout`` and ``timeout``.
+    """
+
+    def __init__(self, name, timeout, max_in_flight=0, window=50, min_calls=10, failure_rate=0.5,
+                 slow_call_seconds=1.0, slow_call_rate=0.8, open_seconds=10.0, half_open_probes=3,
+                 min_timeout=0.25, timeout_multiplier=3.0, enabled=True, clock=time.monotonic):
+        self.name = name
+        self.max_timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.enabled = enabled
+        self.state = CLOSED
+        self.in_flight = 0
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._generation = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Registers ``callback(breaker, old_state, new_state)``, run on every transition."""
+        self._listeners.append(callback)
+
+    def _transition_locked(self, state):
+        old, self.state = self.state, state
+        self._generation += 1
+        self._outcomes.clear()
+        self._probes = self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = self._clock()
+        return old, state
+
+    def _notify(self, transition):
+        if transition is None:
+            return
+        for callback in self._listeners:
+            try:
+                callback(self, *transition)
+            except Exception:
+                logger.exception('Error en el listener del circuit breaker %s', self.name)
+
+    def _reject(self, reason, retry_after):
+        CIRCUIT_REJECTIONS.labels(self.name, reason).inc()
+        raise CircuitOpenError(self.name, reason, retry_after)
+
+    def _admit_locked(self):
+        """Returns (rejection or None, transition or None)."""
+        transition = None
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - self._clock()
+            if remaining > 0:
+                return ('open', math.ceil(remaining)), None
+            transition = self._transition_locked(HALF_OPEN)
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return ('overloaded', 1), transition
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                return ('half_open', 1), transition
+            self._probes += 1
+        return None, transition
+
+    def acquire(self):
+        """Admits a call or raises ``CircuitOpenError``. Pair with ``release``."""
+        call = None
+        with self._lock:
+            rejection, transition = self._admit_locked() if self.enabled else (None, None)
+            if rejection is None:
+                self.in_flight += 1
+                call = _Call(self._clock(), self._generation)
+        self._notify(transition)
+        if rejection is not None:
+            self._reject(*rejection)
+        return call
+
+    def release(self, call, failed=False):
+        """Records the outcome of a call admitted by ``acquire``."""
+        elapsed = self._clock() - call.started
+        failed = failed or call.failed
+        slow = elapsed >= self.slow_call_seconds
+        transition = None
+        with self._lock:
+            self.in_flight -= 1
+            if not failed:
+                self._latencies.append(elapsed)
+            if self.enabled and call.generation == self._generation:
+                transition = self._record_locked(failed, slow)
+        self._notify(transition)
+
+    def _record_locked(self, failed, slow):
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                return self._transition_locked(OPEN)
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                return self._transition_locked(CLOSED)
+            return None
+        if self.state != CLOSED:
+            return None
+
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return None
+        failures = sum(1 for outcome in self._outcomes if outcome[0])
+        slow_calls = sum(1 for outcome in self._outcomes if outcome[1])
+        if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+            return self._transition_locked(OPEN)
+        return None
+
+    @contextmanager
+    def call(self):
+        """``with breaker.call() as call:`` around one call to the dependency.
+
+        Exceptions count as failures; ``call.fail()`` marks other failures.
+        """
+        call = self.acquire()
+        try:
+            yield call
+        except BaseException:
+            self.release(call, failed=True)
+            raise
+        else:
+            self.release(call)
+
+    def timeout(self):
+        """Timeout for the next call, adapted to the recent latency."""
+        if not self.enabled or not self.timeout_multiplier:
+            return self.max_timeout
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.min_calls:
+            return self.max_timeout
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+
+_breakers = {}
+
+
+def _report_transition(breaker, old_state, new_state):
+    CIRCUIT_STATE.labels(breaker.name).set(_STATE_VALUES[new_state])
+    log = logger.info if new_state == CLOSED else logger.warning
+    log('Circuit breaker %s: %s -> %s', breaker.name, old_state, new_state)
+
+
+def circuit_breaker(name, timeout, max_in_flight):
+    """Builds the breaker of a dependency with the CIRCUIT_BREAKER_* settings."""
+    breaker = CircuitBreaker(
+        name,
+        timeout=timeout,
+        max_in_flight=max_in_flight,
+        window=settings.CIRCUIT_BREAKER_WINDOW,
+        min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+        failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+        slow_call_seconds=settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate=settings.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+        open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+        half_open_probes=settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+        min_timeout=settings.CIRCUIT_BREAKER_MIN_TIMEOUT,
+        timeout_multiplier=settings.CIRCUIT_BREAKER_TIMEOUT_MULTIPLIER,
+        enabled=settings.CIRCUIT_BREAKER_ENABLED,
+    )
+    breaker.add_listener(_report_transition)
+    CIRCUIT_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+    _breakers[name] = breaker
+    return breaker
+
+
+def breaker_states():
+    """Returns ``{dependency: {'state', 'in_flight'}}`` for every breaker built so far."""
+    return {
+        name: {'state': breaker.state, 'in_flight': breaker.in_flight}
+        for name, breaker in _breakers.items()
+    }
@@ -0,0 +1,144 @@
+"""
+Causal consistency for reads routed away from the primary.
+
+With MONGODB_READ_PREFERENCES a read may be served by a secondary that has
+not replicated the client's latest write yet. Every write to a user's
+favorites therefore answers with a signed token, in the ``X-Causal-Token``
+header and the ``causal_token`` cookie, holding the cluster and operation
+time of that write. Requests that send it back read through a causally
+consistent session advanced to that time, so whichever member serves them
+waits until it has applied the write.
+"""
+import base64
+import binascii
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+
+import bson
+from bson.errors import BSONError
+from django.core import signing
+
+HEADER = 'X-Causal-Token'
+COOKIE = 'causal_token'
+
+_signer = signing.Signer(salt='favorites.consistency')
+_state = contextvars.ContextVar('favorites_causal_state', default=None)
+
+
+class _RequestState:
+    __slots__ = ('times', 'session', 'token')
+
+    def __init__(self, times):
+        self.times = times
+        self.session = None
+        self.token = None
+
+
+def dumps_token(cluster_time, operation_time):
+    payload = bson.encode({'cluster_time': cluster_time, 'operation_time': operation_time})
+    return _signer.sign(base64.urlsafe_b64encode(payload).decode('ascii'))
+
+
+def loads_token(token):
+    """Returns (cluster_time, operation_time), or None for a missing, forged or malformed token."""
+    if not token:
+        return None
+    try:
+        doc = bson.decode(base64.urlsafe_b64decode(_signer.unsign(token)))
+        return doc['cluster_time'], doc['operation_time']
+    except (signing.BadSignature, binascii.Error, BSONError, KeyError, ValueError):
+        return None
+
+
+def start_request(token):
+    """Starts tracking the causal token of the current request."""
+    return _state.set(_RequestState(loads_token(token)))
+
+
+def end_request(reset_token):
+    """Ends the request's read session. Returns the token to hand back, or None."""
+    state = _state.get()
+    _state.reset(reset_token)
+    if state.session is not None:
+        state.session.end_session()
+    return state.token
+
+
+async def aend_request(reset_token):
+    state = _state.get()
+    _state.reset(reset_token)
+    if state.session is not None:
+        await state.session.end_session()
+    return state.token
+
+
+def _advance(session, times):
+    if times is not None:
+        session.advance_cluster_time(times[0])
+        session.advance_operation_time(times[1])
+
+
+def _remember(state, session):
+    # Standalone servers report no cluster time: there is nothing to wait for.
+    if session.cluster_time is not None and session.operation_time is not None:
+        state.token = dumps_token(session.cluster_time, session.operation_time)
+
+
+def read_session():
+    """Session to pass to the reads of this request.
+
+    None (an implicit session) unless the client sent a causal token.
+    """
+    state = _state.get()
+    if state is None or state.times is None:
+        return None
+    if state.session is None:
+        from .models import get_mongo_client
+
+        state.session = get_mongo_client().start_session(causal_consistency=True)
+        _advance(state.session, state.times)
+    return state.session
+
+
+async def aread_session():
+    """Async variant of ``read_session`` returning a Motor session."""
+    state = _state.get()
+    if state is None or state.times is None:
+        return None
+    if state.session is None:
+        from .models import get_async_mongo_client
+
+        state.session = await get_async_mongo_client().start_session(causal_consistency=True)
+        _advance(state.session, state.times)
+    return state.session
+
+
+@contextmanager
+def causal_write(client):
+    """Runs a write in a causally consistent session and records its token.
+
+    Outside a request (workers, management commands) yields None.
+    """
+    state = _state.get()
+    if state is None:
+        yield None
+        return
+    with client.start_session(causal_consistency=True) as session:
+        _advance(session, state.times)
+        yield session
+        _remember(state, session)
+
+
+@asynccontextmanager
+async def acausal_write(client):
+    state = _state.get()
+    if state is None:
+        yield None
+        return
+    session = await client.start_session(causal_consistency=True)
+    try:
+        _advance(session, state.times)
+        yield session
+        _remember(state, session)
+    finally:
+        await session.end_session()
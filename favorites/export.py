@@ -0,0 +1,80 @@
+"""
+NDJSON export of favorites.
+
+Documents are read in ``_id`` order through a batched cursor and written
+one JSON object per line, so memory use does not depend on the size of the
+export and an interrupted export can be resumed after the last ``id`` seen.
+"""
+import zlib
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from .models import Favorite, FAVORITE_PROJECTION
+from .renderers import dumps
+
+CHUNK_SIZE = 64 * 1024
+
+
+def export_query(user_id=None, after=None):
+    """Query for the favorites to export. Raises ValueError for a bad ``after``."""
+    query = {}
+    if user_id is not None:
+        query['user_id'] = user_id
+    if after:
+        try:
+            query['_id'] = {'$gt': ObjectId(after)}
+        except (InvalidId, TypeError) as exc:
+            raise ValueError(after) from exc
+    return query
+
+
+def export_cursor(collection, query, batch_size):
+    return collection.find(query, FAVORITE_PROJECTION).sort('_id', 1).batch_size(batch_size)
+
+
+def ndjson_line(doc):
+    return dumps(Favorite.serialize(doc)) + b'\n'
+
+
+def ndjson_chunks(docs):
+    """Yields NDJSON in chunks of roughly CHUNK_SIZE bytes."""
+    buffer = bytearray()
+    for doc in docs:
+        buffer += ndjson_line(doc)
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def andjson_chunks(docs):
+    """Async variant of ``ndjson_chunks`` for Motor cursors."""
+    buffer = bytearray()
+    async for doc in docs:
+        buffer += ndjson_line(doc)
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def gzip_chunks(chunks):
+    """Compresses a stream of byte chunks into a single gzip member."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,279 @@
+"""
+Optional in-process cache of the product ids each user has as favorites.
+
+Membership checks are answered from memory instead of MongoDB. Every write
+to a user's favorites bumps their ``user_versions`` document; this process
+drops the cached set right away, and a background watcher on the
+``user_versions`` change stream does the same for writes made by other
+workers and nodes. Without a replica set (no change streams) the watcher
+polls ``user_versions`` every FAVORITES_SET_CACHE_POLL_INTERVAL seconds.
+"""
+import itertools
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+# Server error code for "$changeStream is only supported on replica sets".
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+
+_POLL_OVERLAP = timedelta(seconds=5)
+
+# Users whose generation is remembered before the generations start over.
+_MAX_GENERATIONS = 100000
+
+
+def _sizeof(user_id, products):
+    size = sys.getsizeof(user_id) + 64
+    if products is not None:
+        size += sys.getsizeof(products) + sum(sys.getsizeof(product_id) for product_id in products)
+    return size
+
+
+class FavoriteSetCache:
+    """Thread-safe LRU of ``user_id -> frozenset`` bounded by approximate memory use.
+
+    ``None`` is cached for users with too many favorites to keep in memory.
+    Loads must pass the ``token(user_id)`` read before querying: an
+    invalidation of that user, or a ``clear``, in between makes ``set``
+    discard the (possibly stale) result. Invalidating one user does not
+    affect the loads of the others.
+    """
+
+    def __init__(self, max_bytes, name=None):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.nbytes = 0
+        self.epoch = 0
+        self._generations = {}
+        self._counter = itertools.count(1)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop_locked(self, user_id):
+        entry = self._data.pop(user_id, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+    def get(self, user_id):
+        """Returns the cached set, None for an uncacheable user, or ``MISSING``."""
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None:
+                self._data.move_to_end(user_id)
+        if self.name is not None:
+            CACHE_LOOKUPS.labels(self.name, 'miss' if entry is None else 'hit').inc()
+        return MISSING if entry is None else entry[0]
+
+    def _token_locked(self, user_id):
+        return self.epoch, self._generations.get(user_id, 0)
+
+    def token(self, user_id):
+        """Version of ``user_id``'s entry, to pass to ``set`` after loading it."""
+        with self._lock:
+            return self._token_locked(user_id)
+
+    def set(self, user_id, products, token):
+        size = _sizeof(user_id, products)
+        with self._lock:
+            if token != self._token_locked(user_id) or size > self.max_bytes:
+                return
+            self._pop_locked(user_id)
+            self._data[user_id] = (products, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.nbytes -= evicted
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if len(self._generations) >= _MAX_GENERATIONS:
+                # Forgetting generations is only safe along with a new epoch.
+                self._generations.clear()
+                self.epoch += 1
+            # Never reused, so no earlier token of this user matches again.
+            self._generations[user_id] = next(self._counter)
+            self._pop_locked(user_id)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._generations.clear()
+            self._data.clear()
+            self.nbytes = 0
+
+
+class FavoriteSetWatcher:
+    """Background thread that invalidates the sets of users changed elsewhere.
+
+    The cache is only trusted while ``healthy`` is set; it is cleared every
+    time the watcher (re)starts since changes may have been missed.
+    """
+
+    def __init__(self, cache, collection, poll_interval):
+        self._cache = cache
+        self._collection = collection
+        self._poll_interval = poll_interval
+        self._polling = False
+        self._closing = threading.Event()
+        self.healthy = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='favorite-sets-watcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closing.set()
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        while not self._closing.is_set():
+            try:
+                if self._polling:
+                    self._poll()
+                else:
+                    self._watch()
+            except OperationFailure as exc:
+                if exc.code == _CHANGE_STREAMS_UNSUPPORTED and not self._polling:
+                    logger.info('Change streams no disponibles, se consultará user_versions periódicamente')
+                    self._polling = True
+                    continue
+                logger.warning('Error vigilando cambios de favoritos: %s', exc)
+            except PyMongoError as exc:
+                logger.warning('Error vigilando cambios de favoritos: %s', exc)
+            finally:
+                self.healthy.clear()
+                self._cache.clear()
+            self._closing.wait(self._poll_interval)
+
+    def _watch(self):
+        with self._collection.watch(max_await_time_ms=1000) as stream:
+            self._cache.clear()
+            self.healthy.set()
+            while not self._closing.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    continue
+                document_key = change.get('documentKey')
+                if document_key is None:
+                    # drop / rename / invalidate: nothing can be trusted any more.
+                    self._cache.clear()
+                else:
+                    self._cache.invalidate(document_key['_id'])
+
+    def _poll(self):
+        latest = self._collection.find_one({}, {'updated_at': 1}, sort=[('updated_at', -1)])
+        last_seen = latest['updated_at'] if latest else datetime.min
+        # Versions already applied. Each poll re-reads a window before
+        # ``last_seen``, since writes may commit out of timestamp order.
+        seen = {}
+        self._cache.clear()
+        self.healthy.set()
+
+        while not self._closing.wait(self._poll_interval):
+            since = last_seen - _POLL_OVERLAP if last_seen > datetime.min + _POLL_OVERLAP else datetime.min
+            for doc in self._collection.find({'updated_at': {'$gte': since}}, {'updated_at': 1, 'version': 1}):
+                key = (doc['_id'], doc['version'])
+                if key in seen:
+                    continue
+                seen[key] = doc['updated_at']
+                self._cache.invalidate(doc['_id'])
+                last_seen = max(last_seen, doc['updated_at'])
+            seen = {key: updated_at for key, updated_at in seen.items() if updated_at >= since}
+
+
+_cache = FavoriteSetCache(settings.FAVORITES_SET_CACHE_MAX_BYTES, name='favorite_set')
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start_favorite_set_watcher():
+    """Starts the process's FavoriteSetWatcher unless it is running. Returns it."""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                from .models import get_user_versions_collection
+
+                _watcher = FavoriteSetWatcher(
+                    _cache,
+                    get_user_versions_collection(),
+                    settings.FAVORITES_SET_CACHE_POLL_INTERVAL,
+                ).start()
+    return _watcher
+
+
+def _to_set(docs):
+    products = frozenset(doc['product_id'] for doc in docs)
+    return None if len(products) > settings.FAVORITES_SET_CACHE_MAX_ITEMS else products
+
+
+def _cached(user_id):
+    """Returns (token, cached value or MISSING); MISSING also when the cache can't be trusted."""
+    if not settings.FAVORITES_SET_CACHE_ENABLED or not start_favorite_set_watcher().healthy.is_set():
+        return None, MISSING
+    token = _cache.token(user_id)
+    return token, _cache.get(user_id)
+
+
+def get_favorite_set(user_id):
+    """Returns the frozenset of the user's favorite product ids.
+
+    Returns None when the cache is disabled or unavailable, or the user has
+    more than FAVORITES_SET_CACHE_MAX_ITEMS favorites; callers then query
+    MongoDB as usual.
+    """
+    token, products = _cached(user_id)
+    if token is None:
+        return None
+    if products is MISSING:
+        from .models import get_favorites_collection
+        from .view_logic import products_query
+
+        limit = settings.FAVORITES_SET_CACHE_MAX_ITEMS + 1
+        products = _to_set(get_favorites_collection().find(*products_query(user_id)).limit(limit))
+        _cache.set(user_id, products, token)
+    return products
+
+
+async def aget_favorite_set(user_id):
+    """Async variant of ``get_favorite_set``."""
+    token, products = _cached(user_id)
+    if token is None:
+        return None
+    if products is MISSING:
+        from .models import get_async_favorites_collection
+        from .view_logic import products_query
+
+        limit = settings.FAVORITES_SET_CACHE_MAX_ITEMS + 1
+        docs = await get_async_favorites_collection().find(*products_query(user_id)).limit(limit).to_list(length=limit)
+        products = _to_set(docs)
+        _cache.set(user_id, products, token)
+    return products
+
+
+def reset_favorite_sets():
+    """Starts over after a fork: the parent's watcher thread does not exist in the child."""
+    global _watcher, _watcher_lock
+    _watcher = None
+    _watcher_lock = threading.Lock()
+    _cache.clear()
+
+
+def invalidate_favorite_set(user_id):
+    """Drops the cached set of a user whose favorites changed in this process."""
+    _cache.invalidate(user_id)
@@ -0,0 +1,145 @@
+"""
+Declarative spec of the MongoDB indexes of the service.
+
+``INDEXES`` lists, per collection, every index the queries rely on (see
+``favorites.query_audit`` for the queries themselves). ``apply_indexes``
+creates the missing ones, at startup and with ``manage.py ensure_indexes``;
+``sync_indexes`` also rebuilds the ones whose definition changed and drops
+the ones no longer declared. It never leaves a query without its index:
+missing indexes are created first, a changed one is replaced by a
+temporary copy while it is rebuilt, and undeclared ones are dropped last.
+"""
+from django.conf import settings
+from pymongo import IndexModel
+
+# Appended to the key and name of the temporary copy of a changed index, so
+# it can coexist with the old definition. Documents lack the field, which
+# therefore changes neither the rows of the index nor its uniqueness.
+_TEMPORARY_SUFFIX = '__sync'
+
+# Options compared with the existing indexes to detect a changed definition.
+_COMPARED_OPTIONS = {
+    'unique': False,
+    'sparse': False,
+    'expireAfterSeconds': None,
+    'partialFilterExpression': None,
+}
+
+INDEXES = {
+    'favorites': [
+        # One favorite per (user, product). Its user_id prefix also serves
+        # the per-user counts, and it covers the membership lookups.
+        IndexModel([('user_id', 1), ('product_id', 1)], unique=True),
+        # Catalog cleanup: favorites of a disabled product.
+        IndexModel([('product_id', 1)]),
+        # Listing, sorted by FAVORITES_ORDER (offset and keyset pagination).
+        IndexModel([('user_id', 1), ('created_at', -1), ('_id', -1)]),
+        # Per-user export, sorted by _id.
+        IndexModel([('user_id', 1), ('_id', 1)]),
+    ],
+    'product_stats': [
+        IndexModel([('favorite_count', -1)]),
+    ],
+    'user_versions': [
+        # Polled by the favorite set cache without a change stream.
+        IndexModel([('updated_at', -1)]),
+    ],
+    'favorite_intents': [
+        IndexModel([('status', 1), ('retry_at', 1)]),
+        # Only done, rejected and failed intents have a finished_at to expire by.
+        IndexModel([('finished_at', 1)], expireAfterSeconds=settings.FAVORITES_INTENT_RETENTION_SECONDS),
+    ],
+}
+
+
+def _same_definition(declared, existing):
+    if list(existing['key']) != list(declared['key'].items()):
+        return False
+    return all(
+        existing.get(option, default) == declared.get(option, default)
+        for option, default in _COMPARED_OPTIONS.items()
+    )
+
+
+def index_diff(database):
+    """Compares INDEXES with ``database``.
+
+    Returns ``{collection: (missing, changed, extra)}``: the declared
+    IndexModels that do not exist or differ, and the names of existing
+    indexes not declared (``_id_`` aside).
+    """
+    diff = {}
+    for name, models in INDEXES.items():
+        existing = database[name].index_information()
+        missing, changed = [], []
+        for model in models:
+            current = existing.pop(model.document['name'], None)
+            if current is None:
+                missing.append(model)
+            elif not _same_definition(model.document, current):
+                changed.append(model)
+        existing.pop('_id_', None)
+        diff[name] = (missing, changed, sorted(existing))
+    return diff
+
+
+def apply_indexes(database):
+    """Creates the declared indexes missing from ``database``. Returns ``index_diff`` before applying.
+
+    Safe to run repeatedly; changed and undeclared indexes are left alone.
+    """
+    diff = index_diff(database)
+    for name, (missing, _, _) in diff.items():
+        if missing:
+            database[name].create_indexes(missing)
+    return diff
+
+
+def _only_ttl_changed(declared, existing):
+    if 'expireAfterSeconds' not in declared or 'expireAfterSeconds' not in existing:
+        return False
+    return _same_definition(declared, {**existing, 'expireAfterSeconds': declared['expireAfterSeconds']})
+
+
+def _temporary_copy(model):
+    options = dict(model.document)
+    keys = list(options.pop('key').items()) + [(_TEMPORARY_SUFFIX, 1)]
+    # TTL indexes must have a single field; the copy only serves the queries.
+    options.pop('expireAfterSeconds', None)
+    return IndexModel(keys, **{**options, 'name': options['name'] + _TEMPORARY_SUFFIX})
+
+
+def _rebuild(database, collection, model, existing):
+    declared = model.document
+    if _only_ttl_changed(declared, existing):
+        database.command('collMod', collection.name, index={
+            'name': declared['name'],
+            'expireAfterSeconds': declared['expireAfterSeconds'],
+        })
+        return
+    temporary = _temporary_copy(model)
+    collection.create_indexes([temporary])
+    collection.drop_index(declared['name'])
+    collection.create_indexes([model])
+    collection.drop_index(temporary.document['name'])
+
+
+def sync_indexes(database):
+    """Makes the indexes of ``database`` match INDEXES. Returns ``index_diff`` before syncing.
+
+    Creates the missing indexes, rebuilds the changed ones (in place with
+    ``collMod`` when only the TTL changed, otherwise behind a temporary
+    copy) and only then drops the undeclared ones.
+    """
+    diff = index_diff(database)
+    for name, (missing, changed, extra) in diff.items():
+        collection = database[name]
+        if missing:
+            collection.create_indexes(missing)
+        if changed:
+            existing = collection.index_information()
+            for model in changed:
+                _rebuild(database, collection, model, existing[model.document['name']])
+        for index_name in extra:
+            collection.drop_index(index_name)
+    return diff
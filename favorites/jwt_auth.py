@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+class JWTVerifier:
+    """Verifies bearer tokens locally, without calling the auth service.
+
+    Keys come from a shared secret, a PEM public key file or a JWKS file.
+    Key files are re-read every ``AUTH_JWT_KEYS_REFRESH_SECONDS`` when
+    their modification time changes, so keys can be rotated on disk.
+    """
+
+    def __init__(self):
+        self._algorithms = settings.AUTH_JWT_ALGORITHMS
+        self._secret = settings.AUTH_JWT_SECRET
+        self._public_key_file = settings.AUTH_JWT_PUBLIC_KEY_FILE
+        self._jwks_file = settings.AUTH_JWT_JWKS_FILE
+        self._refresh_seconds = settings.AUTH_JWT_KEYS_REFRESH_SECONDS
+        self._user_id_claim = settings.AUTH_JWT_USER_ID_CLAIM
+        self._audience = settings.AUTH_JWT_AUDIENCE or None
+        self._issuer = settings.AUTH_JWT_ISSUER or None
+        self._lock = threading.Lock()
+        self._key_file = self._jwks_file or self._public_key_file
+        self._keys = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+        if not (self._secret or self._key_file):
+            raise ImproperlyConfigured('AUTH_MODE=jwt requires AUTH_JWT_SECRET, AUTH_JWT_PUBLIC_KEY_FILE or AUTH_JWT_JWKS_FILE')
+        if self._key_file:
+            self._reload_keys()
+
+    def _read_keys(self):
+        with open(self._key_file, 'r', encoding='utf-8') as key_file:
+            content = key_file.read()
+        if self._jwks_file:
+            return jwt.PyJWKSet.from_dict(json.loads(content))
+        return content
+
+    def _reload_keys(self):
+        mtime = os.stat(self._key_file).st_mtime
+        if mtime != self._mtime:
+            self._keys = self._read_keys()
+            self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    def _current_keys(self):
+        if time.monotonic() - self._checked_at >= self._refresh_seconds:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self._refresh_seconds:
+                    try:
+                        self._reload_keys()
+                    except (OSError, ValueError, jwt.PyJWTError):
+                        # Keep serving with the last good keys.
+                        self._checked_at = time.monotonic()
+        return self._keys
+
+    def _signing_key(self, token):
+        if not self._key_file:
+            return self._secret
+        keys = self._current_keys()
+        if not self._jwks_file:
+            return keys
+
+        kid = jwt.get_unverified_header(token).get('kid')
+        for jwk in keys.keys:
+            if kid is None or jwk.key_id == kid:
+                return jwk.key
+        raise jwt.InvalidKeyError(f'Unknown key id: {kid}')
+
+    def verify(self, token):
+        """Returns ``(user_id, claims)`` or raises ``jwt.PyJWTError``."""
+        claims = jwt.decode(
+            token,
+            self._signing_key(token),
+            algorithms=self._algorithms,
+            audience=self._audience,
+            issuer=self._issuer,
+            options={'require': ['exp', self._user_id_claim]},
+        )
+        return claims[self._user_id_claim], claims
@@ -0,0 +1,116 @@
+"""
+Worker lifecycle for production servers (see gunicorn.conf.py).
+
+The master imports the application once (``preload_app``) and creates the
+indexes; every forked worker then drops the clients it may have inherited
+(``after_fork``) and opens its own MongoDB, RabbitMQ and auth connections
+(``warm_up``) before accepting requests. In ASYNC_MODE the Motor, aio-pika
+and httpx clients belong to the worker's event loop: ``awarm_up`` connects
+them from the ASGI lifespan startup (see ``lifespan``).
+"""
+import logging
+
+import pymongo
+from django.conf import settings
+from pymongo.errors import PyMongoError
+
+from . import rabbit_client
+from .favorite_sets import reset_favorite_sets, start_favorite_set_watcher
+from .middleware import get_async_auth_client, get_auth_session, reset_auth_clients
+from .models import ensure_indexes, get_async_mongo_client, get_mongo_client, reset_mongo_client
+
+logger = logging.getLogger(__name__)
+
+
+def prepare(create_indexes=True):
+    """Runs once in the master before the workers are forked."""
+    if create_indexes:
+        try:
+            ensure_indexes()
+        except PyMongoError as exc:
+            logger.warning('No se pudieron crear los índices de MongoDB: %s', exc)
+    # The workers must not share the master's connections.
+    reset_mongo_client()
+
+
+def after_fork():
+    """Drops every client inherited from the master."""
+    reset_mongo_client()
+    rabbit_client.reset_connections()
+    reset_auth_clients()
+    reset_favorite_sets()
+
+
+def _ping_mongo():
+    with pymongo.timeout(settings.HEALTH_CHECK_TIMEOUT):
+        get_mongo_client().admin.command('ping')
+
+
+def _warm_auth():
+    if _remote_auth():
+        # Any answer leaves a keep-alive connection in the pool.
+        get_auth_session().head(settings.AUTH_SERVICE_URL, timeout=settings.AUTH_HTTP_TIMEOUT)
+
+
+def _remote_auth():
+    return settings.AUTH_MODE == 'remote' or settings.AUTH_JWT_REMOTE_FALLBACK
+
+
+def warm_up():
+    """Opens the worker's connections. Failures are logged; the readiness check reports them."""
+    steps = []
+    if not settings.ASYNC_MODE:
+        steps += [('auth', _warm_auth), ('mongo', _ping_mongo), ('rabbit', rabbit_client.connect_catalog)]
+    if settings.FAVORITES_SET_CACHE_ENABLED:
+        steps.append(('favorite_sets', start_favorite_set_watcher))
+    for name, step in steps:
+        try:
+            step()
+        except Exception as exc:
+            logger.warning('No se pudo precalentar %s: %s', name, exc)
+
+
+async def _aping_mongo():
+    with pymongo.timeout(settings.HEALTH_CHECK_TIMEOUT):
+        await get_async_mongo_client().admin.command('ping')
+
+
+async def _awarm_auth():
+    if _remote_auth():
+        await get_async_auth_client().head(settings.AUTH_SERVICE_URL, timeout=settings.AUTH_HTTP_TIMEOUT)
+
+
+async def awarm_up():
+    """``warm_up`` for the clients of the async views, run on the worker's event loop."""
+    steps = [('auth', _awarm_auth), ('mongo', _aping_mongo), ('rabbit', rabbit_client.aconnect_catalog)]
+    for name, step in steps:
+        try:
+            await step()
+        except Exception as exc:
+            logger.warning('No se pudo precalentar %s: %s', name, exc)
+
+
+async def lifespan(receive, send):
+    """Serves the ASGI lifespan protocol: ``awarm_up`` before the server accepts requests."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await awarm_up()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def readiness_checks():
+    """Returns ``{dependency: None or error message}``."""
+    checks = {}
+    try:
+        _ping_mongo()
+        checks['mongo'] = None
+    except PyMongoError as exc:
+        # The endpoint is public: details go to the log only.
+        logger.warning('MongoDB no responde: %s', exc)
+        checks['mongo'] = type(exc).__name__
+    checks['rabbit'] = None if rabbit_client.catalog_connected() else 'Sin conexión con RabbitMQ'
+    return checks
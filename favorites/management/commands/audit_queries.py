@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from favorites.indexes import apply_indexes, index_diff, sync_indexes
+from favorites.models import get_database, get_mongo_client
+from favorites.query_audit import audit, sample, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Explains the queries of the views against a seeded scratch database (or the configured '
+        'one with --live) and fails on collection scans, in-memory sorts and fetches in covered '
+        'queries. --apply / --sync make the configured database match favorites.indexes instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--live', action='store_true', help='explain against the configured database, unseeded'
+        )
+        parser.add_argument('--users', type=int, default=200, help='users in the seeded dataset')
+        parser.add_argument('--favorites-per-user', type=int, default=50)
+        parser.add_argument(
+            '--products', type=int, default=2000, help='distinct products in the seeded dataset'
+        )
+        parser.add_argument(
+            '--keep', action='store_true', help='do not drop the scratch database afterwards'
+        )
+        indexes = parser.add_mutually_exclusive_group()
+        indexes.add_argument(
+            '--apply', action='store_true',
+            help='create the declared indexes missing from the configured database',
+        )
+        indexes.add_argument(
+            '--sync', action='store_true',
+            help='also rebuild changed indexes and drop undeclared ones',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['apply'] or options['sync']:
+                return self._indexes(options['sync'])
+            if options['live']:
+                reports = self._live()
+            else:
+                reports = self._seeded(options)
+        except PyMongoError as exc:
+            raise CommandError(f'Error de MongoDB: {exc}') from exc
+
+        failed = [report for report in reports if report.problems]
+        for report in reports:
+            self._write_report(report)
+        if failed:
+            raise CommandError(
+                f'{len(failed)} de {len(reports)} consultas con planes problemáticos'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(reports)} consultas usan índices correctamente'
+        ))
+
+    def _indexes(self, sync):
+        database = get_database()
+        diff = sync_indexes(database) if sync else apply_indexes(database)
+        self._write_diff(diff, sync)
+        message = 'Índices sincronizados' if sync else 'Índices creados correctamente'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def _write_diff(self, diff, sync):
+        for collection, (missing, changed, extra) in diff.items():
+            for model in missing:
+                self.stdout.write(f'{collection}: creado {model.document["name"]}')
+            for model in changed:
+                action = 'reconstruido' if sync else 'difiere de la definición (usar --sync)'
+                self.stdout.write(f'{collection}: {model.document["name"]} {action}')
+            for name in extra:
+                action = 'eliminado' if sync else 'no declarado (usar --sync para eliminarlo)'
+                self.stdout.write(f'{collection}: {name} {action}')
+
+    def _live(self):
+        database = get_database()
+        for collection, (missing, changed, extra) in index_diff(database).items():
+            for model in missing + changed:
+                self.stdout.write(self.style.WARNING(
+                    f'{collection}: falta {model.document["name"]} o difiere de la definición'
+                ))
+        shape_sample = sample(database)
+        if shape_sample is None:
+            raise CommandError(
+                'La colección de favoritos está vacía: no hay datos con qué probar las consultas'
+            )
+        return audit(database, shape_sample)
+
+    def _seeded(self, options):
+        name = f'{settings.MONGODB_NAME}_query_audit'
+        client = get_mongo_client()
+        client.drop_database(name)
+        database = client[name]
+        try:
+            apply_indexes(database)
+            shape_sample = seed(
+                database, options['users'], options['favorites_per_user'], options['products']
+            )
+            return audit(database, shape_sample)
+        finally:
+            if not options['keep']:
+                client.drop_database(name)
+
+    def _write_report(self, report):
+        stats = report.stats or {}
+        counters = (
+            f"claves={stats.get('totalKeysExamined', '?')} "
+            f"docs={stats.get('totalDocsExamined', '?')} "
+            f"devueltos={stats.get('nReturned', '?')}"
+        )
+        if report.problems:
+            problems = ', '.join(report.problems)
+            self.stdout.write(self.style.ERROR(f'FALLA {report.shape.name}: {problems}'))
+        else:
+            self.stdout.write(f'OK    {report.shape.name}')
+        self.stdout.write(f'      {report.plan}  ({counters})')
@@ -0,0 +1,42 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from favorites.models import delete_favorites_for_products
+from favorites.rabbit_client import CatalogCleanupConsumer
+
+
+class Command(BaseCommand):
+    help = (
+        'Consumes article disabled/deleted events from the catalog and removes '
+        'the favorites of those articles in batches. Several instances can share the queue.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.CATALOG_CLEANUP_BATCH_SIZE)
+        parser.add_argument('--prefetch', type=int, default=settings.CATALOG_CLEANUP_PREFETCH)
+        parser.add_argument('--flush-interval', type=float, default=settings.CATALOG_CLEANUP_FLUSH_INTERVAL)
+
+    def _delete(self, article_ids):
+        started = time.monotonic()
+        deleted = delete_favorites_for_products(article_ids)
+        self.stdout.write(
+            f'{len(article_ids)} artículos dados de baja, {deleted} favoritos eliminados '
+            f'({(time.monotonic() - started) * 1000:.0f} ms)'
+        )
+
+    def handle(self, *args, **options):
+        consumer = CatalogCleanupConsumer(
+            self._delete,
+            batch_size=options['batch_size'],
+            prefetch=options['prefetch'],
+            flush_interval=options['flush_interval'],
+        )
+        signal.signal(signal.SIGTERM, lambda *_: consumer.stop())
+        try:
+            consumer.run()
+        except KeyboardInterrupt:
+            consumer.stop()
+        self.stdout.write(self.style.SUCCESS('Consumidor detenido'))
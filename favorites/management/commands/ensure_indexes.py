@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from favorites.models import ensure_indexes
+
+
+class Command(BaseCommand):
+    help = 'Creates the MongoDB indexes used by the favorites service.'
+
+    def handle(self, *args, **options):
+        try:
+            ensure_indexes()
+        except PyMongoError as exc:
+            raise CommandError(f'No se pudieron crear los índices: {exc}') from exc
+        self.stdout.write(self.style.SUCCESS('Índices creados correctamente'))
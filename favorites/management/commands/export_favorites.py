@@ -0,0 +1,55 @@
+import gzip
+import sys
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from favorites.export import export_cursor, export_query, ndjson_line
+from favorites.models import get_favorites_collection
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports favorites as NDJSON, one per line in _id order. '
+        'An interrupted export can be resumed with --after <last id>, which appends to --output.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='user_id', help='export only this user (default: every user)')
+        parser.add_argument('--after', help='resume after this favorite id')
+        parser.add_argument('--output', '-o', help='file to write (default: stdout)')
+        parser.add_argument('--gzip', action='store_true', help='gzip-compress the output')
+        parser.add_argument('--batch-size', type=int, default=settings.FAVORITES_EXPORT_BATCH_SIZE)
+
+    def _open(self, stack, options):
+        if options['output']:
+            output = stack.enter_context(open(options['output'], 'ab' if options['after'] else 'wb'))
+        else:
+            output = sys.stdout.buffer
+        if options['gzip']:
+            output = stack.enter_context(gzip.GzipFile(fileobj=output, mode='wb'))
+        return output
+
+    def handle(self, *args, **options):
+        try:
+            query = export_query(options['user_id'], options['after'])
+        except ValueError:
+            raise CommandError(f'ID de favorito inválido: {options["after"]}')
+
+        count, last_id = 0, options['after']
+        with ExitStack() as stack:
+            output = self._open(stack, options)
+            try:
+                for doc in export_cursor(get_favorites_collection(), query, options['batch_size']):
+                    output.write(ndjson_line(doc))
+                    count += 1
+                    last_id = doc['_id']
+            except PyMongoError as exc:
+                raise CommandError(
+                    f'Exportación interrumpida tras {count} favoritos ({exc}). '
+                    f'Para continuar: --after {last_id}'
+                ) from exc
+
+        self.stderr.write(self.style.SUCCESS(f'{count} favoritos exportados (último id: {last_id})'))
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from pymongo.errors import PyMongoError
+
+from favorites.write_behind import IntentProcessor
+
+
+class Command(BaseCommand):
+    help = (
+        'Write-behind worker: validates and writes the favorites queued in '
+        'favorite_intents. Several workers can run at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.FAVORITES_WRITE_BEHIND_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=settings.FAVORITES_WRITE_BEHIND_POLL_INTERVAL,
+                            help='seconds to wait when there is nothing to process')
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        processor = IntentProcessor(options['batch_size'])
+        processed = 0
+        while True:
+            try:
+                claimed = processor.run_once()
+            except PyMongoError as exc:
+                self.stderr.write(f'Error procesando solicitudes pendientes: {exc}')
+                claimed = 0
+                if options['once']:
+                    break
+            processed += claimed
+            if claimed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} solicitudes procesadas'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from favorites.models import rebuild_product_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconciles the product_stats counters with the favorites collection. '
+        'Safe to run while the service keeps writing; counters that keep '
+        'changing during the run are left for the next one.'
+    )
+
+    def handle(self, *args, **options):
+        try:
+            corrected, skipped = rebuild_product_stats()
+        except PyMongoError as exc:
+            raise CommandError(f'No se pudieron reconstruir los contadores: {exc}') from exc
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'{len(skipped)} productos cambiaron durante la reconstrucción; vuelva a ejecutarla'
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Contadores corregidos: {corrected}'))
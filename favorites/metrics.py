@@ -0,0 +1,204 @@
+"""
+Prometheus metrics for the request hot path.
+
+Calls to the auth service and RabbitMQ are wrapped in ``timed()``; MongoDB
+commands and connection pool checkouts are observed through the pymongo
+listeners returned by ``mongo_listeners()``. Besides feeding the histograms,
+every duration is added to a per-request breakdown that MetricsMiddleware
+sends back in the ``Server-Timing`` header.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+REQUEST_DURATION = Histogram(
+    'favorites_request_duration_seconds',
+    'Time spent serving a request, by view.',
+    ['view', 'method', 'status'],
+)
+DEPENDENCY_DURATION = Histogram(
+    'favorites_dependency_duration_seconds',
+    'Time spent waiting on the auth service, RabbitMQ or MongoDB.',
+    ['dependency', 'operation'],
+)
+DEPENDENCY_ERRORS = Counter(
+    'favorites_dependency_errors_total',
+    'Calls to a dependency that failed.',
+    ['dependency', 'operation'],
+)
+CACHE_LOOKUPS = Counter(
+    'favorites_cache_lookups_total',
+    'In-process cache lookups by result: hit, miss, or coalesced into a load already in flight.',
+    ['cache', 'result'],
+)
+RPC_TIMEOUTS = Counter(
+    'favorites_rabbit_rpc_timeouts_total',
+    'article_exist RPC replies that did not arrive before RABBIT_RPC_TIMEOUT.',
+)
+MONGO_POOL_WAIT = Histogram(
+    'favorites_mongo_pool_wait_seconds',
+    'Time spent waiting to check out a MongoDB connection from the pool.',
+    buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0),
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    'favorites_mongo_pool_checkout_failures_total',
+    'MongoDB connection checkouts that failed, by reason.',
+    ['reason'],
+)
+
+CIRCUIT_STATE = Gauge(
+    'favorites_circuit_breaker_state',
+    'Circuit breaker state by dependency: 0 closed, 1 half-open, 2 open.',
+    ['dependency'],
+    multiprocess_mode='max',
+)
+CIRCUIT_REJECTIONS = Counter(
+    'favorites_circuit_breaker_rejections_total',
+    'Calls refused without reaching the dependency, by reason: open, half_open or overloaded.',
+    ['dependency', 'reason'],
+)
+
+_timings = contextvars.ContextVar('favorites_request_timings', default=None)
+
+
+def start_request():
+    """Starts collecting the timing breakdown of the current request."""
+    return _timings.set({})
+
+
+def end_request(token):
+    """Stops collecting and returns ``{dependency: seconds}``."""
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings or {}
+
+
+def record(name, seconds):
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(dependency, operation):
+    """Times a call to ``dependency`` and counts it as failed if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DEPENDENCY_ERRORS.labels(dependency, operation).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        DEPENDENCY_DURATION.labels(dependency, operation).observe(elapsed)
+        record(dependency, elapsed)
+
+
+def server_timing(timings, total):
+    """Formats a timing breakdown as a ``Server-Timing`` header value."""
+    parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def render_metrics():
+    """Returns ``(body, content_type)`` in the Prometheus text format.
+
+    When ``PROMETHEUS_MULTIPROC_DIR`` is set (several worker processes),
+    the metrics of every worker are aggregated from that directory.
+    """
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class _CommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        DEPENDENCY_ERRORS.labels('mongo', event.command_name).inc()
+        self._observe(event)
+
+    @staticmethod
+    def _observe(event):
+        seconds = event.duration_micros / 1e6
+        DEPENDENCY_DURATION.labels('mongo', event.command_name).observe(seconds)
+        record('mongo', seconds)
+
+
+class _PoolListener(monitoring.ConnectionPoolListener):
+    """Measures how long each checkout waits for a free pooled connection."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _observe_wait(self):
+        started = getattr(self._local, 'started', None)
+        if started is None:
+            return
+        self._local.started = None
+        wait = time.perf_counter() - started
+        MONGO_POOL_WAIT.observe(wait)
+        record('mongo_pool', wait)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._observe_wait()
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.labels(event.reason).inc()
+        self._observe_wait()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+_mongo_listeners = [_CommandListener(), _PoolListener()]
+
+
+def mongo_listeners():
+    """Event listeners to register on every MongoClient."""
+    return list(_mongo_listeners)
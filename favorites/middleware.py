@@ -1,25 +1,186 @@
+import hashlib
+import os
+import threading
+import time
+
+import httpx
+import jwt
 import requests
+from asgiref.sync import markcoroutinefunction
 from django.conf import settings  # pyright: ignore[reportMissingImports]
 from django.http import JsonResponse  # pyright: ignore[reportMissingImports]
+from requests.adapters import HTTPAdapter
+
+from .cache import TTLCache
+from .circuit_breaker import CircuitOpenError, circuit_breaker
+from . import consistency, metrics, profiling
+from .jwt_auth import JWTVerifier
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_async_client = None
+_async_client_pid = None
+
+_REMOTE = object()
+
+_token_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE,
+    ttl=settings.AUTH_CACHE_TTL,
+    name='auth_token',
+)
+
+_breaker = circuit_breaker('auth', settings.AUTH_HTTP_TIMEOUT, settings.AUTH_MAX_IN_FLIGHT)
+
+
+def get_auth_session():
+    """Returns the keep-alive session used to call the auth service."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.AUTH_HTTP_POOL_SIZE,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+                _session_pid = pid
+    return _session
+
+
+def get_async_auth_client():
+    """Returns the keep-alive httpx client used by AsyncAuthMiddleware."""
+    global _async_client, _async_client_pid
+    pid = os.getpid()
+    if _async_client is None or _async_client_pid != pid:
+        _async_client = httpx.AsyncClient(
+            timeout=settings.AUTH_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.AUTH_HTTP_POOL_SIZE,
+                max_keepalive_connections=settings.AUTH_HTTP_POOL_SIZE,
+            ),
+        )
+        _async_client_pid = pid
+    return _async_client
+
+
+def reset_auth_clients():
+    """Drops the auth HTTP clients (e.g. inherited through a fork) so fresh ones are built."""
+    global _session, _session_pid, _async_client, _async_client_pid, _session_lock
+    _session_lock = threading.Lock()
+    _session = _session_pid = None
+    _async_client = _async_client_pid = None
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _fetch_current_user(token):
+    """Asks the auth service who owns ``token``. Returns (status_code, user_data)."""
+    with _breaker.call() as call, metrics.timed('auth', 'current_user'):
+        response = get_auth_session().get(
+            f"{settings.AUTH_SERVICE_URL}/users/current",
+            headers={'Authorization': f'Bearer {token}'},
+            timeout=_breaker.timeout(),
+        )
+        if response.status_code >= 500:
+            call.fail()
+    if response.status_code != 200:
+        return response.status_code, None
+    return response.status_code, response.json()
+
+
+def _cache_ttl(result):
+    status_code, _ = result
+    if status_code == 200:
+        return settings.AUTH_CACHE_TTL
+    if status_code == 401:
+        return settings.AUTH_CACHE_NEGATIVE_TTL
+    return 0
+
+
+async def _afetch_current_user(token):
+    with _breaker.call() as call, metrics.timed('auth', 'current_user'):
+        response = await get_async_auth_client().get(
+            f"{settings.AUTH_SERVICE_URL}/users/current",
+            headers={'Authorization': f'Bearer {token}'},
+            timeout=_breaker.timeout(),
+        )
+        if response.status_code >= 500:
+            call.fail()
+    if response.status_code != 200:
+        return response.status_code, None
+    return response.status_code, response.json()
+
+
+def _authenticate_remote(token):
+    """Validates ``token`` against the auth service. Returns (user_id, user_data) or None."""
+    status_code, user_data = _token_cache.get_or_load(
+        _token_key(token),
+        lambda: _fetch_current_user(token),
+        ttl=_cache_ttl,
+    )
+    if status_code != 200:
+        return None
+    return user_data.get('id') or user_data.get('_id'), user_data
+
+
+async def _aauthenticate_remote(token):
+    status_code, user_data = await _token_cache.aget_or_load(
+        _token_key(token),
+        lambda: _afetch_current_user(token),
+        ttl=_cache_ttl,
+    )
+    if status_code != 200:
+        return None
+    return user_data.get('id') or user_data.get('_id'), user_data
+
+
+def _unavailable(exc):
+    """503 for a call refused by the auth breaker, telling the client when to retry."""
+    response = JsonResponse(
+        {'error': 'Servicio de autenticación no disponible, intente más tarde'},
+        status=503
+    )
+    response['Retry-After'] = str(exc.retry_after)
+    return response
 
 
 class AuthMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
-        self.exempt_paths = ['/admin/']
+        self.exempt_paths = ['/admin/', '/metrics', '/health/']
+        self.verifier = JWTVerifier() if settings.AUTH_MODE == 'jwt' else None
 
-    def __call__(self, request):
-        if any(request.path.startswith(path) for path in self.exempt_paths):
-            return self.get_response(request)
+    def _verify_locally(self, token):
+        """Returns (user_id, user_data), None for a rejected token, or
+        ``_REMOTE`` when the auth service should be asked instead."""
+        if self.verifier is None:
+            return _REMOTE
+        try:
+            return self.verifier.verify(token)
+        except jwt.PyJWTError:
+            return _REMOTE if settings.AUTH_JWT_REMOTE_FALLBACK else None
 
-        django_request = request
-        if hasattr(request, '_request'):
-            django_request = request._request
-        
+    def _authenticate(self, token):
+        user = self._verify_locally(token)
+        if user is _REMOTE:
+            return _authenticate_remote(token)
+        return user
+
+    def _get_token(self, request):
+        """Returns (token, None) or (None, error_response)."""
+        django_request = getattr(request, '_request', request)
         auth_header = django_request.META.get('HTTP_AUTHORIZATION', '')
         
         if not auth_header.startswith('Bearer '):
-            return JsonResponse(
+            return None, JsonResponse(
                 {'error': 'Token de autenticación requerido'},
                 status=401
             )
@@ -27,39 +188,242 @@ class AuthMiddleware:
         token = auth_header.split(' ')[1] if len(auth_header.split(' ')) > 1 else None
         
         if not token:
-            return JsonResponse(
+            return None, JsonResponse(
                 {'error': 'Token de autenticación inválido'},
                 status=401
             )
+        return token, None
+
+    @staticmethod
+    def _set_user(request, user_id, user_data):
+        django_request = getattr(request, '_request', request)
+        django_request.user_id = user_id
+        django_request.user_data = user_data
+        if hasattr(request, '_request'):
+            request.user_id = user_id
+            request.user_data = user_data
+
+    def _is_exempt(self, request):
+        return any(request.path.startswith(path) for path in self.exempt_paths)
+
+    def __call__(self, request):
+        if self._is_exempt(request):
+            return self.get_response(request)
+
+        token, error = self._get_token(request)
+        if error is not None:
+            return error
 
         try:
-            auth_url = f"{settings.AUTH_SERVICE_URL}/users/current"
-            response = requests.get(
-                auth_url,
-                headers={'Authorization': f'Bearer {token}'},
-                timeout=5
-            )
-            
-            if response.status_code != 200:
-                return JsonResponse(
-                    {'error': 'Token de autenticación inválido o expirado'},
-                    status=401
-                )
-            
-            user_data = response.json()
-            user_id = user_data.get('id') or user_data.get('_id')
-            
-            django_request.user_id = user_id
-            django_request.user_data = user_data
-            if hasattr(request, '_request'):
-                request.user_id = user_id
-                request.user_data = user_data
-            
+            user = self._authenticate(token)
+        except CircuitOpenError as exc:
+            return _unavailable(exc)
         except requests.exceptions.RequestException as e:
             return JsonResponse(
                 {'error': f'Error al validar token: {str(e)}'},
                 status=503
             )
 
+        if user is None:
+            return JsonResponse(
+                {'error': 'Token de autenticación inválido o expirado'},
+                status=401
+            )
+
+        self._set_user(request, *user)
         return self.get_response(request)
 
+
+class AsyncAuthMiddleware(AuthMiddleware):
+    """AuthMiddleware for the async (ASGI) serving mode."""
+
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        markcoroutinefunction(self)
+
+    async def _aauthenticate(self, token):
+        user = self._verify_locally(token)
+        if user is _REMOTE:
+            return await _aauthenticate_remote(token)
+        return user
+
+    async def __call__(self, request):
+        if self._is_exempt(request):
+            return await self.get_response(request)
+
+        token, error = self._get_token(request)
+        if error is not None:
+            return error
+
+        try:
+            user = await self._aauthenticate(token)
+        except CircuitOpenError as exc:
+            return _unavailable(exc)
+        except httpx.HTTPError as e:
+            return JsonResponse(
+                {'error': f'Error al validar token: {str(e)}'},
+                status=503
+            )
+
+        if user is None:
+            return JsonResponse(
+                {'error': 'Token de autenticación inválido o expirado'},
+                status=401
+            )
+
+        self._set_user(request, *user)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """Records the latency of every view and adds the ``Server-Timing`` header.
+
+    Goes first in MIDDLEWARE so the measured time includes authentication.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _finish(self, request, response, token, started):
+        elapsed = time.perf_counter() - started
+        timings = metrics.end_request(token)
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        metrics.REQUEST_DURATION.labels(view, request.method, response.status_code).observe(elapsed)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(timings, elapsed)
+        return response
+
+    def __call__(self, request):
+        token = metrics.start_request()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        return self._finish(request, response, token, started)
+
+
+class AsyncMetricsMiddleware(MetricsMiddleware):
+    """MetricsMiddleware for the async (ASGI) serving mode."""
+
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        token = metrics.start_request()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self._finish(request, response, token, started)
+
+
+class CausalConsistencyMiddleware:
+    """Reads the client's causal token and hands back the one of its latest write.
+
+    The token travels in the ``X-Causal-Token`` header or the
+    ``causal_token`` cookie; see ``favorites.consistency``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def _incoming(request):
+        return request.headers.get(consistency.HEADER) or request.COOKIES.get(consistency.COOKIE)
+
+    @staticmethod
+    def _finish(request, response, token):
+        if token is not None:
+            response[consistency.HEADER] = token
+            response.set_cookie(
+                consistency.COOKIE,
+                token,
+                max_age=settings.MONGODB_CAUSAL_TOKEN_MAX_AGE,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        reset_token = consistency.start_request(self._incoming(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            token = consistency.end_request(reset_token)
+        return self._finish(request, response, token)
+
+
+class AsyncCausalConsistencyMiddleware(CausalConsistencyMiddleware):
+    """CausalConsistencyMiddleware for the async (ASGI) serving mode."""
+
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        reset_token = consistency.start_request(self._incoming(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            token = await consistency.aend_request(reset_token)
+        return self._finish(request, response, token)
+
+
+class ProfilingMiddleware:
+    """Profiles sampled requests; see ``favorites.profiling``.
+
+    Profiled responses carry ``X-Profile-Id``, the name of the files written
+    to PROFILING_DIR.
+    """
+
+    def __init__(self, get_response):
+        profiling.check_settings()
+        self.get_response = get_response
+
+    @staticmethod
+    def _finish(profile, request, response):
+        name = profiling.save_profile(profile, request, response)
+        if name is not None:
+            response['X-Profile-Id'] = name
+        return response
+
+    def __call__(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+
+        profile = profiling.start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        return self._finish(profile, request, response)
+
+
+class AsyncProfilingMiddleware(ProfilingMiddleware):
+    """ProfilingMiddleware for the async (ASGI) serving mode."""
+
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        if not profiling.should_profile(request):
+            return await self.get_response(request)
+
+        profile = profiling.start_profile()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.stop()
+        return self._finish(profile, request, response)
@@ -1,23 +1,485 @@
-from pymongo import MongoClient
-from django.conf import settings
+import functools
+import itertools
+import logging
+import os
+import threading
 from datetime import datetime
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from bson import ObjectId
+from pymongo import DeleteOne, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from .consistency import acausal_write, causal_write
+from .favorite_sets import invalidate_favorite_set
+from .indexes import apply_indexes
+from .metrics import mongo_listeners
+from .profiling import mongo_listeners as profiling_listeners
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _event_listeners():
+    listeners = mongo_listeners() if settings.METRICS_ENABLED else []
+    if settings.PROFILING_ENABLED:
+        listeners += profiling_listeners()
+    return listeners
+
 
 def get_mongo_client():
-    return MongoClient(settings.MONGODB_HOST)
+    """Returns the process-wide MongoClient, re-created after a fork."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = MongoClient(
+                    settings.MONGODB_HOST,
+                    maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+                    minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+                    maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+                    waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                    event_listeners=_event_listeners(),
+                    connect=False,
+                )
+                _client_pid = pid
+    return _client
+
+
+def reset_mongo_client():
+    """Drops the shared client so the next call builds a fresh one."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+_async_client = None
+_async_client_pid = None
+
+
+def get_async_mongo_client():
+    """Returns the process-wide Motor client used by the async views."""
+    global _async_client, _async_client_pid
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    pid = os.getpid()
+    if _async_client is None or _async_client_pid != pid:
+        _async_client = AsyncIOMotorClient(
+            settings.MONGODB_HOST,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=_event_listeners(),
+        )
+        _async_client_pid = pid
+    return _async_client
+
+
+_READ_PREFERENCE_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+# Lowest maxStalenessSeconds drivers accept (heartbeat plus idle write period).
+_SMALLEST_MAX_STALENESS = 90
+
+
+def parse_read_preference(value):
+    """Parses ``'mode'`` or ``'mode:max_staleness_seconds'`` (e.g. ``'nearest:90'``)."""
+    mode, _, max_staleness = value.partition(':')
+    if mode not in _READ_PREFERENCE_MODES:
+        raise ImproperlyConfigured(f'Unknown MongoDB read preference: {value!r}')
+    if mode == 'primary':
+        if max_staleness:
+            raise ImproperlyConfigured('maxStalenessSeconds cannot be combined with primary')
+        return Primary()
+    try:
+        seconds = int(max_staleness) if max_staleness else -1
+    except ValueError as exc:
+        raise ImproperlyConfigured(f'Invalid MongoDB read preference {value!r}: {exc}') from exc
+    if seconds != -1 and seconds < _SMALLEST_MAX_STALENESS:
+        raise ImproperlyConfigured(f'maxStalenessSeconds must be at least {_SMALLEST_MAX_STALENESS}: {value!r}')
+    return _READ_PREFERENCE_MODES[mode](max_staleness=seconds)
+
+
+@functools.lru_cache(maxsize=None)
+def read_preference(endpoint):
+    """Read preference configured for ``endpoint`` in MONGODB_READ_PREFERENCES (primary by default)."""
+    return parse_read_preference(settings.MONGODB_READ_PREFERENCES.get(endpoint) or 'primary')
+
+
+def _reading_for(collection, endpoint):
+    if endpoint is None:
+        return collection
+    return collection.with_options(read_preference=read_preference(endpoint))
+
+
+def get_database():
+    return get_mongo_client()[settings.MONGODB_NAME]
+
+
+def get_favorites_collection(endpoint=None):
+    """Pass ``endpoint`` to read with its MONGODB_READ_PREFERENCES entry."""
+    return _reading_for(get_database()['favorites'], endpoint)
+
+
+def get_product_stats_collection(endpoint=None):
+    return _reading_for(get_database()['product_stats'], endpoint)
+
+
+def get_user_versions_collection(endpoint=None):
+    return _reading_for(get_database()['user_versions'], endpoint)
+
+
+def get_favorite_intents_collection():
+    return get_database()['favorite_intents']
+
+
+def get_async_favorites_collection(endpoint=None):
+    return _reading_for(get_async_mongo_client()[settings.MONGODB_NAME]['favorites'], endpoint)
+
+
+def get_async_product_stats_collection(endpoint=None):
+    return _reading_for(get_async_mongo_client()[settings.MONGODB_NAME]['product_stats'], endpoint)
+
+
+def get_async_user_versions_collection(endpoint=None):
+    return _reading_for(get_async_mongo_client()[settings.MONGODB_NAME]['user_versions'], endpoint)
+
+
+def get_async_favorite_intents_collection():
+    return get_async_mongo_client()[settings.MONGODB_NAME]['favorite_intents']
+
+
+def ensure_indexes():
+    """Creates the indexes declared in ``favorites.indexes``. Safe to run repeatedly."""
+    apply_indexes(get_database())
+
+
+def favorite_upsert_update(notes, now, inserted_id=None):
+    """Update document that upserts a favorite keyed by (user_id, product_id).
+
+    New favorites are created with ``notes`` (and ``inserted_id`` as their
+    ``_id`` when given); existing ones only get their notes overwritten when
+    some were given.
+    """
+    if notes:
+        update = {
+            '$set': {'notes': notes, 'updated_at': now},
+            '$setOnInsert': {'created_at': now},
+        }
+    else:
+        update = {'$setOnInsert': {'notes': '', 'created_at': now, 'updated_at': now}}
+    if inserted_id is not None:
+        update['$setOnInsert']['_id'] = inserted_id
+    return update
+
+
+def upsert_favorite(collection, user_id, product_id, notes):
+    """Creates or updates a favorite in one round trip.
+
+    Returns (document, created). The ``_id`` is generated client side so a
+    freshly inserted document can be told apart from an existing one.
+    """
+    now = datetime.utcnow()
+    inserted_id = ObjectId()
+    for attempt in range(2):
+        try:
+            doc = collection.find_one_and_update(
+                {'user_id': user_id, 'product_id': product_id},
+                favorite_upsert_update(notes, now, inserted_id),
+                projection=FAVORITE_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return doc, doc['_id'] == inserted_id
+        except DuplicateKeyError:
+            # A concurrent request inserted it first; the retry will match it.
+            if attempt:
+                raise
+
+
+async def aupsert_favorite(collection, user_id, product_id, notes):
+    """Async variant of ``upsert_favorite``."""
+    now = datetime.utcnow()
+    inserted_id = ObjectId()
+    for attempt in range(2):
+        try:
+            doc = await collection.find_one_and_update(
+                {'user_id': user_id, 'product_id': product_id},
+                favorite_upsert_update(notes, now, inserted_id),
+                projection=FAVORITE_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return doc, doc['_id'] == inserted_id
+        except DuplicateKeyError:
+            if attempt:
+                raise
 
 
-def get_favorites_collection():
-    client = get_mongo_client()
-    db = client[settings.MONGODB_NAME]
-    collection = db['favorites']
-    collection.create_index([('user_id', 1), ('product_id', 1)], unique=True)
-    collection.create_index([('user_id', 1)])
-    collection.create_index([('product_id', 1)])
-    return collection
+def _bulk_write_failures(details):
+    """Splits a BulkWriteError into (upserted, failed, duplicate_key) indexes."""
+    upserted = {item['index'] for item in details.get('upserted', [])}
+    errors = details.get('writeErrors', [])
+    failed = {error['index'] for error in errors if error.get('code') != 11000}
+    duplicates = [error['index'] for error in errors if error.get('code') == 11000]
+    return upserted, failed, duplicates
+
+
+def bulk_upsert(collection, operations):
+    """Runs ``operations`` as one unordered bulk_write.
+
+    Returns (upserted_indexes, failed_indexes). Upserts that lost a race
+    against a concurrent insert (duplicate key) are retried once.
+    """
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        return set(result.upserted_ids), set()
+    except BulkWriteError as exc:
+        upserted, failed, retry = _bulk_write_failures(exc.details)
+
+    if retry:
+        try:
+            collection.bulk_write([operations[index] for index in retry], ordered=False)
+        except BulkWriteError as exc:
+            failed.update(retry[error['index']] for error in exc.details.get('writeErrors', []))
+    return upserted, failed
+
+
+async def abulk_upsert(collection, operations):
+    """Async variant of ``bulk_upsert``."""
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        return set(result.upserted_ids), set()
+    except BulkWriteError as exc:
+        upserted, failed, retry = _bulk_write_failures(exc.details)
+
+    if retry:
+        try:
+            await collection.bulk_write([operations[index] for index in retry], ordered=False)
+        except BulkWriteError as exc:
+            failed.update(retry[error['index']] for error in exc.details.get('writeErrors', []))
+    return upserted, failed
+
+
+def _favorite_count_operations(product_ids, delta, now):
+    update = {'$inc': {'favorite_count': delta}}
+    if delta > 0:
+        # Deletes leave it alone: last_added may name a favorite that is
+        # gone until rebuild_product_stats recomputes it.
+        update['$max'] = {'last_added': now or datetime.utcnow()}
+    return [UpdateOne({'_id': product_id}, update, upsert=delta > 0) for product_id in product_ids]
+
+
+def increment_favorite_counts(product_ids, delta, now=None):
+    """Applies ``delta`` to the product_stats counter of each product.
+
+    Counters are best effort: failures are logged and left for the
+    ``rebuild_product_stats`` command to reconcile.
+    """
+    if not product_ids:
+        return
+    try:
+        get_product_stats_collection().bulk_write(
+            _favorite_count_operations(product_ids, delta, now), ordered=False
+        )
+    except PyMongoError as exc:
+        logger.warning('No se pudieron actualizar los contadores de favoritos: %s', exc)
+
+
+async def aincrement_favorite_counts(product_ids, delta, now=None):
+    """Async variant of ``increment_favorite_counts``."""
+    if not product_ids:
+        return
+    try:
+        await get_async_product_stats_collection().bulk_write(
+            _favorite_count_operations(product_ids, delta, now), ordered=False
+        )
+    except PyMongoError as exc:
+        logger.warning('No se pudieron actualizar los contadores de favoritos: %s', exc)
+
+
+_USER_VERSION_UPDATE = {'$inc': {'version': 1}, '$currentDate': {'updated_at': True}}
+
+
+def get_user_version(user_id, endpoint=None, session=None):
+    """Returns the ``{'version', 'updated_at'}`` document of a user's favorites, or None."""
+    return get_user_versions_collection(endpoint).find_one({'_id': user_id}, session=session)
+
+
+async def aget_user_version(user_id, endpoint=None, session=None):
+    return await get_async_user_versions_collection(endpoint).find_one({'_id': user_id}, session=session)
+
+
+def bump_user_version(user_id):
+    """Marks a user's favorites as changed, so ETags handed out before no longer match.
+
+    Must be called after every write to the user's favorites. As the last
+    write of the request, it also provides the causal token handed back to
+    the client (see ``consistency``).
+    """
+    with causal_write(get_mongo_client()) as session:
+        get_user_versions_collection().update_one(
+            {'_id': user_id}, _USER_VERSION_UPDATE, upsert=True, session=session
+        )
+    invalidate_favorite_set(user_id)
+
+
+async def abump_user_version(user_id):
+    """Async variant of ``bump_user_version``."""
+    async with acausal_write(get_async_mongo_client()) as session:
+        await get_async_user_versions_collection().update_one(
+            {'_id': user_id}, _USER_VERSION_UPDATE, upsert=True, session=session
+        )
+    invalidate_favorite_set(user_id)
+
+
+def bump_user_versions(user_ids):
+    """``bump_user_version`` for many users in one bulk write."""
+    if not user_ids:
+        return
+    operations = [UpdateOne({'_id': user_id}, _USER_VERSION_UPDATE, upsert=True) for user_id in user_ids]
+    get_user_versions_collection().bulk_write(operations, ordered=False)
+    for user_id in user_ids:
+        invalidate_favorite_set(user_id)
+
+
+def delete_favorites_for_products(product_ids):
+    """Removes every favorite of ``product_ids`` and their counters.
+
+    Returns the number of favorites deleted. The affected users' versions
+    are bumped, CATALOG_CLEANUP_VERSION_BATCH_SIZE users per bulk write, so
+    their cached reads are refreshed.
+    """
+    collection = get_favorites_collection()
+    query = {'product_id': {'$in': list(product_ids)}}
+    # A cursor rather than distinct(): popular products have more users
+    # than fit in a single 16 MB reply.
+    user_ids = [doc['_id'] for doc in collection.aggregate(
+        [{'$match': query}, {'$group': {'_id': '$user_id'}}],
+        allowDiskUse=True,
+    )]
+    deleted = collection.delete_many(query).deleted_count
+    size = settings.CATALOG_CLEANUP_VERSION_BATCH_SIZE
+    for start in range(0, len(user_ids), size):
+        bump_user_versions(user_ids[start:start + size])
+    get_product_stats_collection().delete_many({'_id': {'$in': list(product_ids)}})
+    return deleted
+
+
+_REBUILD_BATCH_SIZE = 500
+_REBUILD_ATTEMPTS = 3
+
+
+def _stat_operations(product_ids, live, actual):
+    """Returns (upserts, updates, deletes) turning the ``live`` stats into the ``actual`` ones.
+
+    Each operation only applies if the counter still holds the value read,
+    so an ``$inc`` landing meanwhile makes it miss instead of being lost.
+    """
+    upserts, updates, deletes = [], [], []
+    for product_id in product_ids:
+        current, expected = live.get(product_id), actual.get(product_id)
+        if current is None and expected is not None:
+            upserts.append(UpdateOne({'_id': product_id}, {'$setOnInsert': expected}, upsert=True))
+        elif current is not None and expected is None:
+            deletes.append(DeleteOne({'_id': product_id, 'favorite_count': current['favorite_count']}))
+        elif current is not None and any(current.get(field) != value for field, value in expected.items()):
+            updates.append(UpdateOne(
+                {'_id': product_id, 'favorite_count': current['favorite_count'], 'last_added': current.get('last_added')},
+                {'$set': expected},
+            ))
+    return upserts, updates, deletes
+
+
+def _reconcile_stats(product_ids):
+    """Fixes the counters of ``product_ids``. Returns (corrected, product ids to compare again)."""
+    stats = get_product_stats_collection()
+    live = {doc['_id']: doc for doc in stats.find({'_id': {'$in': product_ids}})}
+    actual = {
+        doc.pop('_id'): doc
+        for doc in get_favorites_collection().aggregate([
+            {'$match': {'product_id': {'$in': product_ids}}},
+            {'$group': {'_id': '$product_id', 'favorite_count': {'$sum': 1}, 'last_added': {'$max': '$created_at'}}},
+        ])
+    }
+    upserts, updates, deletes = _stat_operations(product_ids, live, actual)
+    if not (upserts or updates or deletes):
+        return 0, []
+    result = stats.bulk_write(upserts + updates + deletes, ordered=False)
+    corrected = result.upserted_count + result.modified_count + result.deleted_count
+    if (result.upserted_count, result.matched_count, result.deleted_count) == (len(upserts), len(updates), len(deletes)):
+        return corrected, []
+    # Some counter moved under us: compare the whole batch again.
+    return corrected, product_ids
+
+
+def _stat_product_ids():
+    """Yields every product id with a counter or a favorite, without holding a 16 MB reply."""
+    seen = set()
+    for doc in get_product_stats_collection().find({}, {'_id': 1}):
+        seen.add(doc['_id'])
+        yield doc['_id']
+    for doc in get_favorites_collection().aggregate([{'$group': {'_id': '$product_id'}}], allowDiskUse=True):
+        if doc['_id'] not in seen:
+            yield doc['_id']
+
+
+def rebuild_product_stats():
+    """Reconciles product_stats with the favorites collection while it keeps receiving writes.
+
+    Counters are recomputed in batches and only replaced where they differ,
+    each one only if it did not change since it was read; the ones that did
+    are retried. Returns (counters corrected, product ids left unchecked).
+    A favorite created or deleted exactly while its batch is compared can
+    still leave its counter off by one until the next run.
+    """
+    corrected, skipped = 0, []
+    product_ids = _stat_product_ids()
+    while True:
+        batch = list(itertools.islice(product_ids, _REBUILD_BATCH_SIZE))
+        if not batch:
+            return corrected, skipped
+        for _ in range(_REBUILD_ATTEMPTS):
+            fixed, batch = _reconcile_stats(batch)
+            corrected += fixed
+            if not batch:
+                break
+        skipped += batch
+
+
+FAVORITE_PROJECTION = {
+    'product_id': 1,
+    'user_id': 1,
+    'notes': 1,
+    'created_at': 1,
+    'updated_at': 1,
+}
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
 
 
 class Favorite:
+    __slots__ = ('_id', 'product_id', 'user_id', 'notes', 'created_at', 'updated_at')
+
     def __init__(self, product_id, user_id, notes=None, created_at=None, updated_at=None, _id=None):
         self._id = _id
         self.product_id = product_id
@@ -32,8 +494,8 @@ class Favorite:
             'product_id': self.product_id,
             'user_id': self.user_id,
             'notes': self.notes,
-            'created_at': self.created_at.isoformat() if isinstance(self.created_at, datetime) else str(self.created_at),
-            'updated_at': self.updated_at.isoformat() if isinstance(self.updated_at, datetime) else str(self.updated_at),
+            'created_at': _isoformat(self.created_at),
+            'updated_at': _isoformat(self.updated_at),
         }
     
     @classmethod
@@ -47,3 +509,17 @@ class Favorite:
             updated_at=data.get('updated_at')
         )
 
+    @staticmethod
+    def serialize(data):
+        """Same output as ``from_dict(data).to_dict()`` without building a Favorite."""
+        _id = data.get('_id')
+        created_at = data.get('created_at') or datetime.utcnow()
+        updated_at = data.get('updated_at') or datetime.utcnow()
+        return {
+            'id': str(_id) if _id else None,
+            'product_id': data.get('product_id'),
+            'user_id': data.get('user_id'),
+            'notes': data.get('notes') or '',
+            'created_at': _isoformat(created_at),
+            'updated_at': _isoformat(updated_at),
+        }
@@ -0,0 +1,239 @@
+"""
+Opt-in profiling of individual requests (PROFILING_ENABLED).
+
+ProfilingMiddleware (favorites.middleware) profiles a sample of the
+requests (PROFILING_SAMPLE_RATE) and every request sending ``X-Profile:
+<PROFILING_SECRET>``. Each one is run under a stack sampler
+(flamegraph-ready ``.folded`` stacks) or cProfile (``.prof``), and the
+MongoDB commands it issued are captured by a pymongo listener. The
+profile and a ``.json`` summary are written to PROFILING_DIR, whose
+oldest files are removed beyond PROFILING_MAX_BYTES.
+
+When disabled neither the middleware nor the listener is installed. Motor
+runs commands on other threads, so in ASYNC_MODE the summary lists no
+MongoDB commands, and cProfile also sees the other requests sharing the
+event loop.
+"""
+import cProfile
+import contextvars
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+
+MODES = ('sampling', 'cprofile')
+
+_current = contextvars.ContextVar('favorites_profile', default=None)
+
+
+class _StackSampler:
+    """Counts the stacks of one thread, sampled every ``interval`` seconds."""
+
+    def __init__(self, thread_id, interval):
+        self.stacks = Counter()
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='favorites-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class RequestProfile:
+    """Profiler and MongoDB command log of one request."""
+
+    def __init__(self, mode, interval):
+        self.mode = mode
+        self.interval = interval
+        self.commands = []
+        self.duration = None
+        self._started_commands = {}
+        self._profiler = None
+        self._started = None
+        self._token = None
+
+    def start(self):
+        self._token = _current.set(self)
+        self._started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = _StackSampler(threading.get_ident(), self.interval)
+            self._profiler.start()
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self.duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+
+    def command_started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        self._started_commands[event.request_id] = collection
+
+    def command_finished(self, event, ok):
+        self.commands.append({
+            'command': event.command_name,
+            'collection': self._started_commands.pop(event.request_id, None),
+            'duration_ms': round(event.duration_micros / 1000, 3),
+            'ok': ok,
+        })
+
+    def summary(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match is not None else None,
+            'status': response.status_code,
+            'user_id': getattr(request, 'user_id', None),
+            'duration_ms': round(self.duration * 1000, 3),
+            'mode': self.mode,
+            'mongo_commands': self.commands,
+            'mongo_ms': round(sum(command['duration_ms'] for command in self.commands), 3),
+        }
+
+    def save(self, directory, name, request, response):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        if self.mode == 'cprofile':
+            self._profiler.dump_stats(base + '.prof')
+        else:
+            with open(base + '.folded', 'w', encoding='utf-8') as handle:
+                handle.write(self._profiler.folded())
+        with open(base + '.json', 'w', encoding='utf-8') as handle:
+            json.dump(self.summary(request, response), handle, indent=2, default=str)
+
+
+def rotate(directory, max_bytes):
+    """Removes the oldest profiles of ``directory`` until it holds at most ``max_bytes``.
+
+    The files of a profile share their name and are removed together; the
+    newest profile is always kept.
+    """
+    profiles = {}
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        else:
+            name = os.path.splitext(entry.name)[0]
+            mtime, size, paths = profiles.get(name, (0, 0, []))
+            profiles[name] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+    total = sum(size for _, size, _ in profiles.values())
+    for _, size, paths in sorted(profiles.values())[:-1]:
+        if total <= max_bytes:
+            break
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+
+class _CommandListener(monitoring.CommandListener):
+    """Feeds the commands of profiled requests to their RequestProfile."""
+
+    def started(self, event):
+        profile = _current.get()
+        if profile is not None:
+            profile.command_started(event)
+
+    def succeeded(self, event):
+        profile = _current.get()
+        if profile is not None:
+            profile.command_finished(event, True)
+
+    def failed(self, event):
+        profile = _current.get()
+        if profile is not None:
+            profile.command_finished(event, False)
+
+
+_command_listener = _CommandListener()
+
+
+def mongo_listeners():
+    """Event listeners to register on every MongoClient while profiling is enabled."""
+    return [_command_listener]
+
+
+def check_settings():
+    if settings.PROFILING_MODE not in MODES:
+        raise ImproperlyConfigured(
+            f'PROFILING_MODE must be one of {MODES}: {settings.PROFILING_MODE!r}'
+        )
+
+
+def should_profile(request):
+    """Whether to profile ``request``: it sent the profiling secret or was sampled."""
+    secret = settings.PROFILING_SECRET
+    if secret:
+        header = request.headers.get(HEADER)
+        if header and hmac.compare_digest(header.encode('utf-8'), secret.encode('utf-8')):
+            return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def start_profile():
+    profile = RequestProfile(settings.PROFILING_MODE, settings.PROFILING_INTERVAL)
+    profile.start()
+    return profile
+
+
+def save_profile(profile, request, response):
+    """Writes the profile to PROFILING_DIR and rotates it. Returns the file name, or None."""
+    name = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:12]}'
+    try:
+        profile.save(settings.PROFILING_DIR, name, request, response)
+        rotate(settings.PROFILING_DIR, settings.PROFILING_MAX_BYTES)
+    except OSError as exc:
+        logger.warning('No se pudo guardar el perfil de %s: %s', request.path, exc)
+        return None
+    return name
@@ -0,0 +1,251 @@
+"""
+Query plan audit of the queries the views send to MongoDB.
+
+Every entry of ``QUERY_SHAPES`` rebuilds one of those queries with the
+builders of ``favorites.view_logic`` and asks the server to ``explain``
+it. A plan is flagged when it scans a whole collection (COLLSCAN), sorts
+in memory (SORT) or, for the queries meant to be answered from an index
+alone, fetches documents (FETCH). Run it with ``manage.py audit_queries``,
+on a seeded scratch database or on the configured one.
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+
+from .export import export_cursor, export_query
+from .models import FAVORITE_PROJECTION, favorite_upsert_update
+from .view_logic import (
+    FavoritesPage,
+    batch_documents_query,
+    counts_query,
+    encode_cursor,
+    favorite_key,
+    intent_query,
+    lookup_query,
+    popular_cursor,
+    products_query,
+)
+from .write_behind import new_intent
+
+
+class QueryShape:
+    """A query of the views. ``explain(database, sample)`` returns its explain output."""
+
+    def __init__(self, name, explain, covered=False):
+        self.name = name
+        self.explain = explain
+        self.covered = covered
+
+
+def _command(database, command):
+    return database.command({'explain': command, 'verbosity': 'executionStats'})
+
+
+def _count(database, collection, query):
+    # count_documents() runs this pipeline.
+    return _command(database, {
+        'aggregate': collection,
+        'pipeline': [{'$match': query}, {'$group': {'_id': 1, 'n': {'$sum': 1}}}],
+        'cursor': {},
+    })
+
+
+def _favorite_key(sample):
+    return favorite_key(sample['user_id'], sample['product_ids'][0])
+
+
+def _export(database, user_id, after=None):
+    query = export_query(user_id, after)
+    cursor = export_cursor(database['favorites'], query, settings.FAVORITES_EXPORT_BATCH_SIZE)
+    return cursor.explain()
+
+
+QUERY_SHAPES = [
+    QueryShape('list_favorites (page)', lambda db, s: (
+        FavoritesPage(s['user_id'], {'page': '2'}).cursor(db['favorites']).explain()
+    )),
+    QueryShape('list_favorites (after)', lambda db, s: (
+        FavoritesPage(s['user_id'], {'after': encode_cursor(s['favorite'])})
+        .cursor(db['favorites']).explain()
+    )),
+    QueryShape('list_favorites (count)', lambda db, s: (
+        _count(db, 'favorites', {'user_id': s['user_id']})
+    )),
+    QueryShape('list_favorites (POST)', lambda db, s: _command(db, {
+        'findAndModify': 'favorites',
+        'query': _favorite_key(s),
+        'update': favorite_upsert_update('', datetime.utcnow(), ObjectId()),
+        'fields': FAVORITE_PROJECTION,
+        'upsert': True,
+        'new': True,
+    })),
+    QueryShape('user_version', lambda db, s: (
+        db['user_versions'].find({'_id': s['user_id']}).limit(1).explain()
+    )),
+    QueryShape('favorite_set', lambda db, s: (
+        db['favorites'].find(*products_query(s['user_id']))
+        .limit(settings.FAVORITES_SET_CACHE_MAX_ITEMS + 1).explain()
+    ), covered=True),
+    QueryShape('check_favorite', lambda db, s: (
+        db['favorites'].find(_favorite_key(s), FAVORITE_PROJECTION).limit(1).explain()
+    )),
+    QueryShape('check_favorites', lambda db, s: (
+        db['favorites'].find(*lookup_query(s['user_id'], s['product_ids'])).explain()
+    ), covered=True),
+    QueryShape('batch_favorites', lambda db, s: (
+        db['favorites'].find(*batch_documents_query(s['user_id'], s['product_ids'])).explain()
+    )),
+    QueryShape('get_favorite_counts', lambda db, s: (
+        db['product_stats'].find(*counts_query(s['product_ids'])).explain()
+    )),
+    QueryShape('get_popular_favorites', lambda db, s: (
+        popular_cursor(db['product_stats'], 10).explain()
+    )),
+    QueryShape('export_favorites', lambda db, s: _export(db, s['user_id'])),
+    QueryShape('export_all_favorites (after)', lambda db, s: (
+        _export(db, None, str(s['favorite']['_id']))
+    )),
+    QueryShape('favorite_intent_status', lambda db, s: (
+        db['favorite_intents'].find(intent_query(str(ObjectId()), s['user_id'])).limit(1).explain()
+    )),
+    QueryShape('delete_favorite', lambda db, s: _command(db, {
+        'findAndModify': 'favorites',
+        'query': {'_id': s['favorite']['_id'], 'user_id': s['user_id']},
+        'remove': True,
+        'fields': {'product_id': 1},
+    })),
+    QueryShape('delete_favorite_by_product', lambda db, s: _command(db, {
+        'delete': 'favorites',
+        'deletes': [{'q': _favorite_key(s), 'limit': 1}],
+    })),
+]
+
+
+def _plans(explain):
+    """Yields every winning plan of an explain output (one per shard or pipeline stage)."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                # Slot-based engine plans wrap the classic tree in 'queryPlan'.
+                yield value.get('queryPlan', value)
+            if key != 'rejectedPlans':
+                yield from _plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from _plans(item)
+
+
+def _stages(plan):
+    yield plan
+    children = plan.get('inputStages', [])
+    if 'inputStage' in plan:
+        children = [plan['inputStage']] + children
+    for child in children:
+        yield from _stages(child)
+
+
+def _describe(stage):
+    """Renders a plan leaf first, e.g. ``IXSCAN(user_id_1) > FETCH > LIMIT``."""
+    name = f"{stage['stage']}({stage['indexName']})" if 'indexName' in stage else stage['stage']
+    if 'inputStage' in stage:
+        return f"{_describe(stage['inputStage'])} > {name}"
+    if stage.get('inputStages'):
+        return f"({' | '.join(_describe(child) for child in stage['inputStages'])}) > {name}"
+    return name
+
+
+def _execution_stats(explain):
+    if isinstance(explain, dict):
+        stats = explain.get('executionStats')
+        if isinstance(stats, dict) and 'nReturned' in stats:
+            return stats
+        values = explain.values()
+    elif isinstance(explain, list):
+        values = explain
+    else:
+        return None
+    for value in values:
+        stats = _execution_stats(value)
+        if stats is not None:
+            return stats
+    return None
+
+
+class PlanReport:
+    """Outcome of one QueryShape: its plan, the problems found and the execution counters."""
+
+    def __init__(self, shape, plan, problems, stats):
+        self.shape = shape
+        self.plan = plan
+        self.problems = problems
+        self.stats = stats
+
+
+def analyze(shape, explain):
+    plans = list(_plans(explain))
+    stages = [stage for plan in plans for stage in _stages(plan)]
+    names = {stage['stage'] for stage in stages}
+    problems = []
+    if 'COLLSCAN' in names:
+        problems.append('COLLSCAN')
+    if 'SORT' in names:
+        problems.append('SORT en memoria')
+    if shape.covered and 'FETCH' in names:
+        problems.append('FETCH en una consulta que debería estar cubierta por el índice')
+    plan = '; '.join(_describe(plan) for plan in plans)
+    return PlanReport(shape, plan, problems, _execution_stats(explain))
+
+
+def audit(database, sample, shapes=QUERY_SHAPES):
+    """Explains every shape against ``database``. Returns a list of PlanReport."""
+    return [analyze(shape, shape.explain(database, sample)) for shape in shapes]
+
+
+def seed(database, users, favorites_per_user, products):
+    """Fills ``database`` with a synthetic dataset shaped like production. Returns a sample."""
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    product_ids = [f'audit-product-{index}' for index in range(products)]
+    favorites, counts = [], Counter()
+    for user in range(users):
+        user_id = f'audit-user-{user}'
+        chosen = rng.sample(product_ids, min(favorites_per_user, products))
+        for offset, product_id in enumerate(chosen):
+            created_at = now - timedelta(minutes=offset)
+            favorites.append({
+                'user_id': user_id,
+                'product_id': product_id,
+                'notes': '',
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+            counts[product_id] += 1
+    database['favorites'].insert_many(favorites)
+    database['product_stats'].insert_many([
+        {'_id': product_id, 'favorite_count': count, 'last_added': now}
+        for product_id, count in counts.items()
+    ])
+    database['user_versions'].insert_many([
+        {'_id': f'audit-user-{user}', 'version': 1, 'updated_at': now} for user in range(users)
+    ])
+    database['favorite_intents'].insert_many([
+        new_intent(f'audit-user-{user}', product_ids[user % products], '') for user in range(users)
+    ])
+    return sample(database)
+
+
+def sample(database):
+    """Picks the user, favorite and product ids the shapes are explained with, or None if empty."""
+    favorite = database['favorites'].find_one({}, sort=[('_id', -1)])
+    if favorite is None:
+        return None
+    docs = database['favorites'].find({'user_id': favorite['user_id']}, {'product_id': 1}).limit(50)
+    others = [doc['product_id'] for doc in docs if doc['product_id'] != favorite['product_id']]
+    return {
+        'user_id': favorite['user_id'],
+        'favorite': favorite,
+        'product_ids': [favorite['product_id']] + others,
+    }
@@ -1,29 +1,65 @@
+import asyncio
+import functools
 import json
+import logging
 import threading
 import time
 import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
+import aio_pika
 import pika
 from django.conf import settings
 
+from .cache import TTLCache
+from .circuit_breaker import CircuitOpenError, circuit_breaker
+from .metrics import RPC_TIMEOUTS, timed
+
+logger = logging.getLogger(__name__)
+
 
 class ArticleValidationError(Exception):
     """Error raised when an article cannot be validated."""
 
 
+class InvalidArticleError(ArticleValidationError):
+    """The catalog answered that the article does not exist or is disabled."""
+
+
+class CatalogUnavailableError(ArticleValidationError):
+    """The catalog breaker refused the call. ``retry_after`` is in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class ArticleValidator:
-    """RabbitMQ RPC style client to validate articles before saving favorites."""
+    """RabbitMQ RPC style client to validate articles before saving favorites.
 
-    def __init__(self):
-        self._url = getattr(settings, "RABBIT_URL", "amqp://localhost")
+    A dedicated I/O thread owns the connection and consumes the reply queue.
+    Callers hand their publish over to that thread and wait on a future keyed
+    by correlation_id, so many validations can be in flight at once.
+    """
+
+    def __init__(self, url=None, timeout=None):
+        self._url = url or getattr(settings, "RABBIT_URL", "amqp://localhost")
         self._exchange = "article_exist"
-        self._lock = threading.Lock()
+        self._timeout = settings.RABBIT_RPC_TIMEOUT if timeout is None else timeout
+        self._pending = {}
+        self._pending_lock = threading.Lock()
         self._connection = None
         self._channel = None
         self._callback_queue = None
-        self._response = None
-        self._corr_id = None
+        self._ready = threading.Event()
+        self._closing = False
         self._ensure_connection()
+        self._ready.set()
+        self._thread = threading.Thread(target=self._run, name="article-validator-io", daemon=True)
+        self._thread.start()
+
+    def is_connected(self) -> bool:
+        return self._ready.is_set()
 
     def _ensure_connection(self):
         if self._connection and not self._connection.is_closed:
@@ -60,6 +96,29 @@ class ArticleValidator:
             self._channel = None
             self._callback_queue = None
 
+    def _fail_pending(self, exc):
+        with self._pending_lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            if not future.done():
+                future.set_exception(exc)
+
+    def _run(self):
+        """I/O loop: delivers replies and runs publishes queued by callers."""
+        while not self._closing:
+            try:
+                self._ensure_connection()
+                self._ready.set()
+                while not self._closing:
+                    self._connection.process_data_events(time_limit=1)
+            except (pika.exceptions.AMQPError, OSError):
+                self._ready.clear()
+                self._close_connection()
+                self._fail_pending(ArticleValidationError("No se pudo establecer conexión con RabbitMQ"))
+                if not self._closing:
+                    time.sleep(settings.RABBIT_RECONNECT_DELAY)
+        self._close_connection()
+
     def _on_response(self, ch, method, props, body):
         try:
             payload = json.loads(body.decode("utf-8"))
@@ -67,15 +126,14 @@ class ArticleValidator:
             return
 
         incoming_corr = props.correlation_id or payload.get("correlation_id")
-        if self._corr_id is None or incoming_corr == self._corr_id:
-            self._response = payload
-
-    def _call(self, article_id: str, reference_id: str, timeout: float = 5.0):
-        self._response = None
-        self._corr_id = str(uuid.uuid4())
+        with self._pending_lock:
+            future = self._pending.get(incoming_corr)
+        if future is not None and not future.done():
+            future.set_result(payload)
 
+    def _publish(self, corr_id: str, article_id: str, reference_id: str):
         payload = {
-            "correlation_id": self._corr_id,
+            "correlation_id": corr_id,
             "exchange": self._exchange,
             "routing_key": self._callback_queue,
             "message": {
@@ -88,51 +146,633 @@ class ArticleValidator:
             exchange=self._exchange,
             routing_key="article_exist",
             properties=pika.BasicProperties(
-                correlation_id=self._corr_id,
+                correlation_id=corr_id,
                 content_type="application/json",
                 delivery_mode=1,
             ),
             body=json.dumps(payload),
         )
 
-        deadline = time.time() + timeout
-        while self._response is None and time.time() < deadline:
-            self._connection.process_data_events(time_limit=0.1)
+    def _publish_many(self, calls):
+        for corr_id, article_id, reference_id in calls:
+            self._publish(corr_id, article_id, reference_id)
+
+    def _call_many(self, articles, timeout: float = None) -> list:
+        """Publishes every (article_id, reference_id) at once and waits for all replies.
+
+        Returns the reply payloads in order; entries that failed or timed out
+        hold the ``ArticleValidationError`` instead.
+        """
+        timeout = self._timeout if timeout is None else timeout
+        if not self._ready.wait(timeout):
+            raise ArticleValidationError("No se pudo establecer conexión con RabbitMQ")
+
+        deadline = time.monotonic() + timeout
+        calls = [(str(uuid.uuid4()), Future(), article_id, reference_id) for article_id, reference_id in articles]
+        with self._pending_lock:
+            for corr_id, future, _, _ in calls:
+                self._pending[corr_id] = future
+
+        try:
+            connection = self._connection
+            if connection is None:
+                raise ArticleValidationError("No se pudo establecer conexión con RabbitMQ")
+            connection.add_callback_threadsafe(
+                functools.partial(self._publish_many, [(corr_id, a, r) for corr_id, _, a, r in calls])
+            )
 
-        if self._response is None:
-            raise ArticleValidationError("Timeout validando artículo contra catálogo")
+            results = []
+            with timed("rabbit", "article_exist"):
+                for _, future, _, _ in calls:
+                    try:
+                        results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                    except FutureTimeoutError:
+                        RPC_TIMEOUTS.inc()
+                        results.append(ArticleValidationError("Timeout validando artículo contra catálogo"))
+                    except ArticleValidationError as exc:
+                        results.append(exc)
+            return results
+        except (pika.exceptions.AMQPError, OSError) as exc:
+            raise ArticleValidationError("No se pudo establecer conexión con RabbitMQ") from exc
+        finally:
+            with self._pending_lock:
+                for corr_id, _, _, _ in calls:
+                    self._pending.pop(corr_id, None)
 
-        return self._response
+    def _call(self, article_id: str, reference_id: str, timeout: float = None):
+        result = self._call_many([(article_id, reference_id)], timeout)[0]
+        if isinstance(result, ArticleValidationError):
+            raise result
+        return result
 
     def validate(self, article_id: str, reference_id: str) -> dict:
-        with self._lock:
-            for _ in range(2):
+        return self._call(article_id, reference_id)
+
+    def validate_many(self, articles, timeout: float = None) -> list:
+        return self._call_many(articles, timeout)
+
+    def close(self):
+        """Stops the I/O thread and closes the connection."""
+        self._closing = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.add_callback_threadsafe(lambda: None)
+            except (pika.exceptions.AMQPError, OSError):
+                pass
+        self._thread.join(timeout=2)
+
+
+class AsyncArticleValidator:
+    """asyncio counterpart of ``ArticleValidator`` built on aio-pika.
+
+    Replies are routed by correlation_id to asyncio futures, so any number of
+    coroutines can wait on validations over a single reply queue.
+    """
+
+    def __init__(self, url=None, timeout=None):
+        self._url = url or getattr(settings, "RABBIT_URL", "amqp://localhost")
+        self._exchange_name = "article_exist"
+        self._timeout = settings.RABBIT_RPC_TIMEOUT if timeout is None else timeout
+        self._pending = {}
+        self._connection = None
+        self._exchange = None
+        self._callback_queue = None
+
+    async def connect(self):
+        self._connection = await aio_pika.connect_robust(self._url)
+        channel = await self._connection.channel()
+        self._exchange = await channel.declare_exchange(
+            self._exchange_name, aio_pika.ExchangeType.DIRECT, durable=False
+        )
+        self._callback_queue = await channel.declare_queue("", exclusive=True)
+        await self._callback_queue.bind(self._exchange, routing_key=self._callback_queue.name)
+        await self._callback_queue.consume(self._on_response, no_ack=True)
+        return self
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def is_connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed
+
+    async def _on_response(self, message):
+        try:
+            payload = json.loads(message.body.decode("utf-8"))
+        except json.JSONDecodeError:
+            return
+
+        future = self._pending.get(message.correlation_id or payload.get("correlation_id"))
+        if future is not None and not future.done():
+            future.set_result(payload)
+
+    async def _publish(self, corr_id: str, article_id: str, reference_id: str):
+        payload = {
+            "correlation_id": corr_id,
+            "exchange": self._exchange_name,
+            "routing_key": self._callback_queue.name,
+            "message": {
+                "referenceId": reference_id,
+                "articleId": article_id,
+            },
+        }
+        await self._exchange.publish(
+            aio_pika.Message(
+                body=json.dumps(payload).encode("utf-8"),
+                correlation_id=corr_id,
+                content_type="application/json",
+                delivery_mode=aio_pika.DeliveryMode.NOT_PERSISTENT,
+            ),
+            routing_key="article_exist",
+        )
+
+    async def _wait(self, future, timeout):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            RPC_TIMEOUTS.inc()
+            return ArticleValidationError("Timeout validando artículo contra catálogo")
+
+    async def validate_many(self, articles, timeout: float = None) -> list:
+        """Same contract as ``ArticleValidator.validate_many``."""
+        timeout = self._timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        calls = [(str(uuid.uuid4()), loop.create_future(), a, r) for a, r in articles]
+        for corr_id, future, _, _ in calls:
+            self._pending[corr_id] = future
+        try:
+            with timed("rabbit", "article_exist"):
+                for corr_id, _, article_id, reference_id in calls:
+                    await self._publish(corr_id, article_id, reference_id)
+                return list(await asyncio.gather(*(self._wait(future, timeout) for _, future, _, _ in calls)))
+        except (aio_pika.exceptions.AMQPError, OSError) as exc:
+            raise ArticleValidationError("No se pudo establecer conexión con RabbitMQ") from exc
+        finally:
+            for corr_id, _, _, _ in calls:
+                self._pending.pop(corr_id, None)
+
+    async def validate(self, article_id: str, reference_id: str) -> dict:
+        result = (await self.validate_many([(article_id, reference_id)]))[0]
+        if isinstance(result, ArticleValidationError):
+            raise result
+        return result
+
+
+class CatalogEventsListener:
+    """Background consumer of catalog article events.
+
+    Binds an exclusive queue to the catalog events exchange, so every worker
+    process receives every event, and calls ``on_article_changed`` with the
+    article id of each one. ``on_reconnect`` runs whenever the connection is
+    re-established, since events may have been missed in between.
+    """
+
+    def __init__(self, on_article_changed, on_reconnect=None, url=None):
+        self._url = url or getattr(settings, "RABBIT_URL", "amqp://localhost")
+        self._on_article_changed = on_article_changed
+        self._on_reconnect = on_reconnect
+        self._connection = None
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="catalog-events", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closing = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.add_callback_threadsafe(lambda: None)
+            except (pika.exceptions.AMQPError, OSError):
+                pass
+        self._thread.join(timeout=2)
+
+    def _connect(self):
+        self._connection = pika.BlockingConnection(pika.URLParameters(self._url))
+        channel = self._connection.channel()
+        exchange = settings.CATALOG_EVENTS_EXCHANGE
+        channel.exchange_declare(
+            exchange=exchange,
+            exchange_type=settings.CATALOG_EVENTS_EXCHANGE_TYPE,
+            durable=False,
+        )
+        queue = channel.queue_declare(queue="", exclusive=True).method.queue
+        for routing_key in settings.CATALOG_EVENTS_ROUTING_KEYS or [""]:
+            channel.queue_bind(exchange=exchange, queue=queue, routing_key=routing_key)
+        channel.basic_consume(queue=queue, on_message_callback=self._on_message, auto_ack=True)
+
+    def _on_message(self, ch, method, props, body):
+        article_id = parse_article_event(body)
+        if article_id:
+            self._on_article_changed(article_id)
+
+    def _run(self):
+        while not self._closing:
+            try:
+                self._connect()
+                if self._on_reconnect is not None:
+                    self._on_reconnect()
+                while not self._closing:
+                    self._connection.process_data_events(time_limit=1)
+            except (pika.exceptions.AMQPError, OSError):
+                pass
+            finally:
                 try:
-                    self._ensure_connection()
-                    return self._call(article_id, reference_id)
-                except (pika.exceptions.AMQPError, OSError):
-                    self._close_connection()
-            raise ArticleValidationError("No se pudo establecer conexión con RabbitMQ")
+                    if self._connection and self._connection.is_open:
+                        self._connection.close()
+                except Exception:
+                    pass
+                self._connection = None
+            if not self._closing:
+                time.sleep(settings.RABBIT_RECONNECT_DELAY)
+
+
+class CatalogCleanupConsumer:
+    """Consumes article disabled/deleted events from a durable, shared queue.
+
+    Article ids are buffered and handed to ``on_batch`` every ``batch_size``
+    events or ``flush_interval`` seconds; the deliveries are acked (all at
+    once) only after ``on_batch`` returns, and requeued if it raises, so no
+    event is lost when the write fails or the consumer dies. ``prefetch``
+    bounds the unacked deliveries the broker sends ahead.
+
+    An event is requeued at most ``max_attempts - 1`` times: then it is
+    published to ``dead_letter_queue`` (or dropped when that is empty) so a
+    batch that keeps failing cannot block the queue. Attempts are counted
+    by this process, or taken from ``x-delivery-count`` on quorum queues.
+    """
+
+    def __init__(self, on_batch, batch_size, prefetch, flush_interval, url=None,
+                 max_attempts=None, dead_letter_queue=None):
+        self._url = url or getattr(settings, "RABBIT_URL", "amqp://localhost")
+        self._on_batch = on_batch
+        self._batch_size = batch_size
+        self._prefetch = max(prefetch, batch_size)
+        self._flush_interval = flush_interval
+        self._connection = None
+        self._channel = None
+        self._max_attempts = max_attempts or settings.CATALOG_CLEANUP_MAX_ATTEMPTS
+        if dead_letter_queue is None:
+            dead_letter_queue = settings.CATALOG_CLEANUP_DEAD_LETTER_QUEUE
+        self._dead_letter_queue = dead_letter_queue
+        self._buffer = []
+        self._last_tag = None
+        self._attempts = {}
+        self._closing = False
+
+    def _connect(self):
+        self._connection = pika.BlockingConnection(pika.URLParameters(self._url))
+        self._channel = self._connection.channel()
+        exchange = settings.CATALOG_EVENTS_EXCHANGE
+        self._channel.exchange_declare(
+            exchange=exchange,
+            exchange_type=settings.CATALOG_EVENTS_EXCHANGE_TYPE,
+            durable=False,
+        )
+        queue = settings.CATALOG_CLEANUP_QUEUE
+        self._channel.queue_declare(queue=queue, durable=True)
+        if self._dead_letter_queue:
+            self._channel.queue_declare(queue=self._dead_letter_queue, durable=True)
+        for routing_key in settings.CATALOG_CLEANUP_ROUTING_KEYS or [""]:
+            self._channel.queue_bind(exchange=exchange, queue=queue, routing_key=routing_key)
+        self._channel.basic_qos(prefetch_count=self._prefetch)
+        self._channel.basic_consume(queue=queue, on_message_callback=self._on_message)
+
+    def _on_message(self, ch, method, props, body):
+        self._last_tag = method.delivery_tag
+        delivery_count = (props.headers or {}).get("x-delivery-count") or 0
+        self._buffer.append((method.delivery_tag, parse_article_event(body), body, delivery_count))
+        if len(self._buffer) >= self._batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._last_tag is None:
+            return
+        deliveries = self._buffer
+        article_ids = list(dict.fromkeys(article_id for _, article_id, _, _ in deliveries if article_id))
+        tag = self._last_tag
+        self._buffer = []
+        self._last_tag = None
+        try:
+            if article_ids:
+                self._on_batch(article_ids)
+        except Exception:
+            logger.exception("No se pudieron eliminar los favoritos de %d artículos", len(article_ids))
+            self._reject(deliveries)
+            # Give the database a moment before the events come back.
+            self._connection.sleep(settings.RABBIT_RECONNECT_DELAY)
+        else:
+            self._channel.basic_ack(delivery_tag=tag, multiple=True)
+            for article_id in article_ids:
+                self._attempts.pop(article_id, None)
+
+    def _reject(self, deliveries):
+        """Requeues the failed deliveries, except the ones out of attempts, which are dead-lettered."""
+        exhausted = set()
+        for _, article_id, _, delivery_count in deliveries:
+            if not article_id:
+                continue
+            attempts = max(self._attempts.get(article_id, 0), delivery_count) + 1
+            self._attempts[article_id] = attempts
+            if attempts >= self._max_attempts:
+                exhausted.add(article_id)
+        # One by one: a multiple nack would cover tags acked here.
+        for delivery_tag, article_id, body, _ in deliveries:
+            if article_id in exhausted:
+                if self._dead_letter_queue:
+                    self._channel.basic_publish(
+                        exchange="",
+                        routing_key=self._dead_letter_queue,
+                        body=body,
+                        properties=pika.BasicProperties(delivery_mode=2),
+                    )
+                logger.error("Evento de baja del artículo %s descartado tras %d intentos", article_id, self._max_attempts)
+                self._channel.basic_ack(delivery_tag=delivery_tag)
+            elif article_id:
+                self._channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+            else:
+                # Not an article event: retrying it cannot help.
+                self._channel.basic_ack(delivery_tag=delivery_tag)
+        for article_id in exhausted:
+            self._attempts.pop(article_id, None)
+        # Events requeued to other consumers are never seen again here.
+        while len(self._attempts) > 10 * self._prefetch:
+            self._attempts.pop(next(iter(self._attempts)))
+
+    def _consume(self):
+        deadline = time.monotonic() + self._flush_interval
+        while not self._closing:
+            self._connection.process_data_events(time_limit=max(0.0, deadline - time.monotonic()))
+            if time.monotonic() >= deadline:
+                self._flush()
+                deadline = time.monotonic() + self._flush_interval
+
+    def run(self):
+        """Consumes until ``stop()``; reconnects after broker errors."""
+        while not self._closing:
+            try:
+                self._connect()
+                self._consume()
+                self._flush()
+            except (pika.exceptions.AMQPError, OSError):
+                # Unacked deliveries go back to the queue with the channel.
+                self._buffer = []
+                self._last_tag = None
+            finally:
+                try:
+                    if self._connection and self._connection.is_open:
+                        self._connection.close()
+                except Exception:
+                    pass
+                self._connection = None
+                self._channel = None
+            if not self._closing:
+                time.sleep(settings.RABBIT_RECONNECT_DELAY)
+
+    def stop(self):
+        self._closing = True
+
+
+def parse_article_event(body):
+    """Extracts the article id from a catalog event body, or None."""
+    try:
+        payload = json.loads(body.decode("utf-8") if isinstance(body, bytes) else body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    message = payload.get("message")
+    if isinstance(message, dict):
+        payload = message
+    elif isinstance(message, str) and message:
+        return message
+    return payload.get("articleId") or payload.get("article_id") or payload.get("_id") or payload.get("id")
 
 
 _validator = None
+_validator_lock = threading.Lock()
+
+_article_cache = TTLCache(
+    maxsize=settings.ARTICLE_CACHE_MAX_SIZE,
+    ttl=settings.ARTICLE_CACHE_TTL,
+    name='article',
+)
+_breaker = circuit_breaker('catalog', settings.RABBIT_RPC_TIMEOUT, settings.CATALOG_MAX_IN_FLIGHT)
+_catalog_listener = None
+_async_validator = None
+_async_validator_lock = None
 
 
 def _get_validator() -> ArticleValidator:
     global _validator
     if _validator is None:
-        try:
-            _validator = ArticleValidator()
-        except (pika.exceptions.AMQPError, OSError) as exc:
-            raise ArticleValidationError("No se pudo conectar a RabbitMQ") from exc
+        with _validator_lock:
+            if _validator is None:
+                try:
+                    _validator = ArticleValidator()
+                except (pika.exceptions.AMQPError, OSError) as exc:
+                    raise ArticleValidationError("No se pudo conectar a RabbitMQ") from exc
     return _validator
 
 
+def connect_catalog():
+    """Opens the article_exist RPC connection and the catalog events listener up front."""
+    _get_validator()
+    if settings.ARTICLE_CACHE_TTL > 0:
+        _ensure_catalog_listener()
+
+
+def catalog_connected() -> bool:
+    """Whether the article_exist RPC connection is up, connecting it if needed."""
+    if settings.ASYNC_MODE:
+        # Connected on the event loop (aconnect_catalog); not ready until then.
+        return _async_validator is not None and _async_validator.is_connected()
+    try:
+        return _get_validator().is_connected()
+    except ArticleValidationError:
+        return False
+
+
+def reset_connections():
+    """Forgets the RabbitMQ clients inherited through a fork; new ones are built on demand.
+
+    The parent's connections are not closed: their sockets are shared with it.
+    """
+    global _validator, _validator_lock, _catalog_listener, _async_validator, _async_validator_lock
+    _validator_lock = threading.Lock()
+    _validator = _catalog_listener = None
+    _async_validator = _async_validator_lock = None
+
+
+def invalidate_article(article_id: str):
+    """Drops a cached validation result."""
+    _article_cache.pop(article_id)
+
+
+def _ensure_catalog_listener():
+    global _catalog_listener
+    if _catalog_listener is None and settings.CATALOG_EVENTS_EXCHANGE:
+        with _validator_lock:
+            if _catalog_listener is None:
+                _catalog_listener = CatalogEventsListener(
+                    invalidate_article,
+                    on_reconnect=_article_cache.clear,
+                ).start()
+
+
+def _article_ttl(message: dict):
+    if message.get("valid"):
+        return settings.ARTICLE_CACHE_TTL
+    return settings.ARTICLE_CACHE_NEGATIVE_TTL
+
+
+def _unavailable(exc):
+    return CatalogUnavailableError("Catálogo no disponible, intente más tarde", exc.retry_after)
+
+
+def _ask_catalog(articles) -> list:
+    """``validate_many`` through the catalog breaker; any failed reply counts against it."""
+    try:
+        with _breaker.call() as call:
+            replies = _get_validator().validate_many(articles, timeout=_breaker.timeout())
+            if any(isinstance(reply, ArticleValidationError) for reply in replies):
+                call.fail()
+            return replies
+    except CircuitOpenError as exc:
+        raise _unavailable(exc) from exc
+
+
+def _lookup_article(article_id: str, reference_id: str) -> dict:
+    response = _ask_catalog([(article_id, reference_id)])[0]
+    if isinstance(response, ArticleValidationError):
+        raise response
+    return response.get("message") or response
+
+
 def validate_article(article_id: str, reference_id: str) -> dict:
-    """Validates an article through RabbitMQ and returns the payload."""
-    response = _get_validator().validate(article_id, reference_id)
-    message = response.get("message") or response
+    """Validates an article through RabbitMQ and returns the payload.
+
+    Results are cached per article; invalid articles for a shorter time.
+    """
+    if settings.ARTICLE_CACHE_TTL > 0:
+        _ensure_catalog_listener()
+    message = _article_cache.get_or_load(
+        article_id,
+        lambda: _lookup_article(article_id, reference_id),
+        ttl=_article_ttl,
+    )
+    if not message.get("valid"):
+        raise InvalidArticleError("El artículo no existe o está deshabilitado")
+    return message
+
+
+def _split_cached(article_ids):
+    """Returns ({article_id: cached message}, [article ids to ask the catalog for])."""
+    use_cache = settings.ARTICLE_CACHE_TTL > 0
+    if use_cache:
+        _ensure_catalog_listener()
+
+    results = {}
+    missing = []
+    for article_id in dict.fromkeys(article_ids):
+        cached = _article_cache.get(article_id) if use_cache else None
+        if cached is None:
+            missing.append(article_id)
+        else:
+            results[article_id] = cached
+    return results, missing
+
+
+def _merge_replies(results, missing, replies):
+    for article_id, reply in zip(missing, replies):
+        if isinstance(reply, ArticleValidationError):
+            results[article_id] = reply
+            continue
+        message = reply.get("message") or reply
+        _article_cache.set(article_id, message, ttl=_article_ttl(message))
+        results[article_id] = message
+
+    for article_id, message in results.items():
+        if isinstance(message, dict) and not message.get("valid"):
+            results[article_id] = InvalidArticleError("El artículo no existe o está deshabilitado")
+    return results
+
+
+def validate_articles(article_ids, reference_id: str) -> dict:
+    """Validates several articles with a single pipelined round trip.
+
+    Returns ``{article_id: message}``; articles that are invalid or could not
+    be validated map to the ``ArticleValidationError`` instead.
+    """
+    results, missing = _split_cached(article_ids)
+    replies = []
+    if missing:
+        replies = _ask_catalog([(article_id, reference_id) for article_id in missing])
+    return _merge_replies(results, missing, replies)
+
+
+async def _aget_validator() -> AsyncArticleValidator:
+    global _async_validator, _async_validator_lock
+    if _async_validator is None:
+        if _async_validator_lock is None:
+            _async_validator_lock = asyncio.Lock()
+        async with _async_validator_lock:
+            if _async_validator is None:
+                try:
+                    _async_validator = await AsyncArticleValidator().connect()
+                except (aio_pika.exceptions.AMQPError, OSError) as exc:
+                    raise ArticleValidationError("No se pudo conectar a RabbitMQ") from exc
+    return _async_validator
+
+
+async def aconnect_catalog():
+    """``connect_catalog`` for the async views: connects aio-pika on the running event loop."""
+    await _aget_validator()
+    if settings.ARTICLE_CACHE_TTL > 0:
+        _ensure_catalog_listener()
+
+
+async def _aask_catalog(articles) -> list:
+    try:
+        with _breaker.call() as call:
+            validator = await _aget_validator()
+            replies = await validator.validate_many(articles, timeout=_breaker.timeout())
+            if any(isinstance(reply, ArticleValidationError) for reply in replies):
+                call.fail()
+            return replies
+    except CircuitOpenError as exc:
+        raise _unavailable(exc) from exc
+
+
+async def _alookup_article(article_id: str, reference_id: str) -> dict:
+    response = (await _aask_catalog([(article_id, reference_id)]))[0]
+    if isinstance(response, ArticleValidationError):
+        raise response
+    return response.get("message") or response
+
+
+async def avalidate_article(article_id: str, reference_id: str) -> dict:
+    """Async variant of ``validate_article``."""
+    if settings.ARTICLE_CACHE_TTL > 0:
+        _ensure_catalog_listener()
+    message = await _article_cache.aget_or_load(
+        article_id,
+        lambda: _alookup_article(article_id, reference_id),
+        ttl=_article_ttl,
+    )
     if not message.get("valid"):
-        raise ArticleValidationError("El artículo no existe o está deshabilitado")
+        raise InvalidArticleError("El artículo no existe o está deshabilitado")
     return message
 
+
+async def avalidate_articles(article_ids, reference_id: str) -> dict:
+    """Async variant of ``validate_articles``."""
+    results, missing = _split_cached(article_ids)
+    replies = []
+    if missing:
+        replies = await _aask_catalog([(article_id, reference_id) for article_id in missing])
+    return _merge_replies(results, missing, replies)
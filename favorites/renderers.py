@@ -0,0 +1,39 @@
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """Serializes ``data`` to UTF-8 JSON bytes, with orjson when available.
+
+    Types orjson does not know about go through DRF's JSONEncoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default)
+    return JSONRenderer().render(data)
+
+
+def json_response(data, status=200, headers=None):
+    """JSON HttpResponse rendered like DRF's Response, for views outside DRF."""
+    response = HttpResponse(dumps(data), status=status, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson; falls back to DRF's for indented output."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_encoder.default)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 
@@ -5,3 +6,11 @@ class FavoriteCreateSerializer(serializers.Serializer):
     product_id = serializers.CharField(max_length=255, required=True)
     notes = serializers.CharField(required=False, allow_blank=True)
 
+
+
+class FavoriteLookupSerializer(serializers.Serializer):
+    product_ids = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=settings.FAVORITES_LOOKUP_MAX_SIZE,
+    )
@@ -0,0 +1,81 @@
+"""Test doubles shared by the test modules."""
+import threading
+from unittest import mock
+
+import mongomock
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from favorites import models
+from favorites.indexes import apply_indexes
+
+
+class Clock:
+    """Monotonic clock the tests move by hand (``clock.now += 5``)."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def mongo_client():
+    """A mongomock client whose MONGODB_NAME database has the declared indexes."""
+    client = mongomock.MongoClient()
+    apply_indexes(client[settings.MONGODB_NAME])
+    return client
+
+
+class MongoTestCase(SimpleTestCase):
+    """Serves ``models.get_mongo_client`` from a fresh ``mongo_client()`` per test."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = mongo_client()
+        self.database = self.client[settings.MONGODB_NAME]
+        patcher = mock.patch.object(models, 'get_mongo_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class SerializedCollection:
+    """Proxies a mongomock collection from many threads, one operation at a time.
+
+    mongomock is not thread-safe; a server applies each operation atomically
+    anyway, so the threads still race on everything between operations.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return call
+
+
+def run_threads(count, target):
+    """Runs ``target(index)`` on ``count`` threads released together. Returns (results, errors)."""
+    barrier = threading.Barrier(count)
+    results, errors = [], []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results.append(target(index))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
@@ -0,0 +1,107 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from favorites import rabbit_client
+from favorites.cache import TTLCache
+from favorites.rabbit_client import (
+    CatalogEventsListener,
+    InvalidArticleError,
+    invalidate_article,
+    parse_article_event,
+    validate_article,
+    validate_articles,
+)
+
+from .fakes import Clock
+
+
+class _Catalog:
+    """Stands in for the article_exist validator; articles in ``invalid`` do not exist."""
+
+    def __init__(self, invalid=()):
+        self.invalid = set(invalid)
+        self.asked = []
+
+    def validate_many(self, articles, timeout=None):
+        self.asked.extend(article_id for article_id, _ in articles)
+        return [
+            {'message': {'articleId': article_id, 'valid': article_id not in self.invalid}}
+            for article_id, _ in articles
+        ]
+
+
+@override_settings(ARTICLE_CACHE_TTL=300, ARTICLE_CACHE_NEGATIVE_TTL=30, CATALOG_EVENTS_EXCHANGE='')
+class ArticleCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.catalog = _Catalog(invalid={'missing'})
+        for patcher in (
+            mock.patch.object(rabbit_client, '_article_cache', TTLCache(100, 300, clock=self.clock)),
+            mock.patch.object(rabbit_client, '_get_validator', return_value=self.catalog),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_valid_articles_are_cached_for_the_ttl(self):
+        validate_article('a', 'ref')
+        self.clock.now = 299
+        validate_article('a', 'ref')
+        self.assertEqual(self.catalog.asked, ['a'])
+        self.clock.now = 300
+        validate_article('a', 'ref')
+        self.assertEqual(self.catalog.asked, ['a', 'a'])
+
+    def test_invalid_articles_are_cached_for_the_negative_ttl(self):
+        for now in (0, 29, 30):
+            self.clock.now = now
+            with self.assertRaises(InvalidArticleError):
+                validate_article('missing', 'ref')
+        self.assertEqual(self.catalog.asked, ['missing', 'missing'])
+
+    def test_invalidation_forces_a_new_lookup(self):
+        validate_article('a', 'ref')
+        invalidate_article('a')
+        validate_article('a', 'ref')
+        self.assertEqual(self.catalog.asked, ['a', 'a'])
+
+    def test_batch_only_asks_for_uncached_articles(self):
+        validate_article('a', 'ref')
+        results = validate_articles(['a', 'b', 'missing', 'b'], 'ref')
+        self.assertEqual(self.catalog.asked, ['a', 'b', 'missing'])
+        self.assertEqual(results['a']['articleId'], 'a')
+        self.assertEqual(results['b']['articleId'], 'b')
+        self.assertIsInstance(results['missing'], InvalidArticleError)
+
+        validate_articles(['b', 'missing'], 'ref')
+        self.assertEqual(self.catalog.asked, ['a', 'b', 'missing'])
+
+    @override_settings(ARTICLE_CACHE_TTL=0)
+    def test_disabled_cache_always_asks(self):
+        validate_article('a', 'ref')
+        validate_articles(['a'], 'ref')
+        self.assertEqual(self.catalog.asked, ['a', 'a'])
+
+
+class CatalogEventsTests(SimpleTestCase):
+    def test_parse_article_event(self):
+        cases = [
+            ({'articleId': 'a'}, 'a'),
+            ({'message': {'articleId': 'a'}}, 'a'),
+            ({'message': 'a'}, 'a'),
+            ({'_id': 'a'}, 'a'),
+            ({'other': 'a'}, None),
+            (['a'], None),
+        ]
+        for payload, article_id in cases:
+            with self.subTest(payload=payload):
+                self.assertEqual(parse_article_event(json.dumps(payload).encode('utf-8')), article_id)
+        self.assertIsNone(parse_article_event(b'not json'))
+
+    def test_listener_reports_changed_articles(self):
+        changed = []
+        listener = CatalogEventsListener(changed.append)
+        listener._on_message(None, None, None, json.dumps({'articleId': 'a'}).encode('utf-8'))
+        listener._on_message(None, None, None, b'not json')
+        self.assertEqual(changed, ['a'])
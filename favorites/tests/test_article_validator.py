@@ -0,0 +1,144 @@
+import json
+import queue
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pika
+from django.test import SimpleTestCase, override_settings
+
+from favorites.rabbit_client import ArticleValidationError, ArticleValidator
+
+from .fakes import run_threads
+
+
+class _Broker:
+    """Answers article_exist requests once ``hold_until`` of them are in flight, last first."""
+
+    def __init__(self, hold_until=1):
+        self.hold_until = hold_until
+        self.silent = set()
+        self.drop_next = False
+        self.connections = []
+
+    def connect(self, parameters):
+        connection = _Connection(self)
+        self.connections.append(connection)
+        return connection
+
+
+class _Channel:
+    def __init__(self):
+        self.requests = []
+        self.on_reply = None
+
+    def exchange_declare(self, **kwargs):
+        pass
+
+    def queue_declare(self, queue, exclusive=False):
+        return SimpleNamespace(method=SimpleNamespace(queue='amq.gen-replies'))
+
+    def queue_bind(self, **kwargs):
+        pass
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False):
+        self.on_reply = on_message_callback
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.requests.append(json.loads(body))
+
+
+class _Connection:
+    def __init__(self, broker):
+        self._broker = broker
+        self._callbacks = queue.Queue()
+        self._channel = _Channel()
+        self.is_closed = False
+
+    @property
+    def is_open(self):
+        return not self.is_closed
+
+    def channel(self):
+        return self._channel
+
+    def add_callback_threadsafe(self, callback):
+        self._callbacks.put(callback)
+
+    def close(self):
+        self.is_closed = True
+
+    def process_data_events(self, time_limit=0):
+        try:
+            self._callbacks.get(timeout=0.01)()
+            while True:
+                self._callbacks.get_nowait()()
+        except queue.Empty:
+            pass
+        if self._broker.drop_next and self._channel.requests:
+            self._broker.drop_next = False
+            raise pika.exceptions.AMQPConnectionError('connection reset')
+        requests = self._channel.requests
+        if len(requests) < self._broker.hold_until:
+            return
+        self._channel.requests = []
+        for request in reversed(requests):
+            article_id = request['message']['articleId']
+            if article_id in self._broker.silent:
+                continue
+            reply = {
+                'correlation_id': request['correlation_id'],
+                'message': {'articleId': article_id, 'valid': True},
+            }
+            properties = SimpleNamespace(correlation_id=request['correlation_id'])
+            self._channel.on_reply(self._channel, None, properties, json.dumps(reply).encode('utf-8'))
+
+
+@override_settings(RABBIT_RECONNECT_DELAY=0.01)
+class ArticleValidatorTests(SimpleTestCase):
+    def _validator(self, broker, timeout=5):
+        patcher = mock.patch('favorites.rabbit_client.pika.BlockingConnection', broker.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        validator = ArticleValidator(url='amqp://localhost', timeout=timeout)
+        self.addCleanup(validator.close)
+        return validator
+
+    def test_replies_are_routed_by_correlation_id(self):
+        validator = self._validator(_Broker(hold_until=5))
+        articles = [(f'article-{index}', 'ref') for index in range(5)]
+        replies = validator.validate_many(articles)
+        self.assertEqual([reply['message']['articleId'] for reply in replies], [a for a, _ in articles])
+
+    def test_concurrent_callers_share_the_connection(self):
+        # Nothing is answered until every caller has published: a client that
+        # serialised its callers would time out here.
+        validator = self._validator(_Broker(hold_until=8))
+        results, errors = run_threads(8, lambda index: validator.validate(f'article-{index}', 'ref'))
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            sorted(result['message']['articleId'] for result in results),
+            sorted(f'article-{index}' for index in range(8)),
+        )
+        self.assertEqual(validator._pending, {})
+
+    def test_unanswered_call_times_out_alone(self):
+        broker = _Broker()
+        broker.silent.add('lost')
+        validator = self._validator(broker)
+        replies = validator.validate_many([('found', 'ref'), ('lost', 'ref')], timeout=0.2)
+        self.assertEqual(replies[0]['message']['articleId'], 'found')
+        self.assertIsInstance(replies[1], ArticleValidationError)
+
+    def test_dropped_connection_fails_pending_calls_and_reconnects(self):
+        broker = _Broker()
+        validator = self._validator(broker, timeout=5)
+        broker.drop_next = True
+
+        started = time.monotonic()
+        with self.assertRaises(ArticleValidationError):
+            validator.validate('article', 'ref')
+        self.assertLess(time.monotonic() - started, 1)
+
+        self.assertEqual(validator.validate('article', 'ref')['message']['articleId'], 'article')
+        self.assertEqual(len(broker.connections), 2)
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from favorites.cache import TTLCache
+
+from .fakes import Clock
+
+
+class TTLCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = TTLCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_entries_expire(self):
+        self.cache.set('a', 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get('a'), 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual((self.cache.get('a'), self.cache.get('c')), (1, 3))
+
+    def test_zero_ttl_is_not_cached(self):
+        self.cache.set('a', 1, ttl=0)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_get_or_load_ttl_from_value(self):
+        self.cache.get_or_load('empty', lambda: [], ttl=lambda value: 10 if value else 0)
+        self.cache.get_or_load('full', lambda: [1], ttl=lambda value: 10 if value else 0)
+        self.assertIsNone(self.cache.get('empty'))
+        self.assertEqual(self.cache.get('full'), [1])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def _run_concurrently(self, cache, loader, threads=8):
+        results, errors = [], []
+        started = threading.Barrier(threads)
+
+        def worker():
+            started.wait()
+            try:
+                results.append(cache.get_or_load('key', loader))
+            except Exception as exc:
+                errors.append(exc)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        return workers, results, errors
+
+    def test_concurrent_loads_run_the_loader_once(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        workers, results, errors = self._run_concurrently(cache, loader)
+        while not calls:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(errors, [])
+
+    def test_loader_errors_reach_every_waiter_and_are_not_cached(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait(5)
+            raise RuntimeError('caído')
+
+        workers, results, errors = self._run_concurrently(cache, loader)
+        while not calls:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 8)
+        self.assertEqual(cache.get_or_load('key', lambda: 'retry'), 'retry')
+
+    def test_async_concurrent_loads_run_the_loader_once(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def main():
+            return await asyncio.gather(*(cache.aget_or_load('key', loader) for _ in range(8)))
+
+        self.assertEqual(asyncio.run(main()), ['value'] * 8)
+        self.assertEqual(len(calls), 1)
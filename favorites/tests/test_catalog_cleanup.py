@@ -0,0 +1,134 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from favorites.models import delete_favorites_for_products
+from favorites.rabbit_client import CatalogCleanupConsumer
+
+from .fakes import MongoTestCase
+
+
+class DeleteFavoritesForProductsTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.database['favorites'].insert_many([
+            {'user_id': f'user-{user}', 'product_id': product}
+            for user in range(5) for product in ('gone', 'kept')
+        ])
+        self.database['product_stats'].insert_many([
+            {'_id': 'gone', 'favorite_count': 5},
+            {'_id': 'kept', 'favorite_count': 5},
+        ])
+
+    @override_settings(CATALOG_CLEANUP_VERSION_BATCH_SIZE=2)
+    def test_deletes_favorites_and_bumps_versions_in_chunks(self):
+        with mock.patch('favorites.models.bump_user_versions') as bump:
+            self.assertEqual(delete_favorites_for_products(['gone']), 5)
+
+        self.assertEqual([len(call.args[0]) for call in bump.call_args_list], [2, 2, 1])
+        self.assertEqual(
+            sorted(user_id for call in bump.call_args_list for user_id in call.args[0]),
+            [f'user-{user}' for user in range(5)],
+        )
+        self.assertEqual(self.database['favorites'].count_documents({'product_id': 'gone'}), 0)
+        self.assertEqual(self.database['favorites'].count_documents({'product_id': 'kept'}), 5)
+        self.assertEqual([doc['_id'] for doc in self.database['product_stats'].find()], ['kept'])
+
+    def test_versions_are_bumped(self):
+        delete_favorites_for_products(['gone'])
+        self.assertEqual(self.database['user_versions'].count_documents({}), 5)
+
+
+class _Method:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class _Properties:
+    def __init__(self, headers=None):
+        self.headers = headers
+
+
+class _Channel:
+    """Records acks, nacks and publishes."""
+
+    def __init__(self):
+        self.log = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.log.append(('ack', delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.log.append(('nack', delivery_tag, requeue))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.log.append(('publish', routing_key, body))
+
+
+class _Connection:
+    def sleep(self, seconds):
+        pass
+
+
+def _event(article_id):
+    return json.dumps({'articleId': article_id}).encode('utf-8')
+
+
+class CatalogCleanupConsumerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('favorites.rabbit_client.logger')
+        self.logger = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _consumer(self, on_batch, dead_letter_queue='dead'):
+        consumer = CatalogCleanupConsumer(
+            on_batch, batch_size=2, prefetch=10, flush_interval=1,
+            max_attempts=3, dead_letter_queue=dead_letter_queue,
+        )
+        consumer._channel = _Channel()
+        consumer._connection = _Connection()
+        return consumer
+
+    def _deliver(self, consumer, tag, article_id, headers=None):
+        consumer._on_message(consumer._channel, _Method(tag), _Properties(headers), _event(article_id))
+
+    def test_batch_is_acked_after_the_write(self):
+        batches = []
+        consumer = self._consumer(batches.append)
+        self._deliver(consumer, 1, 'a')
+        self._deliver(consumer, 2, 'b')
+        self.assertEqual(batches, [['a', 'b']])
+        self.assertEqual(consumer._channel.log, [('ack', 2, True)])
+
+    def test_failed_batch_is_requeued(self):
+        consumer = self._consumer(mock.Mock(side_effect=RuntimeError))
+        self._deliver(consumer, 1, 'a')
+        self._deliver(consumer, 2, 'b')
+        self.assertEqual(consumer._channel.log, [('nack', 1, True), ('nack', 2, True)])
+
+    def test_event_out_of_attempts_is_dead_lettered(self):
+        consumer = self._consumer(mock.Mock(side_effect=RuntimeError))
+        for attempt in range(3):
+            self._deliver(consumer, 2 * attempt + 1, 'a')
+            self._deliver(consumer, 2 * attempt + 2, 'b')
+        self.assertEqual(consumer._channel.log[-4:], [
+            ('publish', 'dead', _event('a')),
+            ('ack', 5, False),
+            ('publish', 'dead', _event('b')),
+            ('ack', 6, False),
+        ])
+        self.assertEqual(consumer._attempts, {})
+        self.assertEqual(self.logger.error.call_count, 2)
+
+    def test_unparseable_event_is_not_requeued(self):
+        consumer = self._consumer(mock.Mock(side_effect=RuntimeError))
+        consumer._on_message(consumer._channel, _Method(1), _Properties(), b'not json')
+        self._deliver(consumer, 2, 'a')
+        self.assertEqual(consumer._channel.log, [('ack', 1, False), ('nack', 2, True)])
+
+    def test_quorum_delivery_count_is_honoured(self):
+        consumer = self._consumer(mock.Mock(side_effect=RuntimeError), dead_letter_queue='')
+        self._deliver(consumer, 1, 'a', headers={'x-delivery-count': 2})
+        self._deliver(consumer, 2, 'b')
+        self.assertEqual(consumer._channel.log, [('ack', 1, False), ('nack', 2, True)])
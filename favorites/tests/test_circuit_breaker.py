@@ -0,0 +1,121 @@
+from django.test import SimpleTestCase
+
+from favorites.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+from .fakes import Clock
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.transitions = []
+        self.breaker = CircuitBreaker(
+            'catalog',
+            timeout=5.0,
+            window=4,
+            min_calls=4,
+            failure_rate=0.5,
+            slow_call_seconds=1.0,
+            slow_call_rate=0.75,
+            open_seconds=10.0,
+            half_open_probes=2,
+            clock=self.clock,
+        )
+        self.breaker.add_listener(lambda breaker, old, new: self.transitions.append((old, new)))
+
+    def _call(self, failed=False, seconds=0.0):
+        call = self.breaker.acquire()
+        self.clock.now += seconds
+        self.breaker.release(call, failed=failed)
+
+    def _open(self):
+        for failed in (False, False, True, True):
+            self._call(failed)
+
+    def test_opens_at_the_failure_rate(self):
+        for failed in (False, False, True):
+            self._call(failed)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self._call(failed=True)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.transitions, [(CLOSED, OPEN)])
+
+    def test_opens_on_slow_calls(self):
+        for _ in range(3):
+            self._call(seconds=1.5)
+        self._call()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_open_circuit_rejects_with_retry_after(self):
+        self._open()
+        self.clock.now += 3
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.acquire()
+        self.assertEqual(raised.exception.reason, 'open')
+        self.assertEqual(raised.exception.retry_after, 7)
+
+    def test_half_open_probes_close_the_circuit(self):
+        self._open()
+        self.clock.now += 10
+        first = self.breaker.acquire()
+        second = self.breaker.acquire()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.acquire()
+        self.assertEqual(raised.exception.reason, 'half_open')
+
+        self.breaker.release(first)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.release(second)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.transitions, [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)])
+
+    def test_failed_probe_reopens(self):
+        self._open()
+        self.clock.now += 10
+        self._call(failed=True)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.acquire()
+
+    def test_calls_admitted_before_a_transition_are_not_counted(self):
+        stale = self.breaker.acquire()
+        self._open()
+        self.clock.now += 10
+        self._call()
+        self.breaker.release(stale, failed=True)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+    def test_call_context_counts_exceptions_and_fail(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                with self.breaker.call():
+                    raise ValueError
+        for _ in range(2):
+            with self.breaker.call() as call:
+                call.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_max_in_flight_sheds_load(self):
+        breaker = CircuitBreaker('auth', timeout=1.0, max_in_flight=1, clock=self.clock)
+        call = breaker.acquire()
+        with self.assertRaises(CircuitOpenError) as raised:
+            breaker.acquire()
+        self.assertEqual(raised.exception.reason, 'overloaded')
+        breaker.release(call)
+        breaker.release(breaker.acquire())
+
+    def test_disabled_breaker_never_opens(self):
+        self.breaker.enabled = False
+        for _ in range(8):
+            self._call(failed=True)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_timeout_follows_recent_latency(self):
+        self.assertEqual(self.breaker.timeout(), 5.0)
+        for _ in range(4):
+            self._call(seconds=0.2)
+        self.assertAlmostEqual(self.breaker.timeout(), 0.6)
+        for _ in range(4):
+            self._call(seconds=0.01)
+        self.assertEqual(self.breaker.timeout(), self.breaker.min_timeout)
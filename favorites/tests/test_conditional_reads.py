@@ -0,0 +1,77 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+from django.utils.http import http_date
+
+from favorites import views
+from favorites.view_logic import favorites_validators
+
+from .fakes import MongoTestCase
+
+
+class FavoritesValidatorsTests(SimpleTestCase):
+    def test_etag_follows_user_and_version(self):
+        first = {'version': 1, 'updated_at': datetime(2024, 1, 1)}
+        second = {'version': 2, 'updated_at': datetime(2024, 1, 2)}
+        etags = {
+            favorites_validators('user-1', None)[0],
+            favorites_validators('user-1', first)[0],
+            favorites_validators('user-1', second)[0],
+            favorites_validators('user-2', first)[0],
+        }
+        self.assertEqual(len(etags), 4)
+        self.assertEqual(favorites_validators('user-1', first), favorites_validators('user-1', dict(first)))
+
+    def test_last_modified_is_the_version_time(self):
+        self.assertIsNone(favorites_validators('user-1', None)[1])
+        _, last_modified = favorites_validators('user-1', {'version': 1, 'updated_at': datetime(2024, 1, 1)})
+        self.assertEqual(http_date(last_modified), 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+
+class ConditionalReadTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.database['favorites'].insert_one(
+            {'user_id': 'user-1', 'product_id': 'p1', 'notes': '', 'created_at': datetime(2024, 1, 1)}
+        )
+        views.bump_user_version('user-1')
+
+    def _call(self, view, method='get', headers=None, **kwargs):
+        request = getattr(self.factory, method)('/', headers=headers or {})
+        request.user_id = 'user-1'
+        return view(request, **kwargs)
+
+    def test_full_response_carries_validators(self):
+        response = self._call(views.list_favorites)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'])
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_matching_etag_is_not_modified_without_reading_favorites(self):
+        etag = self._call(views.list_favorites)['ETag']
+        with mock.patch.object(views, 'FavoritesPage') as page:
+            response = self._call(views.list_favorites, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        page.assert_not_called()
+
+    def test_if_modified_since(self):
+        last_modified = self._call(views.list_favorites)['Last-Modified']
+        response = self._call(views.list_favorites, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_changes_the_etag(self):
+        etag = self._call(views.check_favorite, product_id='p1')['ETag']
+        self.assertEqual(
+            self._call(views.check_favorite, headers={'If-None-Match': etag}, product_id='p1').status_code, 304
+        )
+
+        self._call(views.check_favorite, method='delete', product_id='p1')
+
+        response = self._call(views.check_favorite, headers={'If-None-Match': etag}, product_id='p1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
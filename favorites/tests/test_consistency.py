@@ -0,0 +1,26 @@
+from bson import Timestamp
+from django.test import SimpleTestCase
+
+from favorites.consistency import dumps_token, loads_token
+
+CLUSTER_TIME = {'clusterTime': Timestamp(1700000000, 3), 'signature': {'hash': b'\x00' * 20, 'keyId': 7}}
+OPERATION_TIME = Timestamp(1700000000, 3)
+
+
+class CausalTokenTests(SimpleTestCase):
+    def test_round_trip(self):
+        token = dumps_token(CLUSTER_TIME, OPERATION_TIME)
+        self.assertEqual(loads_token(token), (CLUSTER_TIME, OPERATION_TIME))
+
+    def test_missing_token(self):
+        self.assertIsNone(loads_token(None))
+        self.assertIsNone(loads_token(''))
+
+    def test_tampered_token(self):
+        payload, signature = dumps_token(CLUSTER_TIME, OPERATION_TIME).rsplit(':', 1)
+        other = dumps_token(CLUSTER_TIME, Timestamp(1800000000, 1)).rsplit(':', 1)[0]
+        self.assertIsNone(loads_token(f'{other}:{signature}'))
+        self.assertIsNone(loads_token(f'{payload}:{signature[:-1]}'))
+
+    def test_malformed_token(self):
+        self.assertIsNone(loads_token('no-es-un-token'))
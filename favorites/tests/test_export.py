@@ -0,0 +1,104 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase
+
+from favorites import export, views
+from favorites.export import ndjson_chunks
+
+from .fakes import MongoTestCase
+
+
+def _favorite(user_id, product_id):
+    moment = datetime(2024, 1, 1)
+    return {
+        'user_id': user_id, 'product_id': product_id, 'notes': '',
+        'created_at': moment, 'updated_at': moment,
+    }
+
+
+def _lines(data):
+    return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+
+class NdjsonChunksTests(SimpleTestCase):
+    def test_chunks_hold_whole_lines(self):
+        docs = [_favorite('user-1', f'p{index}') for index in range(10)]
+        with mock.patch.object(export, 'CHUNK_SIZE', 300):
+            chunks = list(ndjson_chunks(docs))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.endswith(b'\n'))
+        lines = _lines(b''.join(chunks))
+        self.assertEqual([line['product_id'] for line in lines], [doc['product_id'] for doc in docs])
+
+
+class ExportViewTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        favorites = [_favorite('user-1', f'p{index}') for index in range(3)] + [_favorite('user-2', 'p9')]
+        self.ids = [str(_id) for _id in self.database['favorites'].insert_many(favorites).inserted_ids]
+
+    def _get(self, view, user_data=None, **params):
+        request = self.factory.get('/', params)
+        request.user_id = 'user-1'
+        request.user_data = user_data or {}
+        response = view(request)
+        body = b''.join(response.streaming_content) if response.status_code == 200 else None
+        return response, body
+
+    def test_exports_own_favorites_in_id_order(self):
+        response, body = self._get(views.export_favorites)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([line['id'] for line in _lines(body)], self.ids[:3])
+
+    def test_resumes_after_the_last_id(self):
+        _, body = self._get(views.export_favorites, after=self.ids[0])
+        self.assertEqual([line['id'] for line in _lines(body)], self.ids[1:3])
+
+    def test_bad_cursor(self):
+        response, _ = self._get(views.export_favorites, after='nope')
+        self.assertEqual(response.status_code, 400)
+
+    def test_gzip(self):
+        _, plain = self._get(views.export_favorites)
+        response, body = self._get(views.export_favorites, gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_admin_export_requires_admin(self):
+        response, _ = self._get(views.export_all_favorites, user_data={'permissions': ['user']})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_export_covers_every_user(self):
+        admin = {'permissions': ['admin']}
+        _, body = self._get(views.export_all_favorites, user_data=admin)
+        self.assertEqual([line['id'] for line in _lines(body)], self.ids)
+        _, body = self._get(views.export_all_favorites, user_data=admin, user_id='user-2')
+        self.assertEqual([line['id'] for line in _lines(body)], self.ids[3:])
+
+
+class ExportCommandTests(MongoTestCase):
+    def test_interrupted_export_is_resumed_by_appending(self):
+        ids = [str(_id) for _id in self.database['favorites'].insert_many(
+            [_favorite('user-1', f'p{index}') for index in range(4)]
+        ).inserted_ids]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'favorites.ndjson')
+            first = self.database['favorites'].find_one(sort=[('_id', 1)])
+            with open(path, 'wb') as output:
+                output.write(export.ndjson_line(first))
+
+            stderr = StringIO()
+            call_command('export_favorites', output=path, after=ids[0], stderr=stderr)
+
+            with open(path, 'rb') as output:
+                self.assertEqual([line['id'] for line in _lines(output.read())], ids)
+        self.assertIn(f'3 favoritos exportados (último id: {ids[-1]})', stderr.getvalue())
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from favorites import favorite_sets
+from favorites.favorite_sets import MISSING, FavoriteSetCache
+
+
+class FavoriteSetCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = FavoriteSetCache(max_bytes=1 << 20)
+
+    def test_load_is_stored(self):
+        token = self.cache.token('user-1')
+        self.cache.set('user-1', frozenset({'p1'}), token)
+        self.assertEqual(self.cache.get('user-1'), frozenset({'p1'}))
+
+    def test_invalidation_during_load_discards_it(self):
+        token = self.cache.token('user-1')
+        self.cache.invalidate('user-1')
+        self.cache.set('user-1', frozenset({'p1'}), token)
+        self.assertIs(self.cache.get('user-1'), MISSING)
+
+    def test_invalidating_another_user_keeps_the_load(self):
+        token = self.cache.token('user-1')
+        self.cache.invalidate('user-2')
+        self.cache.set('user-1', frozenset({'p1'}), token)
+        self.assertEqual(self.cache.get('user-1'), frozenset({'p1'}))
+
+    def test_clear_discards_every_load(self):
+        token = self.cache.token('user-1')
+        self.cache.clear()
+        self.cache.set('user-1', frozenset({'p1'}), token)
+        self.assertIs(self.cache.get('user-1'), MISSING)
+
+    def test_forgotten_generations_still_discard_stale_loads(self):
+        with mock.patch.object(favorite_sets, '_MAX_GENERATIONS', 2):
+            token = self.cache.token('user-1')
+            self.cache.invalidate('user-1')
+            self.cache.invalidate('user-2')
+            self.cache.invalidate('user-3')
+        self.cache.set('user-1', frozenset({'p1'}), token)
+        self.assertIs(self.cache.get('user-1'), MISSING)
+
+    def test_memory_bound_evicts_least_recently_used(self):
+        size = favorite_sets._sizeof('user-1', frozenset({'p1'}))
+        cache = FavoriteSetCache(max_bytes=size * 2)
+        for user_id in ('user-1', 'user-2', 'user-3'):
+            cache.set(user_id, frozenset({'p1'}), cache.token(user_id))
+        self.assertIs(cache.get('user-1'), MISSING)
+        self.assertEqual(len(cache), 2)
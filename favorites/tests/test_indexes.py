@@ -0,0 +1,94 @@
+from django.test import SimpleTestCase
+from pymongo import IndexModel
+
+from favorites import indexes
+
+
+class _Collection:
+    def __init__(self, name, info, log):
+        self.name = name
+        self.info = info
+        self.log = log
+
+    def index_information(self):
+        return {name: dict(index) for name, index in self.info.items()}
+
+    def create_indexes(self, models):
+        for model in models:
+            document = model.document
+            self.log.append(('create', self.name, document['name']))
+            options = {key: value for key, value in document.items() if key not in ('key', 'name')}
+            self.info[document['name']] = {'key': list(document['key'].items()), **options}
+
+    def drop_index(self, name):
+        self.log.append(('drop', self.name, name))
+        del self.info[name]
+
+
+class _Database:
+    """Records index operations on in-memory ``index_information`` dicts."""
+
+    def __init__(self, info):
+        self.log = []
+        self.collections = {name: _Collection(name, dict(indexes), self.log) for name, indexes in info.items()}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, _Collection(name, {}, self.log))
+
+    def command(self, name, collection, **kwargs):
+        self.log.append((name, collection, kwargs['index']['name']))
+        self.collections[collection].info[kwargs['index']['name']]['expireAfterSeconds'] = kwargs['index']['expireAfterSeconds']
+
+
+class SyncIndexesTests(SimpleTestCase):
+    def _sync(self, declared, existing):
+        database = _Database({'items': existing})
+        original = indexes.INDEXES
+        indexes.INDEXES = {'items': declared}
+        try:
+            diff = indexes.sync_indexes(database)
+        finally:
+            indexes.INDEXES = original
+        return database, diff
+
+    def test_creates_missing_before_dropping_extra(self):
+        database, diff = self._sync(
+            [IndexModel([('a', 1)])],
+            {'_id_': {'key': [('_id', 1)]}, 'b_1': {'key': [('b', 1)]}},
+        )
+        self.assertEqual(database.log, [('create', 'items', 'a_1'), ('drop', 'items', 'b_1')])
+        self.assertEqual(sorted(database['items'].info), ['_id_', 'a_1'])
+        self.assertEqual(diff['items'][2], ['b_1'])
+
+    def test_changed_index_is_rebuilt_behind_a_temporary_copy(self):
+        database, _ = self._sync(
+            [IndexModel([('a', 1), ('b', 1)], unique=True)],
+            {'a_1_b_1': {'key': [('a', 1), ('b', 1)]}},
+        )
+        self.assertEqual(database.log, [
+            ('create', 'items', 'a_1_b_1__sync'),
+            ('drop', 'items', 'a_1_b_1'),
+            ('create', 'items', 'a_1_b_1'),
+            ('drop', 'items', 'a_1_b_1__sync'),
+        ])
+        self.assertEqual(database['items'].info['a_1_b_1'], {'key': [('a', 1), ('b', 1)], 'unique': True})
+
+    def test_temporary_copy_keeps_options_but_not_ttl(self):
+        copy = indexes._temporary_copy(IndexModel([('a', 1)], sparse=True, expireAfterSeconds=60)).document
+        self.assertEqual(list(copy['key'].items()), [('a', 1), ('__sync', 1)])
+        self.assertEqual(copy['name'], 'a_1__sync')
+        self.assertTrue(copy['sparse'])
+        self.assertNotIn('expireAfterSeconds', copy)
+
+    def test_ttl_change_uses_coll_mod(self):
+        database, _ = self._sync(
+            [IndexModel([('finished_at', 1)], expireAfterSeconds=60)],
+            {'finished_at_1': {'key': [('finished_at', 1)], 'expireAfterSeconds': 30}},
+        )
+        self.assertEqual(database.log, [('collMod', 'items', 'finished_at_1')])
+        self.assertEqual(database['items'].info['finished_at_1']['expireAfterSeconds'], 60)
+
+    def test_in_sync(self):
+        database, diff = self._sync([IndexModel([('a', 1)])], {'a_1': {'key': [('a', 1)]}})
+        self.assertEqual(database.log, [])
+        self.assertEqual(diff, {'items': ([], [], [])})
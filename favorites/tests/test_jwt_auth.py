@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from favorites.jwt_auth import JWTVerifier
+
+SECRET = 'secreto-de-pruebas-con-longitud-suficiente'
+
+
+def _token(key=SECRET, algorithm='HS256', headers=None, **claims):
+    payload = {'id': 'user-1', 'exp': int(time.time()) + 60, **claims}
+    return jwt.encode({k: v for k, v in payload.items() if v is not None}, key, algorithm=algorithm, headers=headers)
+
+
+@override_settings(
+    AUTH_JWT_SECRET=SECRET,
+    AUTH_JWT_ALGORITHMS=['HS256'],
+    AUTH_JWT_PUBLIC_KEY_FILE='',
+    AUTH_JWT_JWKS_FILE='',
+    AUTH_JWT_USER_ID_CLAIM='id',
+    AUTH_JWT_AUDIENCE='favorites',
+    AUTH_JWT_ISSUER='auth',
+)
+class JWTVerifierClaimsTests(SimpleTestCase):
+    def setUp(self):
+        self.verifier = JWTVerifier()
+
+    def test_valid_token(self):
+        user_id, claims = self.verifier.verify(_token(aud='favorites', iss='auth', name='Ana'))
+        self.assertEqual(user_id, 'user-1')
+        self.assertEqual(claims['name'], 'Ana')
+
+    def test_expired(self):
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            self.verifier.verify(_token(aud='favorites', iss='auth', exp=int(time.time()) - 60))
+
+    def test_exp_is_required(self):
+        with self.assertRaises(jwt.MissingRequiredClaimError):
+            self.verifier.verify(_token(aud='favorites', iss='auth', exp=None))
+
+    def test_user_id_claim_is_required(self):
+        with self.assertRaises(jwt.MissingRequiredClaimError):
+            self.verifier.verify(_token(aud='favorites', iss='auth', id=None))
+
+    def test_wrong_audience(self):
+        with self.assertRaises(jwt.InvalidAudienceError):
+            self.verifier.verify(_token(aud='otro', iss='auth'))
+
+    def test_wrong_issuer(self):
+        with self.assertRaises(jwt.InvalidIssuerError):
+            self.verifier.verify(_token(aud='favorites', iss='otro'))
+
+    def test_wrong_signature(self):
+        with self.assertRaises(jwt.InvalidSignatureError):
+            self.verifier.verify(_token(key=SECRET + '-otro', aud='favorites', iss='auth'))
+
+    def test_algorithm_not_allowed(self):
+        with self.assertRaises(jwt.InvalidAlgorithmError):
+            self.verifier.verify(_token(algorithm='HS512', aud='favorites', iss='auth'))
+
+    @override_settings(AUTH_JWT_USER_ID_CLAIM='sub')
+    def test_custom_user_id_claim(self):
+        user_id, _ = JWTVerifier().verify(_token(aud='favorites', iss='auth', sub='user-2'))
+        self.assertEqual(user_id, 'user-2')
+
+    @override_settings(AUTH_JWT_SECRET='')
+    def test_requires_a_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            JWTVerifier()
+
+
+class JWTVerifierJWKSTests(SimpleTestCase):
+    def setUp(self):
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.key.public_key()))
+        handle, self.jwks_file = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as jwks:
+            json.dump({'keys': [{**jwk, 'kid': 'k1', 'use': 'sig', 'alg': 'RS256'}]}, jwks)
+        self.addCleanup(os.remove, self.jwks_file)
+
+    def _verifier(self):
+        with override_settings(
+            AUTH_JWT_SECRET='',
+            AUTH_JWT_ALGORITHMS=['RS256'],
+            AUTH_JWT_PUBLIC_KEY_FILE='',
+            AUTH_JWT_JWKS_FILE=self.jwks_file,
+            AUTH_JWT_USER_ID_CLAIM='id',
+            AUTH_JWT_AUDIENCE='',
+            AUTH_JWT_ISSUER='',
+        ):
+            return JWTVerifier()
+
+    def _private_pem(self):
+        return self.key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+
+    def test_key_selected_by_kid(self):
+        token = _token(key=self._private_pem(), algorithm='RS256', headers={'kid': 'k1'})
+        self.assertEqual(self._verifier().verify(token)[0], 'user-1')
+
+    def test_unknown_kid(self):
+        token = _token(key=self._private_pem(), algorithm='RS256', headers={'kid': 'k2'})
+        with self.assertRaises(jwt.InvalidKeyError):
+            self._verifier().verify(token)
@@ -0,0 +1,52 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from favorites import lifecycle, rabbit_client
+
+
+class LifespanTests(SimpleTestCase):
+    def test_startup_waits_for_the_warm_up(self):
+        messages = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        async def warm_up():
+            sent.append('warm_up')
+
+        async def serve():
+            for message_type in ('lifespan.startup', 'lifespan.shutdown'):
+                messages.put_nowait({'type': message_type})
+            await lifecycle.lifespan(messages.get, send)
+
+        with mock.patch.object(lifecycle, 'awarm_up', warm_up):
+            asyncio.run(serve())
+
+        self.assertEqual(sent, ['warm_up', 'lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+    def test_warm_up_failures_are_logged(self):
+        async def fail():
+            raise OSError('sin conexión')
+
+        with mock.patch.object(lifecycle, '_awarm_auth', fail), \
+                mock.patch.object(lifecycle, '_aping_mongo', fail), \
+                mock.patch.object(rabbit_client, 'aconnect_catalog', fail), \
+                self.assertLogs('favorites.lifecycle', 'WARNING') as logs:
+            asyncio.run(lifecycle.awarm_up())
+
+        self.assertEqual(len(logs.records), 3)
+
+
+@override_settings(ASYNC_MODE=True)
+class AsyncCatalogReadinessTests(SimpleTestCase):
+    def test_not_ready_before_connecting(self):
+        with mock.patch.object(rabbit_client, '_async_validator', None):
+            self.assertFalse(rabbit_client.catalog_connected())
+
+    def test_ready_once_connected(self):
+        validator = mock.Mock(is_connected=mock.Mock(return_value=True))
+        with mock.patch.object(rabbit_client, '_async_validator', validator):
+            self.assertTrue(rabbit_client.catalog_connected())
@@ -0,0 +1,20 @@
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from favorites.views import metrics
+
+
+class MetricsTokenTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    @override_settings(METRICS_TOKEN='')
+    def test_open_without_token(self):
+        self.assertEqual(metrics(self.factory.get('/metrics')).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3creto')
+    def test_requires_token(self):
+        self.assertEqual(metrics(self.factory.get('/metrics')).status_code, 401)
+        wrong = self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer otro')
+        self.assertEqual(metrics(wrong).status_code, 401)
+        right = self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer s3creto')
+        self.assertEqual(metrics(right).status_code, 200)
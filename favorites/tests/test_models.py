@@ -0,0 +1,213 @@
+import os
+import threading
+import unittest
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from favorites.indexes import apply_indexes
+from favorites.models import _bulk_write_failures, bulk_upsert, favorite_upsert_update, upsert_favorite
+
+from .fakes import SerializedCollection, mongo_client, run_threads
+
+# A scratch MongoDB for the concurrency tests that need a real server, e.g.
+# mongodb://localhost:27017. Each run uses (and drops) its own database.
+TEST_MONGODB_HOST = os.environ.get('FAVORITES_TEST_MONGODB_HOST')
+
+
+def _favorites_collection():
+    return mongo_client()[settings.MONGODB_NAME]['favorites']
+
+
+def _upsert(product_id, notes='', now=None):
+    return UpdateOne(
+        {'user_id': 'user-1', 'product_id': product_id},
+        favorite_upsert_update(notes, now or datetime.utcnow()),
+        upsert=True,
+    )
+
+
+class UpsertFavoriteTests(SimpleTestCase):
+    def setUp(self):
+        self.collection = _favorites_collection()
+
+    def test_first_call_creates(self):
+        doc, created = upsert_favorite(self.collection, 'user-1', 'product-1', 'nota')
+        self.assertTrue(created)
+        self.assertEqual(doc['notes'], 'nota')
+        self.assertEqual(self.collection.count_documents({}), 1)
+
+    def test_second_call_returns_existing(self):
+        first, _ = upsert_favorite(self.collection, 'user-1', 'product-1', 'nota')
+        second, created = upsert_favorite(self.collection, 'user-1', 'product-1', '')
+        self.assertFalse(created)
+        self.assertEqual(second['_id'], first['_id'])
+        self.assertEqual(second['created_at'], first['created_at'])
+        # Empty notes leave the existing ones untouched.
+        self.assertEqual(second['notes'], 'nota')
+
+    def test_notes_overwrite_existing(self):
+        upsert_favorite(self.collection, 'user-1', 'product-1', 'vieja')
+        doc, created = upsert_favorite(self.collection, 'user-1', 'product-1', 'nueva')
+        self.assertFalse(created)
+        self.assertEqual(doc['notes'], 'nueva')
+
+
+class _RacingCollection:
+    """Stands in for a collection where every upsert but the first loses the insert race once."""
+
+    def __init__(self):
+        self.doc = None
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def find_one_and_update(self, query, update, **kwargs):
+        with self._lock:
+            thread = threading.get_ident()
+            self.calls[thread] = self.calls.get(thread, 0) + 1
+            if self.doc is None:
+                self.doc = {**query, **update['$setOnInsert']}
+            elif self.calls[thread] == 1:
+                raise DuplicateKeyError('E11000 duplicate key error')
+            return dict(self.doc)
+
+
+class _AlwaysDuplicateCollection:
+    def find_one_and_update(self, query, update, **kwargs):
+        raise DuplicateKeyError('E11000 duplicate key error')
+
+
+def _hammer(test, collection, threads=32):
+    """Upserts one favorite from ``threads`` threads at once and checks a single creation."""
+    user_id = f'race-{uuid.uuid4()}'
+    results, errors = run_threads(threads, lambda index: upsert_favorite(
+        collection, user_id, 'product-1', f'nota {index}' if index % 2 else '',
+    ))
+    test.assertEqual(errors, [])
+    test.assertEqual(sum(created for _, created in results), 1)
+    test.assertEqual(len({doc['_id'] for doc, _ in results}), 1)
+    test.assertEqual(collection.count_documents({'user_id': user_id}), 1)
+
+
+class UpsertFavoriteRaceTests(SimpleTestCase):
+    def test_concurrent_upserts_retry_duplicate_key(self):
+        collection = _RacingCollection()
+        threads = 16
+        results, errors = run_threads(threads, lambda index: upsert_favorite(collection, 'user-1', 'product-1', ''))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(created for _, created in results), 1)
+        self.assertEqual({doc['_id'] for doc, _ in results}, {collection.doc['_id']})
+        self.assertEqual(sorted(collection.calls.values()), [1] + [2] * (threads - 1))
+
+    def test_second_duplicate_key_is_raised(self):
+        with self.assertRaises(DuplicateKeyError):
+            upsert_favorite(_AlwaysDuplicateCollection(), 'user-1', 'product-1', '')
+
+    def test_concurrent_upserts_create_once(self):
+        for _ in range(10):
+            _hammer(self, SerializedCollection(_favorites_collection()))
+
+    @unittest.skipUnless(TEST_MONGODB_HOST, 'FAVORITES_TEST_MONGODB_HOST no está configurado')
+    def test_concurrent_upserts_create_once_on_mongodb(self):
+        client = MongoClient(TEST_MONGODB_HOST, serverSelectionTimeoutMS=5000)
+        self.addCleanup(client.close)
+        name = f'favorites_test_{uuid.uuid4().hex[:12]}'
+        self.addCleanup(client.drop_database, name)
+        database = client[name]
+        apply_indexes(database)
+        for _ in range(20):
+            _hammer(self, database['favorites'], threads=64)
+
+
+class BulkUpsertTests(SimpleTestCase):
+    def setUp(self):
+        self.collection = _favorites_collection()
+
+    def test_reports_created_items(self):
+        upsert_favorite(self.collection, 'user-1', 'product-0', '')
+        # mongomock numbers ``upserted`` by upsert rather than by operation,
+        # so the existing favorite goes last.
+        operations = [_upsert('product-1'), _upsert('product-2', 'nota'), _upsert('product-0', 'nota')]
+
+        upserted, failed = bulk_upsert(self.collection, operations)
+
+        self.assertEqual(upserted, {0, 1})
+        self.assertEqual(failed, set())
+        self.assertEqual(self.collection.count_documents({'user_id': 'user-1'}), 3)
+        self.assertEqual(self.collection.find_one({'product_id': 'product-0'})['notes'], 'nota')
+
+    def test_existing_items_are_not_created(self):
+        for product_id in ('product-1', 'product-2'):
+            upsert_favorite(self.collection, 'user-1', product_id, '')
+
+        upserted, failed = bulk_upsert(self.collection, [_upsert('product-1'), _upsert('product-2')])
+
+        self.assertEqual((upserted, failed), (set(), set()))
+        self.assertEqual(self.collection.count_documents({}), 2)
+
+
+class _BulkCollection:
+    """Answers each bulk_write with the next queued result or BulkWriteError details."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls.append(operations)
+        reply = self.replies.pop(0)
+        if isinstance(reply, dict):
+            raise BulkWriteError(reply)
+        return reply
+
+
+class _Result:
+    def __init__(self, upserted_ids):
+        self.upserted_ids = upserted_ids
+
+
+class BulkUpsertRetryTests(SimpleTestCase):
+    def test_duplicate_keys_are_retried_once(self):
+        operations = [_upsert('product-1'), _upsert('product-2'), _upsert('product-3')]
+        collection = _BulkCollection(
+            {
+                'upserted': [{'index': 0, '_id': 'a'}],
+                'writeErrors': [{'index': 1, 'code': 11000}, {'index': 2, 'code': 11000}],
+            },
+            {'writeErrors': [{'index': 1, 'code': 2}]},
+        )
+
+        upserted, failed = bulk_upsert(collection, operations)
+
+        self.assertEqual(collection.calls[1], [operations[1], operations[2]])
+        self.assertEqual(upserted, {0})
+        self.assertEqual(failed, {2})
+
+    def test_other_errors_are_not_retried(self):
+        collection = _BulkCollection({'writeErrors': [{'index': 0, 'code': 2}]})
+
+        upserted, failed = bulk_upsert(collection, [_upsert('product-1'), _upsert('product-2')])
+
+        self.assertEqual(len(collection.calls), 1)
+        self.assertEqual((upserted, failed), (set(), {0}))
+
+    def test_success(self):
+        collection = _BulkCollection(_Result({1: 'b'}))
+        self.assertEqual(bulk_upsert(collection, [_upsert('product-1'), _upsert('product-2')]), ({1}, set()))
+
+
+class BulkWriteFailuresTests(SimpleTestCase):
+    def test_splits_upserts_failures_and_duplicates(self):
+        details = {
+            'upserted': [{'index': 0, '_id': 'a'}, {'index': 3, '_id': 'b'}],
+            'writeErrors': [{'index': 1, 'code': 11000}, {'index': 2, 'code': 121}, {'index': 4, 'code': 11000}],
+        }
+        self.assertEqual(_bulk_write_failures(details), ({0, 3}, {2}, [1, 4]))
+
+    def test_empty_details(self):
+        self.assertEqual(_bulk_write_failures({}), (set(), set(), []))
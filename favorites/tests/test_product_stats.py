@@ -0,0 +1,82 @@
+from datetime import datetime
+from unittest import mock
+
+from favorites import models
+from favorites.models import increment_favorite_counts, rebuild_product_stats
+
+from .fakes import MongoTestCase
+
+JAN = datetime(2024, 1, 1)
+FEB = datetime(2024, 2, 1)
+
+
+class FavoriteCountsTests(MongoTestCase):
+    def _stats(self, product_id):
+        return self.database['product_stats'].find_one({'_id': product_id}, {'_id': 0})
+
+    def test_increments_and_decrements(self):
+        increment_favorite_counts(['p1', 'p2'], 1, JAN)
+        increment_favorite_counts(['p1'], 1, FEB)
+        increment_favorite_counts(['p1'], -1)
+        self.assertEqual(self._stats('p1'), {'favorite_count': 1, 'last_added': FEB})
+        self.assertEqual(self._stats('p2'), {'favorite_count': 1, 'last_added': JAN})
+
+    def test_decrement_does_not_create_counters(self):
+        increment_favorite_counts(['p1'], -1)
+        self.assertIsNone(self._stats('p1'))
+
+
+class RebuildProductStatsTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.favorites = self.database['favorites']
+        self.stats = self.database['product_stats']
+        self.favorites.insert_many([
+            {'user_id': 'user-1', 'product_id': 'p1', 'created_at': JAN},
+            {'user_id': 'user-2', 'product_id': 'p1', 'created_at': FEB},
+            {'user_id': 'user-1', 'product_id': 'p2', 'created_at': JAN},
+        ])
+
+    def _stats(self):
+        return {doc.pop('_id'): doc for doc in self.stats.find()}
+
+    def test_fixes_drifted_missing_and_orphan_counters(self):
+        self.stats.insert_many([
+            # Lost an increment, and last_added names a deleted favorite.
+            {'_id': 'p1', 'favorite_count': 1, 'last_added': datetime(2024, 3, 1)},
+            {'_id': 'gone', 'favorite_count': 4, 'last_added': JAN},
+        ])
+
+        self.assertEqual(rebuild_product_stats(), (3, []))
+
+        self.assertEqual(self._stats(), {
+            'p1': {'favorite_count': 2, 'last_added': FEB},
+            'p2': {'favorite_count': 1, 'last_added': JAN},
+        })
+        self.assertEqual(rebuild_product_stats(), (0, []))
+
+    def test_increment_during_rebuild_is_kept(self):
+        self.stats.insert_many([
+            {'_id': 'p1', 'favorite_count': 2, 'last_added': FEB},
+            {'_id': 'p2', 'favorite_count': 1, 'last_added': JAN},
+        ])
+        favorites = self.favorites
+        aggregate = favorites.aggregate
+        raced = []
+
+        def racing_aggregate(pipeline, **kwargs):
+            # A favorite of p1 is created after its counter was read.
+            if '$match' in pipeline[0] and not raced:
+                raced.append(favorites.insert_one({'user_id': 'user-3', 'product_id': 'p1', 'created_at': FEB}))
+                increment_favorite_counts(['p1'], 1, FEB)
+                self.stats.update_one({'_id': 'p2'}, {'$set': {'favorite_count': 7}})
+            return aggregate(pipeline, **kwargs)
+
+        with mock.patch.object(favorites, 'aggregate', racing_aggregate), \
+                mock.patch.object(models, 'get_favorites_collection', return_value=favorites):
+            rebuild_product_stats()
+
+        self.assertEqual(self._stats(), {
+            'p1': {'favorite_count': 3, 'last_added': FEB},
+            'p2': {'favorite_count': 1, 'last_added': JAN},
+        })
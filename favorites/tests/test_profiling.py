@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from favorites import profiling
+from favorites.middleware import AsyncProfilingMiddleware, ProfilingMiddleware
+
+
+def _find(collection, request_id):
+    """Reports a ``find`` on ``collection`` the way pymongo's monitoring would."""
+    started = SimpleNamespace(command_name='find', command={'find': collection}, request_id=request_id)
+    profiling._command_listener.started(started)
+    profiling._command_listener.succeeded(
+        SimpleNamespace(command_name='find', request_id=request_id, duration_micros=1500)
+    )
+
+
+def _view(request):
+    _find('favorites', 1)
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return HttpResponse('ok')
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = override_settings(
+            PROFILING_DIR=self.directory, PROFILING_SECRET='secreto', PROFILING_SAMPLE_RATE=0.0,
+            PROFILING_INTERVAL=0.001,
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.factory = RequestFactory()
+
+    def _files(self):
+        return sorted(os.listdir(self.directory))
+
+    def _summary(self, name):
+        with open(os.path.join(self.directory, name + '.json'), encoding='utf-8') as handle:
+            return json.load(handle)
+
+    def test_requests_are_not_profiled_by_default(self):
+        response = ProfilingMiddleware(_view)(self.factory.get('/api/favorites/'))
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self._files(), [])
+
+    def test_wrong_secret_is_not_profiled(self):
+        response = ProfilingMiddleware(_view)(self.factory.get('/', headers={'X-Profile': 'otro'}))
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_sampling_profile(self):
+        request = self.factory.get('/api/favorites/', headers={'X-Profile': 'secreto'})
+        response = ProfilingMiddleware(_view)(request)
+        name = response['X-Profile-Id']
+        self.assertEqual(self._files(), [name + '.folded', name + '.json'])
+        with open(os.path.join(self.directory, name + '.folded'), encoding='utf-8') as handle:
+            self.assertIn('_view (test_profiling.py', handle.read())
+
+        summary = self._summary(name)
+        self.assertEqual(
+            (summary['path'], summary['status'], summary['mode']), ('/api/favorites/', 200, 'sampling')
+        )
+        self.assertEqual(
+            summary['mongo_commands'],
+            [{'command': 'find', 'collection': 'favorites', 'duration_ms': 1.5, 'ok': True}],
+        )
+        self.assertEqual(summary['mongo_ms'], 1.5)
+
+    @override_settings(PROFILING_MODE='cprofile')
+    def test_cprofile(self):
+        name = ProfilingMiddleware(_view)(self.factory.get('/', headers={'X-Profile': 'secreto'}))['X-Profile-Id']
+        self.assertEqual(self._files(), [name + '.json', name + '.prof'])
+        self.assertEqual(self._summary(name)['mode'], 'cprofile')
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.5)
+    def test_sample_rate(self):
+        middleware = ProfilingMiddleware(_view)
+        with mock.patch('favorites.profiling.random.random', side_effect=[0.4, 0.6]):
+            sampled = middleware(self.factory.get('/'))
+            skipped = middleware(self.factory.get('/'))
+        self.assertIn('X-Profile-Id', sampled)
+        self.assertNotIn('X-Profile-Id', skipped)
+
+    def test_commands_outside_profiled_requests_are_ignored(self):
+        _find('favorites', 2)
+        name = ProfilingMiddleware(_view)(self.factory.get('/', headers={'X-Profile': 'secreto'}))['X-Profile-Id']
+        self.assertEqual(len(self._summary(name)['mongo_commands']), 1)
+
+    def test_async_middleware(self):
+        async def view(request):
+            _find('favorites', 3)
+            return HttpResponse('ok')
+
+        request = self.factory.get('/', headers={'X-Profile': 'secreto'})
+        name = asyncio.run(AsyncProfilingMiddleware(view)(request))['X-Profile-Id']
+        self.assertEqual(len(self._summary(name)['mongo_commands']), 1)
+
+    @override_settings(PROFILING_MODE='tracing')
+    def test_unknown_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ProfilingMiddleware(_view)
+
+
+class RotateTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def _profile(self, name, mtime, size=100):
+        for extension in ('.json', '.folded'):
+            path = os.path.join(self.directory, name + extension)
+            with open(path, 'wb') as handle:
+                handle.write(b'x' * size)
+            os.utime(path, (mtime, mtime))
+
+    def test_oldest_profiles_are_removed_together(self):
+        for index, name in enumerate(('old', 'middle', 'new')):
+            self._profile(name, 1000 + index)
+        profiling.rotate(self.directory, 450)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['middle.folded', 'middle.json', 'new.folded', 'new.json'],
+        )
+
+    def test_newest_profile_is_kept_over_the_limit(self):
+        self._profile('old', 1000)
+        self._profile('new', 1001, size=1000)
+        profiling.rotate(self.directory, 10)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['new.folded', 'new.json'])
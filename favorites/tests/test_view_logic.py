@@ -0,0 +1,113 @@
+from datetime import datetime
+
+from bson import ObjectId
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
+
+from favorites.view_logic import (
+    FavoritesPage,
+    RequestError,
+    after_query,
+    batch_reply,
+    batch_unavailable,
+    decode_cursor,
+    encode_cursor,
+    is_admin,
+    lookup_data,
+)
+from favorites.rabbit_client import ArticleValidationError, CatalogUnavailableError, InvalidArticleError
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        doc = {'created_at': datetime(2024, 5, 1, 12, 30, 15, 123000), '_id': ObjectId()}
+        cursor = encode_cursor(doc)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (doc['created_at'], doc['_id']))
+
+    def test_invalid_cursors(self):
+        for cursor in ('@@@', 'bm90LWEtY3Vyc29y', encode_cursor({'created_at': datetime(2024, 1, 1), '_id': 'x'})):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_after_query(self):
+        doc = {'created_at': datetime(2024, 5, 1), '_id': ObjectId()}
+        self.assertEqual(after_query('user-1', ''), {'user_id': 'user-1'})
+        self.assertEqual(after_query('user-1', encode_cursor(doc)), {
+            'user_id': 'user-1',
+            '$or': [
+                {'created_at': {'$lt': doc['created_at']}},
+                {'created_at': doc['created_at'], '_id': {'$lt': doc['_id']}},
+            ],
+        })
+
+
+class FavoritesPageTests(SimpleTestCase):
+    def _docs(self, count):
+        return [
+            {'_id': ObjectId(), 'user_id': 'user-1', 'product_id': f'p{n}', 'created_at': datetime(2024, 5, 1, n)}
+            for n in range(count)
+        ]
+
+    def test_keyset_page_has_next_cursor_when_more_remain(self):
+        page = FavoritesPage('user-1', QueryDict('after=&limit=2'))
+        docs = self._docs(3)
+        data = page.reply(docs).data
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(decode_cursor(data['next']), (docs[1]['created_at'], docs[1]['_id']))
+        self.assertNotIn('count', data)
+        self.assertIsNone(page.reply(docs[:2]).data['next'])
+
+    def test_bad_cursor(self):
+        with self.assertRaises(RequestError) as raised:
+            FavoritesPage('user-1', QueryDict('after=@@@'))
+        self.assertEqual(raised.exception.reply.status, 400)
+
+    def test_offset_page(self):
+        page = FavoritesPage('user-1', QueryDict('page=2&limit=2'))
+        data = page.reply(self._docs(2), 5).data
+        self.assertEqual((data['page'], data['count'], data['total_pages']), (2, 5, 3))
+
+
+class BatchReplyTests(SimpleTestCase):
+    def test_catalog_failures_are_unavailable_not_invalid(self):
+        items = [{'product_id': 'gone'}, {'product_id': 'slow'}, {'product_id': 'refused'}]
+        validations = {
+            'gone': InvalidArticleError('no existe'),
+            'slow': ArticleValidationError('Timeout'),
+            'refused': CatalogUnavailableError('Catálogo no disponible', 7),
+        }
+        statuses = [item['status'] for item in batch_reply(items, validations, set(), set(), {}).data['results']]
+        self.assertEqual(statuses, [400, 503, 503])
+        self.assertIsNone(batch_unavailable(validations))
+
+    def test_whole_batch_unavailable(self):
+        reply = batch_unavailable({
+            'slow': ArticleValidationError('Timeout'),
+            'refused': CatalogUnavailableError('Catálogo no disponible', 7),
+        })
+        self.assertEqual((reply.status, reply.headers), (503, {'Retry-After': '7'}))
+        self.assertEqual(batch_unavailable({'slow': ArticleValidationError('Timeout')}).status, 503)
+        self.assertIsNone(batch_unavailable({'ok': {'valid': True}}))
+
+
+class LookupDataTests(SimpleTestCase):
+    def test_comma_separated_and_repeated(self):
+        self.assertEqual(lookup_data(QueryDict('product_ids=a,b,&product_ids=c')), {'product_ids': ['a', 'b', 'c']})
+
+
+class IsAdminTests(SimpleTestCase):
+    def test_default_claim(self):
+        self.assertTrue(is_admin({'permissions': ['user', 'admin']}))
+        self.assertFalse(is_admin({'permissions': ['user']}))
+        self.assertFalse(is_admin({}))
+        self.assertFalse(is_admin(None))
+
+    @override_settings(AUTH_ADMIN_CLAIM='role', AUTH_ADMIN_VALUE='superuser')
+    def test_configured_claim(self):
+        self.assertTrue(is_admin({'role': 'superuser'}))
+        self.assertFalse(is_admin({'role': 'user', 'permissions': ['admin']}))
+
+    @override_settings(AUTH_ADMIN_CLAIM='')
+    def test_disabled(self):
+        self.assertFalse(is_admin({'permissions': ['admin']}))
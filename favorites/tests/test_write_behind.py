@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import RequestFactory, override_settings
+
+from favorites import views, write_behind
+from favorites.rabbit_client import ArticleValidationError, InvalidArticleError
+from favorites.write_behind import DONE, FAILED, PENDING, REJECTED, IntentProcessor, create_intent
+
+from .fakes import MongoTestCase
+
+
+def _catalog(unavailable=(), invalid=()):
+    """A ``validate_articles`` stand-in."""
+    def validate_articles(article_ids, reference_id):
+        results = {}
+        for article_id in article_ids:
+            if article_id in unavailable:
+                results[article_id] = ArticleValidationError('Timeout validando artículo contra catálogo')
+            elif article_id in invalid:
+                results[article_id] = InvalidArticleError('El artículo no existe o está deshabilitado')
+            else:
+                results[article_id] = {'articleId': article_id, 'valid': True}
+        return results
+    return validate_articles
+
+
+@override_settings(
+    FAVORITES_WRITE_BEHIND_MAX_ATTEMPTS=2,
+    FAVORITES_WRITE_BEHIND_RETRY_DELAY=10,
+    FAVORITES_WRITE_BEHIND_LEASE_SECONDS=60,
+)
+class IntentProcessorTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.intents = self.database['favorite_intents']
+
+    def _process(self, catalog=None):
+        with mock.patch.object(write_behind, 'validate_articles', catalog or _catalog()):
+            return IntentProcessor(batch_size=10).run_once()
+
+    def _intent(self, product_id):
+        return self.intents.find_one({'product_id': product_id})
+
+    def _make_due(self):
+        self.intents.update_many({}, {'$set': {'retry_at': datetime.utcnow() - timedelta(seconds=1)}})
+
+    def test_outcomes(self):
+        for product_id in ('ok', 'invalid', 'unavailable'):
+            create_intent('user-1', product_id, 'nota')
+
+        self.assertEqual(self._process(_catalog(unavailable={'unavailable'}, invalid={'invalid'})), 3)
+
+        self.assertEqual(self._intent('ok')['status'], DONE)
+        self.assertEqual(self._intent('invalid')['status'], REJECTED)
+        self.assertEqual(self._intent('invalid')['error'], 'El artículo no existe o está deshabilitado')
+        retried = self._intent('unavailable')
+        self.assertEqual((retried['status'], retried['attempts']), (PENDING, 1))
+        self.assertGreater(retried['retry_at'], datetime.utcnow() + timedelta(seconds=5))
+        self.assertNotIn('claim', retried)
+
+        favorite = self.database['favorites'].find_one({'user_id': 'user-1'})
+        self.assertEqual((favorite['product_id'], favorite['notes']), ('ok', 'nota'))
+        self.assertEqual(self.database['product_stats'].find_one({'_id': 'ok'})['favorite_count'], 1)
+        self.assertEqual(self.database['user_versions'].find_one({'_id': 'user-1'})['version'], 1)
+
+    def test_retries_wait_for_their_backoff_then_fail(self):
+        create_intent('user-1', 'unavailable', '')
+        catalog = _catalog(unavailable={'unavailable'})
+
+        self.assertEqual(self._process(catalog), 1)
+        self.assertEqual(self._process(catalog), 0)
+
+        self._make_due()
+        self.assertEqual(self._process(catalog), 1)
+        failed = self._intent('unavailable')
+        self.assertEqual((failed['status'], failed['attempts']), (FAILED, 2))
+        self.assertIn('finished_at', failed)
+
+    def test_claimed_intents_are_not_claimed_twice(self):
+        create_intent('user-1', 'p1', '')
+        first, second = IntentProcessor(), IntentProcessor()
+        self.assertEqual(len(first.claim()), 1)
+        self.assertEqual(second.claim(), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        create_intent('user-1', 'p1', '')
+        crashed = IntentProcessor()
+        [intent] = crashed.claim()
+        self.intents.update_one({}, {'$set': {'claimed_at': datetime.utcnow() - timedelta(seconds=61)}})
+
+        self.assertEqual(self._process(), 1)
+        self.assertEqual(self._intent('p1')['status'], DONE)
+
+        # The crashed worker's late outcome no longer applies.
+        with mock.patch.object(write_behind, 'validate_articles', _catalog(unavailable={'p1'})):
+            crashed.process([intent])
+        self.assertEqual((self._intent('p1')['status'], self._intent('p1')['attempts']), (DONE, 2))
+
+
+@override_settings(FAVORITES_WRITE_BEHIND=True)
+class WriteBehindViewTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    def _request(self, method, path='/', data=None):
+        request = getattr(self.factory, method)(path, data, content_type='application/json')
+        request.user_id = 'user-1'
+        return request
+
+    def test_post_queues_an_intent_and_status_reports_it(self):
+        with mock.patch.object(views, 'validate_article') as validate:
+            response = views.list_favorites(self._request('post', data={'product_id': 'p1', 'notes': 'n'}))
+        validate.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], PENDING)
+        intent_id = response.data['id']
+        self.assertTrue(response['Location'].endswith(f'/{intent_id}/'))
+        self.assertEqual(self.database['favorites'].count_documents({}), 0)
+
+        with mock.patch.object(write_behind, 'validate_articles', _catalog()):
+            IntentProcessor().run_once()
+
+        response = views.favorite_intent_status(self._request('get'), intent_id)
+        self.assertEqual(response.data['status'], DONE)
+        self.assertEqual(response.data['favorite']['product_id'], 'p1')
+
+    def test_other_users_intents_are_not_found(self):
+        intent = create_intent('user-2', 'p1', '')
+        response = views.favorite_intent_status(self._request('get'), str(intent['_id']))
+        self.assertEqual(response.status_code, 404)
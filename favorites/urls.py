@@ -3,8 +3,14 @@ from . import views
 
 urlpatterns = [
     path('favorites/', views.list_favorites, name='list_favorites'),
+    path('favorites/batch/', views.create_favorites_batch, name='create_favorites_batch'),
+    path('favorites/check/', views.check_favorites_bulk, name='check_favorites_bulk'),
+    path('favorites/export/', views.export_favorites, name='export_favorites'),
+    path('favorites/counts/', views.get_favorite_counts, name='get_favorite_counts'),
+    path('favorites/intents/<str:intent_id>/', views.favorite_intent_status, name='favorite_intent_status'),
     path('favorites/<str:favorite_id>/', views.delete_favorite, name='delete_favorite'),
     path('favorites/product/<str:product_id>/', views.check_favorite, name='check_favorite'),
     path('favorites/admin/popular/', views.get_popular_favorites, name='get_popular_favorites'),
+    path('favorites/admin/export/', views.export_all_favorites, name='export_all_favorites'),
 ]
 
@@ -0,0 +1,461 @@
+"""
+View logic shared by ``views`` (PyMongo, DRF) and ``async_views`` (Motor).
+
+Request parsing and validation, permission checks, the MongoDB queries of
+each endpoint and the shaping of their responses (Reply, streaming
+exports) live here; the two view modules only differ in how they run the
+I/O. Parsing and permission helpers raise RequestError, whose ``reply``
+the views render as is. Queries are built here but run by the views.
+"""
+import base64
+import binascii
+import calendar
+import hashlib
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from pymongo import UpdateOne
+from rest_framework import status
+
+from .cache import TTLCache
+from .export import export_query
+from .models import FAVORITE_PROJECTION, Favorite, favorite_upsert_update
+from .rabbit_client import ArticleValidationError, CatalogUnavailableError, InvalidArticleError
+from .serializers import FavoriteCreateSerializer, FavoriteLookupSerializer
+from .write_behind import DONE, intent_response
+
+FAVORITES_ORDER = [('created_at', -1), ('_id', -1)]
+
+
+class Reply:
+    """JSON body, status and headers of a response; each view module renders it."""
+
+    def __init__(self, data, status=status.HTTP_200_OK, headers=None):
+        self.data = data
+        self.status = status
+        self.headers = headers
+
+
+class RequestError(Exception):
+    """A request answered with ``reply`` before any I/O."""
+
+    def __init__(self, data, status=status.HTTP_400_BAD_REQUEST, headers=None):
+        super().__init__(data)
+        self.reply = Reply(data, status, headers)
+
+
+FAVORITE_NOT_FOUND = Reply({'error': 'Favorito no encontrado'}, status.HTTP_404_NOT_FOUND)
+FAVORITE_DELETED = Reply({'message': 'Favorito eliminado correctamente'}, status.HTTP_204_NO_CONTENT)
+INTENT_NOT_FOUND = Reply({'error': 'Solicitud no encontrada'}, status.HTTP_404_NOT_FOUND)
+
+
+def method_not_allowed(method, allowed):
+    return RequestError(
+        {'detail': f'Método "{method}" no permitido.'},
+        status.HTTP_405_METHOD_NOT_ALLOWED,
+        {'Allow': ', '.join(allowed)},
+    )
+
+
+def parse_json(body):
+    """Parses a JSON request body, as DRF's JSONParser does. Raises RequestError."""
+    if not body:
+        return {}
+    try:
+        return json.loads(body)
+    except ValueError as exc:
+        raise RequestError({'detail': f'JSON parse error - {exc}'}) from exc
+
+
+def validation_error(exc, invalid_status=status.HTTP_400_BAD_REQUEST):
+    """Reply for an exception raised while validating articles with the catalog."""
+    if isinstance(exc, CatalogUnavailableError):
+        return Reply({'error': str(exc)}, status.HTTP_503_SERVICE_UNAVAILABLE, {'Retry-After': str(exc.retry_after)})
+    if isinstance(exc, ArticleValidationError):
+        return Reply({'error': str(exc)}, invalid_status)
+    return Reply({'error': 'No se pudo validar el artículo'}, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def parse_object_id(value, message):
+    try:
+        return ObjectId(value)
+    except InvalidId:
+        raise RequestError({'error': message}) from None
+
+
+## validadores HTTP (ETag / Last-Modified)
+
+def favorites_validators(user_id, version_doc):
+    """Returns (etag, last_modified) for the current version of a user's favorites."""
+    owner = hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()[:12]
+    if version_doc is None:
+        return f'"{owner}-0"', None
+    return f'"{owner}-{version_doc["version"]}"', calendar.timegm(version_doc['updated_at'].utctimetuple())
+
+
+def with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """Returns a 304 when the client's copy (If-None-Match / If-Modified-Since) is current."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        return None
+    return with_validators(response, etag, last_modified)
+
+
+## listar y crear favos
+
+def encode_cursor(doc):
+    raw = f"{doc['created_at'].isoformat()},{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, _id) from an ``after`` cursor. Raises ValueError."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, object_id = base64.urlsafe_b64decode(padded).decode('utf-8').split(',', 1)
+        return datetime.fromisoformat(created_at), ObjectId(object_id)
+    except (binascii.Error, UnicodeDecodeError, InvalidId, TypeError) as exc:
+        raise ValueError(cursor) from exc
+
+
+def after_query(user_id, after):
+    """Query for the favorites that follow the ``after`` cursor. Raises ValueError."""
+    query = {'user_id': user_id}
+    if after:
+        created_at, object_id = decode_cursor(after)
+        query['$or'] = [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': object_id}},
+        ]
+    return query
+
+
+def wants_count(query_params):
+    return query_params.get('include_count', '').lower() in ('1', 'true')
+
+
+class FavoritesPage:
+    """A page of ``GET /favorites/``: by ``page`` (offset) or after an ``after`` cursor (keyset).
+
+    Raises RequestError for a bad cursor.
+    """
+
+    def __init__(self, user_id, query_params):
+        self.keyset = 'after' in query_params
+        if self.keyset:
+            self.limit = max(1, int(query_params.get('limit', 20)))
+            try:
+                self.query = after_query(user_id, query_params.get('after'))
+            except ValueError:
+                raise RequestError({'error': 'Cursor inválido'}) from None
+            self.wants_count = wants_count(query_params)
+        else:
+            self.page = int(query_params.get('page', 1))
+            self.limit = int(query_params.get('limit', 20))
+            self.query = {'user_id': user_id}
+            self.wants_count = True
+
+    def cursor(self, collection, session=None):
+        """The PyMongo or Motor cursor of the page; keyset pages read one extra document."""
+        cursor = collection.find(self.query, FAVORITE_PROJECTION, session=session).sort(FAVORITES_ORDER)
+        if self.keyset:
+            return cursor.limit(self.limit + 1)
+        return cursor.skip((self.page - 1) * self.limit).limit(self.limit)
+
+    def reply(self, docs, count=None):
+        if self.keyset:
+            has_more = len(docs) > self.limit
+            docs = docs[:self.limit]
+            data = {
+                'results': [Favorite.serialize(doc) for doc in docs],
+                'limit': self.limit,
+                'next': encode_cursor(docs[-1]) if has_more else None,
+            }
+            if count is not None:
+                data['count'] = count
+            return Reply(data)
+        return Reply({
+            'results': [Favorite.serialize(doc) for doc in docs],
+            'count': count,
+            'page': self.page,
+            'limit': self.limit,
+            'total_pages': (count + self.limit - 1) // self.limit if self.limit > 0 else 1,
+        })
+
+
+def favorite_to_create(data):
+    """Returns (product_id, notes) from a create request. Raises RequestError."""
+    serializer = FavoriteCreateSerializer(data=data)
+    if not serializer.is_valid():
+        raise RequestError(serializer.errors)
+    return serializer.validated_data['product_id'], serializer.validated_data.get('notes', '')
+
+
+def created_reply(favorite_doc, created):
+    return Reply(
+        Favorite.serialize(favorite_doc),
+        status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
+
+
+def accepted_reply(intent):
+    return Reply(
+        intent_response(intent),
+        status.HTTP_202_ACCEPTED,
+        {'Location': reverse('favorite_intent_status', args=[str(intent['_id'])])},
+    )
+
+
+def favorite_key(user_id, product_id):
+    return {'user_id': user_id, 'product_id': product_id}
+
+
+def favorite_reply(favorite_doc):
+    if favorite_doc:
+        return Reply({'is_favorite': True, 'favorite': Favorite.serialize(favorite_doc)})
+    return Reply({'is_favorite': False})
+
+
+## estado de favos encolados (write-behind)
+
+def intent_query(intent_id, user_id):
+    """Query for one of the user's intents. Raises RequestError for a bad id."""
+    return {'_id': parse_object_id(intent_id, 'ID de solicitud inválido'), 'user_id': user_id}
+
+
+def intent_favorite_query(intent):
+    """Arguments of the ``find_one`` for the favorite written by a done intent, or None."""
+    if intent['status'] != DONE:
+        return None
+    return favorite_key(intent['user_id'], intent['product_id']), FAVORITE_PROJECTION
+
+
+def intent_reply(intent, favorite_doc=None):
+    return Reply(intent_response(intent, favorite_doc))
+
+
+## crear favos en lote
+
+def batch_items(data):
+    """Validated items of a batch request. Raises RequestError."""
+    serializer = FavoriteCreateSerializer(
+        data=data,
+        many=True,
+        allow_empty=False,
+        max_length=settings.FAVORITES_BATCH_MAX_SIZE,
+    )
+    if not serializer.is_valid():
+        raise RequestError(serializer.errors)
+    return serializer.validated_data
+
+
+def _unvalidated(validation):
+    """True when the catalog could not answer (timeout, outage), as opposed to rejecting the article."""
+    return isinstance(validation, ArticleValidationError) and not isinstance(validation, InvalidArticleError)
+
+
+def batch_unavailable(validations):
+    """Reply (503) when the catalog could validate none of the articles of a batch, else None."""
+    errors = list(validations.values())
+    if not errors or not all(_unvalidated(error) for error in errors):
+        return None
+    refused = [error for error in errors if isinstance(error, CatalogUnavailableError)]
+    return validation_error(refused[0] if refused else errors[0], status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def batch_operations(user_id, items, validations, now):
+    """Returns (product_ids, upsert operations) for the valid items of a batch."""
+    notes_by_product = {}
+    for item in items:
+        product_id = item['product_id']
+        if isinstance(validations[product_id], ArticleValidationError):
+            continue
+        notes = item.get('notes', '')
+        if notes or product_id not in notes_by_product:
+            notes_by_product[product_id] = notes
+
+    operations = [
+        UpdateOne(
+            favorite_key(user_id, product_id),
+            favorite_upsert_update(notes, now),
+            upsert=True,
+        )
+        for product_id, notes in notes_by_product.items()
+    ]
+    return list(notes_by_product), operations
+
+
+def batch_documents_query(user_id, product_ids):
+    return {'user_id': user_id, 'product_id': {'$in': product_ids}}, FAVORITE_PROJECTION
+
+
+def batch_reply(items, validations, created, failed, documents):
+    results = []
+    for item in items:
+        product_id = item['product_id']
+        validation = validations[product_id]
+        if _unvalidated(validation):
+            results.append({
+                'product_id': product_id,
+                'status': status.HTTP_503_SERVICE_UNAVAILABLE,
+                'error': str(validation),
+            })
+        elif isinstance(validation, ArticleValidationError):
+            results.append({'product_id': product_id, 'status': status.HTTP_400_BAD_REQUEST, 'error': str(validation)})
+        elif product_id in failed or product_id not in documents:
+            results.append({
+                'product_id': product_id,
+                'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                'error': 'No se pudo guardar el favorito',
+            })
+        else:
+            results.append({
+                'product_id': product_id,
+                'status': status.HTTP_201_CREATED if product_id in created else status.HTTP_200_OK,
+                'favorite': Favorite.serialize(documents[product_id]),
+            })
+    return Reply({'results': results})
+
+
+## check varios favos y contadores
+
+def lookup_data(query_params):
+    """Accepts ``?product_ids=a,b`` as well as repeated ``product_ids``."""
+    product_ids = []
+    for value in query_params.getlist('product_ids'):
+        product_ids.extend(part for part in value.split(',') if part)
+    return {'product_ids': product_ids}
+
+
+def lookup_product_ids(data):
+    """Distinct product ids of a lookup request, in order. Raises RequestError."""
+    serializer = FavoriteLookupSerializer(data=data)
+    if not serializer.is_valid():
+        raise RequestError(serializer.errors)
+    return list(dict.fromkeys(serializer.validated_data['product_ids']))
+
+
+def lookup_query(user_id, product_ids):
+    # Covered by the (user_id, product_id) index: no documents are fetched.
+    return {'user_id': user_id, 'product_id': {'$in': product_ids}}, {'_id': 0, 'product_id': 1}
+
+
+def products_query(user_id):
+    # Covered by the (user_id, product_id) index.
+    return {'user_id': user_id}, {'_id': 0, 'product_id': 1}
+
+
+def lookup_reply(product_ids, found):
+    return Reply({'favorites': {product_id: product_id in found for product_id in product_ids}})
+
+
+counts_cache = TTLCache(
+    maxsize=settings.FAVORITE_COUNTS_CACHE_MAX_SIZE,
+    ttl=settings.FAVORITE_COUNTS_CACHE_TTL,
+    name='favorite_counts',
+)
+
+
+def cached_counts(product_ids):
+    """Returns ({product_id: count} from the cache, [product ids to look up])."""
+    counts, missing = {}, []
+    for product_id in product_ids:
+        count = counts_cache.get(product_id)
+        if count is None:
+            missing.append(product_id)
+        else:
+            counts[product_id] = count
+    return counts, missing
+
+
+def counts_query(product_ids):
+    # Point lookups on the product_stats _id index, kept up to date by every write.
+    return {'_id': {'$in': product_ids}}, {'favorite_count': 1}
+
+
+def store_counts(counts, missing, docs):
+    found = {doc['_id']: max(0, doc.get('favorite_count', 0)) for doc in docs}
+    for product_id in missing:
+        counts[product_id] = found.get(product_id, 0)
+        counts_cache.set(product_id, counts[product_id])
+    return counts
+
+
+def counts_reply(product_ids, counts):
+    return Reply({'counts': {product_id: counts[product_id] for product_id in product_ids}})
+
+
+## exportar favos
+
+def is_admin(user_data):
+    """Whether ``user_data`` has AUTH_ADMIN_VALUE in its AUTH_ADMIN_CLAIM (a value or a list)."""
+    if not settings.AUTH_ADMIN_CLAIM or not user_data:
+        return False
+    value = user_data.get(settings.AUTH_ADMIN_CLAIM)
+    if isinstance(value, (list, tuple)):
+        return settings.AUTH_ADMIN_VALUE in value
+    return value == settings.AUTH_ADMIN_VALUE
+
+
+def require_admin(request):
+    """Raises RequestError (403) unless the authenticated user is an administrator."""
+    if not is_admin(getattr(request, 'user_data', None)):
+        raise RequestError({'error': 'Se requieren permisos de administrador'}, status.HTTP_403_FORBIDDEN)
+
+
+def export_query_params(query_params, user_id):
+    """Returns (query, compress) for an export request. Raises RequestError."""
+    try:
+        query = export_query(user_id, query_params.get('after'))
+    except ValueError:
+        raise RequestError({'error': 'Cursor inválido'}) from None
+    return query, query_params.get('gzip', '').lower() in ('1', 'true')
+
+
+def export_response(chunks, compress):
+    """Streams ``chunks``, an iterator or async iterator of NDJSON (gzipped if ``compress``)."""
+    if compress:
+        response = StreamingHttpResponse(chunks, content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="favorites.ndjson.gz"'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="favorites.ndjson"'
+    return response
+
+
+## favos populares
+
+popular_cache = TTLCache(maxsize=32, ttl=settings.POPULAR_CACHE_TTL, name='popular')
+
+
+def popular_cursor(collection, limit):
+    return collection.find({'favorite_count': {'$gt': 0}}).sort('favorite_count', -1).limit(limit)
+
+
+def popular_reply(popular):
+    return Reply({
+        'popular_products': [
+            {
+                'product_id': item['_id'],
+                'favorite_count': item['favorite_count'],
+                'last_added': item['last_added'].isoformat() if isinstance(item.get('last_added'), datetime) else str(item.get('last_added', '')),
+            }
+            for item in popular
+        ]
+    })
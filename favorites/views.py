@@ -1,177 +1,311 @@
+import functools
+import hmac
+from datetime import datetime
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from datetime import datetime
-from .models import get_favorites_collection, Favorite
-from .serializers import FavoriteCreateSerializer
-from .rabbit_client import validate_article, ArticleValidationError
+from .consistency import read_session
+from .export import export_cursor, gzip_chunks, ndjson_chunks
+from .favorite_sets import get_favorite_set
+from .circuit_breaker import breaker_states
+from .lifecycle import readiness_checks
+from .metrics import render_metrics
+from .models import (
+    get_favorites_collection,
+    get_favorite_intents_collection,
+    get_product_stats_collection,
+    get_user_version,
+    bump_user_version,
+    increment_favorite_counts,
+    upsert_favorite,
+    bulk_upsert,
+    FAVORITE_PROJECTION,
+)
+from .view_logic import (
+    FAVORITE_DELETED,
+    FAVORITE_NOT_FOUND,
+    INTENT_NOT_FOUND,
+    FavoritesPage,
+    RequestError,
+    Reply,
+    accepted_reply,
+    batch_documents_query,
+    batch_items,
+    batch_operations,
+    batch_reply,
+    batch_unavailable,
+    cached_counts,
+    counts_query,
+    counts_reply,
+    created_reply,
+    export_query_params,
+    export_response,
+    favorite_key,
+    favorite_reply,
+    favorite_to_create,
+    favorites_validators,
+    intent_favorite_query,
+    intent_query,
+    intent_reply,
+    lookup_data,
+    lookup_product_ids,
+    lookup_query,
+    lookup_reply,
+    not_modified,
+    parse_object_id,
+    popular_cache,
+    popular_cursor,
+    popular_reply,
+    require_admin,
+    store_counts,
+    validation_error,
+    with_validators,
+)
+from .rabbit_client import validate_article, validate_articles
+from .write_behind import create_intent
+
+
+def _respond(reply):
+    return Response(reply.data, status=reply.status, headers=reply.headers)
+
+
+def _view(*methods):
+    """``@api_view`` for views that may raise RequestError."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except RequestError as exc:
+                return _respond(exc.reply)
+        return api_view(list(methods))(wrapper)
+    return decorator
+
+
+def _count_favorites(collection, user_id, session=None):
+    products = get_favorite_set(user_id)
+    if products is not None:
+        return len(products)
+    return collection.count_documents({'user_id': user_id}, session=session)
 
 ## listar favos
-@api_view(['GET', 'POST'])
+@_view('GET', 'POST')
 def list_favorites(request):
+    user_id = request.user_id
     if request.method == 'POST':
-        user_id = request.user_id
-        collection = get_favorites_collection()
-        
-        serializer = FavoriteCreateSerializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        product_id = serializer.validated_data['product_id']
-        notes = serializer.validated_data.get('notes', '')
+        product_id, notes = favorite_to_create(request.data)
+        if settings.FAVORITES_WRITE_BEHIND:
+            return _respond(accepted_reply(create_intent(user_id, product_id, notes)))
 
         try:
             validate_article(product_id, user_id)
-        except ArticleValidationError as exc:
-            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception:
-            return Response({'error': 'No se pudo validar el artículo'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-        
-        existing = collection.find_one({'user_id': user_id, 'product_id': product_id})
-        
-        if existing:
-            if notes:
-                collection.update_one(
-                    {'_id': existing['_id']},
-                    {'$set': {'notes': notes, 'updated_at': datetime.utcnow()}}
-                )
-                existing['notes'] = notes
-                existing['updated_at'] = datetime.utcnow()
-            favorite = Favorite.from_dict(existing)
-            return Response(favorite.to_dict(), status=status.HTTP_200_OK)
-        else:
-            now = datetime.utcnow()
-            favorite_doc = {
-                'user_id': user_id,
-                'product_id': product_id,
-                'notes': notes,
-                'created_at': now,
-                'updated_at': now
-            }
-            result = collection.insert_one(favorite_doc)
-            favorite_doc['_id'] = result.inserted_id
-            favorite = Favorite.from_dict(favorite_doc)
-            return Response(favorite.to_dict(), status=status.HTTP_201_CREATED)
-    
+        except Exception as exc:
+            return _respond(validation_error(exc))
+
+        favorite_doc, created = upsert_favorite(get_favorites_collection(), user_id, product_id, notes)
+        bump_user_version(user_id)
+        if created:
+            increment_favorite_counts([product_id], 1, favorite_doc['created_at'])
+        return _respond(created_reply(favorite_doc, created))
+
+    collection = get_favorites_collection('list')
+    session = read_session()
+    validators = favorites_validators(user_id, get_user_version(user_id, 'list', session))
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+
+    page = FavoritesPage(user_id, request.GET)
+    docs = list(page.cursor(collection, session))
+    count = _count_favorites(collection, user_id, session) if page.wants_count else None
+    return with_validators(_respond(page.reply(docs, count)), *validators)
+
+## estado de favos encolados (write-behind)
+
+@_view('GET')
+def favorite_intent_status(request, intent_id):
+    intent = get_favorite_intents_collection().find_one(intent_query(intent_id, request.user_id))
+    if not intent:
+        return _respond(INTENT_NOT_FOUND)
+    favorite_query = intent_favorite_query(intent)
+    favorite_doc = get_favorites_collection().find_one(*favorite_query) if favorite_query else None
+    return _respond(intent_reply(intent, favorite_doc))
+
+## crear favos en lote
+
+@_view('POST')
+def create_favorites_batch(request):
     user_id = request.user_id
     collection = get_favorites_collection()
-    
-    page = int(request.query_params.get('page', 1))
-    limit = int(request.query_params.get('limit', 20))
-    skip = (page - 1) * limit
-    
-    favorites_cursor = collection.find({'user_id': user_id}).sort('created_at', -1).skip(skip).limit(limit)
-    favorites = [Favorite.from_dict(fav) for fav in favorites_cursor]
-    
-    total_count = collection.count_documents({'user_id': user_id})
-    total_pages = (total_count + limit - 1) // limit if limit > 0 else 1
-    
-    favorites_data = [fav.to_dict() for fav in favorites]
-    
-    return Response({
-        'results': favorites_data,
-        'count': total_count,
-        'page': page,
-        'limit': limit,
-        'total_pages': total_pages,
-    })
+    items = batch_items(request.data)
+
+    try:
+        validations = validate_articles([item['product_id'] for item in items], user_id)
+    except Exception as exc:
+        return _respond(validation_error(exc, invalid_status=status.HTTP_503_SERVICE_UNAVAILABLE))
+    unavailable = batch_unavailable(validations)
+    if unavailable is not None:
+        return _respond(unavailable)
+
+    now = datetime.utcnow()
+    product_ids, operations = batch_operations(user_id, items, validations, now)
+    created, failed, documents = set(), set(), {}
+    if product_ids:
+        upserted, failed_indexes = bulk_upsert(collection, operations)
+        bump_user_version(user_id)
+        created = {product_ids[index] for index in upserted}
+        increment_favorite_counts(list(created), 1, now)
+        failed = {product_ids[index] for index in failed_indexes}
+        documents = {doc['product_id']: doc for doc in collection.find(*batch_documents_query(user_id, product_ids))}
+    return _respond(batch_reply(items, validations, created, failed, documents))
+
+## check varios favos
+
+@_view('GET', 'POST')
+def check_favorites_bulk(request):
+    user_id = request.user_id
+    collection = get_favorites_collection('check')
+    session = read_session()
+    product_ids = lookup_product_ids(request.data if request.method == 'POST' else lookup_data(request.GET))
+
+    if request.method == 'GET':
+        validators = favorites_validators(user_id, get_user_version(user_id, 'check', session))
+        response = not_modified(request, *validators)
+        if response is not None:
+            return response
+
+    products = get_favorite_set(user_id)
+    if products is not None:
+        found = products.intersection(product_ids)
+    else:
+        found = {doc['product_id'] for doc in collection.find(*lookup_query(user_id, product_ids), session=session)}
+
+    response = _respond(lookup_reply(product_ids, found))
+    return with_validators(response, *validators) if request.method == 'GET' else response
+
+## contar favos por producto
+
+@_view('GET', 'POST')
+def get_favorite_counts(request):
+    product_ids = lookup_product_ids(request.data if request.method == 'POST' else lookup_data(request.GET))
+    counts, missing = cached_counts(product_ids)
+    if missing:
+        store_counts(counts, missing, get_product_stats_collection('counts').find(*counts_query(missing)))
+    return _respond(counts_reply(product_ids, counts))
 
 ## check favo
 
-@api_view(['GET', 'DELETE'])
+def _delete_by_product(user_id, product_id):
+    result = get_favorites_collection().delete_one(favorite_key(user_id, product_id))
+    if result.deleted_count == 0:
+        return _respond(FAVORITE_NOT_FOUND)
+    bump_user_version(user_id)
+    increment_favorite_counts([product_id], -1)
+    return _respond(FAVORITE_DELETED)
+
+
+@_view('GET', 'DELETE')
 def check_favorite(request, product_id):
-    if request.method == 'DELETE':
-        user_id = request.user_id
-        collection = get_favorites_collection()
-        
-        result = collection.delete_one({'user_id': user_id, 'product_id': product_id})
-        if result.deleted_count > 0:
-            return Response({'message': 'Favorito eliminado correctamente'}, status=status.HTTP_204_NO_CONTENT)
-        else:
-            return Response({'error': 'Favorito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
-    
     user_id = request.user_id
-    collection = get_favorites_collection()
-    
-    favorite_doc = collection.find_one({'user_id': user_id, 'product_id': product_id})
-    
-    if favorite_doc:
-        favorite = Favorite.from_dict(favorite_doc)
-        return Response({
-            'is_favorite': True,
-            'favorite': favorite.to_dict()
-        })
+    if request.method == 'DELETE':
+        return _delete_by_product(user_id, product_id)
+
+    collection = get_favorites_collection('check')
+    session = read_session()
+    validators = favorites_validators(user_id, get_user_version(user_id, 'check', session))
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+
+    products = get_favorite_set(user_id)
+    if products is not None and product_id not in products:
+        favorite_doc = None
     else:
-        return Response({
-            'is_favorite': False
-        })
+        favorite_doc = collection.find_one(favorite_key(user_id, product_id), FAVORITE_PROJECTION, session=session)
+    return with_validators(_respond(favorite_reply(favorite_doc)), *validators)
 
 ## delete favo por id 
 
-@api_view(['DELETE'])
+@_view('DELETE')
 def delete_favorite(request, favorite_id):
     user_id = request.user_id
-    collection = get_favorites_collection()
-    
+    object_id = parse_object_id(favorite_id, 'ID de favorito inválido')
     try:
-        from bson import ObjectId
-        from bson.errors import InvalidId
-        
-        try:
-            object_id = ObjectId(favorite_id)
-        except InvalidId:
-            return Response({'error': 'ID de favorito inválido'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        result = collection.delete_one({'_id': object_id, 'user_id': user_id})
-        
-        if result.deleted_count > 0:
-            return Response({'message': 'Favorito eliminado correctamente'}, status=status.HTTP_204_NO_CONTENT)
-        else:
-            return Response({'error': 'Favorito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        deleted = get_favorites_collection().find_one_and_delete(
+            {'_id': object_id, 'user_id': user_id},
+            projection={'product_id': 1},
+        )
     except Exception as e:
-        return Response({'error': f'Error al eliminar favorito: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        return _respond(Reply({'error': f'Error al eliminar favorito: {str(e)}'}, status.HTTP_400_BAD_REQUEST))
+
+    if not deleted:
+        return _respond(FAVORITE_NOT_FOUND)
+    bump_user_version(user_id)
+    increment_favorite_counts([deleted['product_id']], -1)
+    return _respond(FAVORITE_DELETED)
 
 ## delete por product
 
-@api_view(['DELETE'])
+@_view('DELETE')
 def delete_favorite_by_product(request, product_id):
-    user_id = request.user_id
-    collection = get_favorites_collection()
-    
-    result = collection.delete_one({'user_id': user_id, 'product_id': product_id})
-    if result.deleted_count > 0:
-        return Response({'message': 'Favorito eliminado correctamente'}, status=status.HTTP_204_NO_CONTENT)
-    else:
-        return Response({'error': 'Favorito no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return _delete_by_product(request.user_id, product_id)
+
+## exportar favos
+
+def _export(request, user_id):
+    query, compress = export_query_params(request.GET, user_id)
+    cursor = export_cursor(get_favorites_collection('export'), query, settings.FAVORITES_EXPORT_BATCH_SIZE)
+    chunks = ndjson_chunks(cursor)
+    return export_response(gzip_chunks(chunks) if compress else chunks, compress)
+
+
+@_view('GET')
+def export_favorites(request):
+    return _export(request, request.user_id)
+
+
+@_view('GET')
+def export_all_favorites(request):
+    require_admin(request)
+    return _export(request, request.GET.get('user_id') or None)
 
 ## get popu favos
 
-@api_view(['GET'])
+@_view('GET')
 def get_popular_favorites(request):
-    limit = int(request.query_params.get('limit', 10))
-    collection = get_favorites_collection()
-    
-    pipeline = [
-        {'$group': {
-            '_id': '$product_id',
-            'favorite_count': {'$sum': 1},
-            'last_added': {'$max': '$created_at'}
-        }},
-        {'$sort': {'favorite_count': -1}},
-        {'$limit': limit}
-    ]
-    
-    popular = list(collection.aggregate(pipeline))
-    
-    result = [
+    limit = int(request.GET.get('limit', 10))
+    popular = popular_cache.get_or_load(limit, lambda: list(popular_cursor(get_product_stats_collection('popular'), limit)))
+    return _respond(popular_reply(popular))
+
+## métricas
+
+def metrics(request):
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode('utf-8'),
+        f'Bearer {settings.METRICS_TOKEN}'.encode('utf-8'),
+    ):
+        return JsonResponse({'error': 'Token de métricas inválido'}, status=401)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+## salud (sin autenticación)
+
+def liveness(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness(request):
+    """503 until MongoDB and RabbitMQ answer; breaker states are reported but not required."""
+    checks = readiness_checks()
+    ready = all(error is None for error in checks.values())
+    return JsonResponse(
         {
-            'product_id': item['_id'],
-            'favorite_count': item['favorite_count'],
-            'last_added': item['last_added'].isoformat() if isinstance(item.get('last_added'), datetime) else str(item.get('last_added', ''))
-        }
-        for item in popular
-    ]
-    
-    return Response({
-        'popular_products': result
-    })
+            'status': 'ok' if ready else 'unavailable',
+            'checks': {name: error or 'ok' for name, error in checks.items()},
+            'circuit_breakers': breaker_states(),
+        },
+        status=200 if ready else 503,
+    )
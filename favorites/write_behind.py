@@ -0,0 +1,195 @@
+"""
+Write-behind ingestion of favorites (FAVORITES_WRITE_BEHIND).
+
+POST /api/favorites/ only stores the request as an intent in the
+``favorite_intents`` outbox and answers 202 with its id, so a slow catalog
+service no longer holds the request. ``process_favorite_intents`` workers
+claim pending intents in batches, validate their articles with pipelined
+RPCs and write the favorites with a single bulk_write per batch. Clients
+poll /api/favorites/intents/<id>/ for the outcome.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .models import (
+    _isoformat,
+    bulk_upsert,
+    bump_user_version,
+    favorite_upsert_update,
+    get_favorite_intents_collection,
+    get_async_favorite_intents_collection,
+    get_favorites_collection,
+    increment_favorite_counts,
+    Favorite,
+)
+from .rabbit_client import validate_articles, ArticleValidationError, InvalidArticleError
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+DONE = 'done'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+# Intents in these states get a ``finished_at``, which the TTL index expires.
+FINISHED = (DONE, REJECTED, FAILED)
+
+
+def new_intent(user_id, product_id, notes):
+    now = datetime.utcnow()
+    return {
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'product_id': product_id,
+        'notes': notes,
+        'status': PENDING,
+        'attempts': 0,
+        'retry_at': now,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def create_intent(user_id, product_id, notes):
+    """Queues a favorite to be written by the workers. Returns the intent."""
+    intent = new_intent(user_id, product_id, notes)
+    get_favorite_intents_collection().insert_one(intent)
+    return intent
+
+
+async def acreate_intent(user_id, product_id, notes):
+    intent = new_intent(user_id, product_id, notes)
+    await get_async_favorite_intents_collection().insert_one(intent)
+    return intent
+
+
+def intent_response(intent, favorite_doc=None):
+    data = {
+        'id': str(intent['_id']),
+        'status': intent['status'],
+        'product_id': intent['product_id'],
+        'created_at': _isoformat(intent['created_at']),
+        'updated_at': _isoformat(intent['updated_at']),
+    }
+    if intent.get('error'):
+        data['error'] = intent['error']
+    if favorite_doc is not None:
+        data['favorite'] = Favorite.serialize(favorite_doc)
+    return data
+
+
+class IntentProcessor:
+    """Claims and applies batches of pending intents.
+
+    Several processors (threads or processes) can run at once: an intent is
+    claimed atomically by one of them, and intents whose claim is older than
+    FAVORITES_WRITE_BEHIND_LEASE_SECONDS (a crashed worker) are claimed
+    again. Each claim counts as an attempt; failed attempts are retried with
+    exponential backoff from FAVORITES_WRITE_BEHIND_RETRY_DELAY and after
+    FAVORITES_WRITE_BEHIND_MAX_ATTEMPTS the intent is marked failed.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.FAVORITES_WRITE_BEHIND_BATCH_SIZE
+        self.worker_id = uuid.uuid4().hex
+        self._intents = get_favorite_intents_collection()
+
+    def claim(self):
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=settings.FAVORITES_WRITE_BEHIND_LEASE_SECONDS)
+        claimable = {'$or': [
+            {'status': PENDING, 'retry_at': {'$lte': now}},
+            {'status': PROCESSING, 'claimed_at': {'$lt': expired}},
+        ]}
+        ids = [doc['_id'] for doc in self._intents.find(claimable, {'_id': 1}).sort('retry_at', 1).limit(self.batch_size)]
+        if not ids:
+            return []
+
+        claim = ObjectId()
+        self._intents.update_many(
+            {'_id': {'$in': ids}, **claimable},
+            {
+                '$set': {'status': PROCESSING, 'claim': claim, 'claimed_at': now, 'worker': self.worker_id},
+                '$inc': {'attempts': 1},
+            },
+        )
+        return list(self._intents.find({'_id': {'$in': ids}, 'claim': claim}))
+
+    def _validate(self, intents):
+        """Returns {intent _id: message or ArticleValidationError}."""
+        by_user = defaultdict(list)
+        for intent in intents:
+            by_user[intent['user_id']].append(intent)
+
+        results = {}
+        for user_id, group in by_user.items():
+            try:
+                validations = validate_articles([intent['product_id'] for intent in group], user_id)
+            except ArticleValidationError as exc:
+                validations = defaultdict(lambda exc=exc: exc)
+            for intent in group:
+                results[intent['_id']] = validations[intent['product_id']]
+        return results
+
+    def _outcome(self, intent, now, status, error=None):
+        if status == PENDING and intent['attempts'] >= settings.FAVORITES_WRITE_BEHIND_MAX_ATTEMPTS:
+            status = FAILED
+        update = {'$set': {'status': status, 'updated_at': now}, '$unset': {'claim': '', 'claimed_at': ''}}
+        if status in FINISHED:
+            update['$set']['finished_at'] = now
+        if status == PENDING:
+            delay = settings.FAVORITES_WRITE_BEHIND_RETRY_DELAY * 2 ** (intent['attempts'] - 1)
+            update['$set']['retry_at'] = now + timedelta(seconds=delay)
+        if error:
+            update['$set']['error'] = error
+        else:
+            update['$unset']['error'] = ''
+        # Only the holder of the claim may settle the intent.
+        return UpdateOne({'_id': intent['_id'], 'claim': intent['claim']}, update)
+
+    def process(self, intents):
+        now = datetime.utcnow()
+        validations = self._validate(intents)
+
+        outcomes, valid = [], []
+        for intent in intents:
+            validation = validations[intent['_id']]
+            if isinstance(validation, InvalidArticleError):
+                outcomes.append(self._outcome(intent, now, REJECTED, str(validation)))
+            elif isinstance(validation, ArticleValidationError):
+                outcomes.append(self._outcome(intent, now, PENDING, str(validation)))
+            else:
+                valid.append(intent)
+
+        if valid:
+            operations = [
+                UpdateOne(
+                    {'user_id': intent['user_id'], 'product_id': intent['product_id']},
+                    favorite_upsert_update(intent.get('notes', ''), now),
+                    upsert=True,
+                )
+                for intent in valid
+            ]
+            upserted, failed = bulk_upsert(get_favorites_collection(), operations)
+            increment_favorite_counts([valid[index]['product_id'] for index in upserted], 1, now)
+            for user_id in {intent['user_id'] for index, intent in enumerate(valid) if index not in failed}:
+                bump_user_version(user_id)
+            for index, intent in enumerate(valid):
+                if index in failed:
+                    outcomes.append(self._outcome(intent, now, PENDING, 'No se pudo guardar el favorito'))
+                else:
+                    outcomes.append(self._outcome(intent, now, DONE))
+
+        if outcomes:
+            self._intents.bulk_write(outcomes, ordered=False)
+
+    def run_once(self):
+        """Processes one batch. Returns the number of intents claimed."""
+        intents = self.claim()
+        if intents:
+            self.process(intents)
+        return len(intents)
@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn core.wsgi:application                      # sync views, threaded workers
+    ASYNC_MODE=True gunicorn core.asgi:application      # async views, uvicorn workers
+
+The application is imported once by the master (preload_app), which also
+creates the MongoDB indexes. Each forked worker re-creates its MongoDB,
+RabbitMQ and auth clients and connects them before accepting requests
+(see favorites.lifecycle).
+"""
+import multiprocessing
+import os
+
+from decouple import config as _config
+
+bind = _config('GUNICORN_BIND', default='0.0.0.0:3006')
+workers = _config('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+threads = _config('GUNICORN_THREADS', default=8, cast=int)
+worker_class = 'uvicorn.workers.UvicornWorker' if _config('ASYNC_MODE', default=False, cast=bool) else 'gthread'
+timeout = _config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = _config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = _config('GUNICORN_KEEPALIVE', default=5, cast=int)
+max_requests = _config('GUNICORN_MAX_REQUESTS', default=0, cast=int)
+max_requests_jitter = _config('GUNICORN_MAX_REQUESTS_JITTER', default=0, cast=int)
+accesslog = _config('GUNICORN_ACCESS_LOG', default=None)
+preload_app = True
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+# Indexes are created by the master in when_ready, not by a background
+# thread started while importing the app (threads don't survive a fork).
+_create_indexes = _config('MONGODB_ENSURE_INDEXES_ON_STARTUP', default=True, cast=bool)
+os.environ['MONGODB_ENSURE_INDEXES_ON_STARTUP'] = 'False'
+
+
+def when_ready(server):
+    from favorites import lifecycle
+
+    lifecycle.prepare(create_indexes=_create_indexes)
+
+
+def post_fork(server, worker):
+    from favorites import lifecycle
+
+    lifecycle.after_fork()
+
+
+def post_worker_init(worker):
+    from favorites import lifecycle
+
+    lifecycle.warm_up()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)